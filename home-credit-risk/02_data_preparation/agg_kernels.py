@@ -0,0 +1,119 @@
+"""
+Kernels de agregación sobre códigos enteros (NumPy puro).
+
+count_by_category reemplaza a
+    pivot_table(index=key, columns=cat, values=v, aggfunc="count", fill_value=0, observed=True)
+con una sola pasada: factoriza clave y categoría y cuenta con np.bincount
+sobre el código combinado (clave * n_categorías + categoría).
+
+group_stats reemplaza el patrón "grp[c].mean() / .max() / .min() / .sum()
+columna por columna": la clave se agrupa una sola vez y cada estadístico se
+calcula sobre el bloque 2-D de todas las columnas (los kernels de groupby de
+pandas, con la misma suma compensada), así que el resultado es idéntico.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def _codes(s: pd.Series, sort: bool = True) -> tuple[np.ndarray, pd.Index]:
+    """Códigos enteros (-1 = faltante) y valores únicos, en el orden de groupby."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(dtype=np.int64), pd.Index(s.cat.categories)
+    if sort and s.dtype.kind in "iu" and len(s):
+        # Ids enteros en un rango denso (SK_ID_*): factorizar por desplazamiento, sin hash
+        v = s.to_numpy()
+        lo, hi = int(v.min()), int(v.max())
+        if hi - lo < 4 * len(v) + 1024:
+            offset = (v - lo).astype(np.intp, copy=False)
+            present = np.zeros(hi - lo + 1, dtype=bool)
+            present[offset] = True
+            remap = np.cumsum(present, dtype=np.int64) - 1
+            uniques = np.flatnonzero(present).astype(v.dtype) + v.dtype.type(lo)
+            return remap[offset], pd.Index(uniques)
+    codes, uniques = pd.factorize(s, sort=sort)
+    return codes.astype(np.int64, copy=False), pd.Index(uniques)
+
+
+def count_by_category(df: pd.DataFrame, key: str, column: str, values: str) -> pd.DataFrame:
+    """
+    Filas no nulas de `values` por (key, column), como tabla ancha int64:
+    índice = claves ordenadas, columnas = categorías observadas (en el orden
+    de la categoría, o alfabético si es texto). Igual que el pivot_table
+    equivalente con aggfunc="count", fill_value=0 y observed=True.
+    """
+    key_codes, keys = _codes(df[key])
+    cat_codes, cats = _codes(df[column])
+    n_keys, n_cats = len(keys), len(cats)
+
+    valid = (key_codes >= 0) & (cat_codes >= 0)
+    flat = key_codes[valid] * n_cats + cat_codes[valid]
+    counted = df[values].notna().to_numpy()[valid]
+
+    size = n_keys * n_cats
+    counts = np.bincount(flat[counted], minlength=size).reshape(n_keys, n_cats)
+    if counted.all():
+        seen = counts > 0
+    else:
+        # Pares (clave, categoría) presentes aunque `values` sea nulo (cuentan 0)
+        seen = np.bincount(flat, minlength=size).reshape(n_keys, n_cats) > 0
+
+    rows = seen.any(axis=1)
+    cols = seen.any(axis=0)
+    return pd.DataFrame(
+        counts[rows][:, cols].astype(np.int64, copy=False),
+        index=pd.Index(keys[rows], name=key),
+        columns=pd.Index(cats[cols], name=column),
+    )
+
+
+STATS = ("mean", "max", "min", "sum")
+
+
+def fits_dtype(v: np.ndarray, dtype: np.dtype) -> bool:
+    """True si todos los valores de v caben en el dtype entero `dtype`."""
+    info = np.iinfo(dtype)
+    return len(v) == 0 or (v.min() >= info.min and v.max() <= info.max)
+
+
+def group_stats(
+    df: pd.DataFrame,
+    key: str,
+    columns: list[str],
+    stats: tuple[str, ...] | dict[str, tuple[str, ...]],
+    prefix: str,
+    count_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Equivalente a
+        grp = df.groupby(key, observed=True)
+        out[count_name] = grp.size()
+        for c in columns: for stat in stats: out[f"{prefix}_{c}_{stat}"] = grp[c].<stat>()
+    pero la clave se factoriza/ordena una sola vez y cada estadístico se
+    calcula sobre el bloque 2-D de todas las columnas en una sola llamada.
+    stats puede ser un dict {columna: estadísticos} para calcular solo
+    algunos por columna (ver feature_manifest.stats_plan).
+    Devuelve un DataFrame consolidado (se construye de una vez, sin inserts).
+    """
+    per_column = stats if isinstance(stats, dict) else {c: stats for c in columns}
+    columns = [c for c in columns if per_column.get(c)]
+    for c in columns:
+        for stat in per_column[c]:
+            if stat not in STATS:
+                raise ValueError(f"Estadístico no soportado: {stat}")
+        if not pd.api.types.is_numeric_dtype(df[c]):
+            raise ValueError(f"La columna {c} no es numérica ({df[c].dtype}).")
+
+    grp = df.groupby(key, observed=True)
+    size = grp.size()
+    blocks = {}
+    for stat in dict.fromkeys(s for c in columns for s in per_column[c]):
+        cols = [c for c in columns if stat in per_column[c]]
+        blocks[stat] = getattr(grp[cols], stat)()
+
+    data = {count_name or f"{prefix}_count": size.to_numpy()}
+    for c in columns:
+        for stat in per_column[c]:
+            data[f"{prefix}_{c}_{stat}"] = blocks[stat][c].to_numpy()
+    return pd.DataFrame(data, index=size.index)
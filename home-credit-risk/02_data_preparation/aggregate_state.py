@@ -0,0 +1,551 @@
+"""
+Estado agregado persistente para actualizar inst_*, pos_*, cc_* y bureau_*
+con filas nuevas de las tablas hijas, sin volver a recorrerlas completas.
+
+Por cada clave se guarda el mismo estado que acumulan StreamingGroupStats /
+StreamingCounts en build_dataset --streaming: filas, nobs, suma compensada,
+suma entera, máximo, mínimo y conteos por categoría. Aplicar un delta
+(parquet con filas nuevas de installments_payments, pos_cash_balance,
+credit_card_balance o bureau_balance) lee solo el estado de las claves que
+aparecen en el delta, lo sigue acumulando con esas filas y lo escribe como
+un segmento nuevo: el costo depende del tamaño del delta, no de la tabla.
+Como las sumas compensadas siguen fila a fila en el mismo orden, el
+resultado es idéntico bit a bit a build_dataset --streaming sobre la tabla
+original seguida de las filas del delta.
+
+bureau_* se agrega por cliente sobre las filas de bureau unidas a
+bureau_balance agregado por SK_ID_BUREAU: el estado guarda ese agregado
+(bb) y las filas de bureau ordenadas por cliente, y un delta de
+bureau_balance recalcula solo los clientes dueños de los créditos tocados.
+
+Formato (data/processed/aggregate_state/):
+    meta.json                   origen, tamaño de las tablas padre, deltas aplicados
+    prev_map/                   SK_ID_PREV (ordenados) -> SK_ID_CURR
+    bureau/                     filas de bureau ordenadas por SK_ID_CURR
+    <inst|pos|cc|bb>/meta.json  columnas, dtypes, categorías y segmentos publicados
+    <inst|pos|cc|bb>/seg-N/     keys.npy (ordenadas) + un .npy por campo del estado
+
+Cada clave vale lo que diga el segmento más nuevo que la contiene; pasados
+MAX_SEGMENTS se compactan en uno. Un segmento se escribe completo antes de
+publicarse en meta.json (reemplazo atómico).
+
+Filas nuevas de previous_application o de bureau cambian el mapa de claves
+y las filas por cliente: no se aplican como delta, hay que reconstruir el
+estado (update_features.py --init).
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import features_bureau
+import features_credit_card
+import features_installments
+import features_pos_cash
+from data_io import RAW_FILES, load_raw_tables, resolve_columns
+from feature_cache import _read_json, _write_json_atomic, file_sha256
+from feature_manifest import stats_plan
+from features_previous import build_prev_map
+from streaming_agg import DEFAULT_BATCH_ROWS, StreamingCounts, StreamingGroupStats, iter_parquet_chunks
+
+
+STATE_FORMAT = 1
+STATE_DIR = Path("data/processed/aggregate_state")
+MAX_SEGMENTS = 8
+
+# Estado por tabla hija: clave, prefijo de salida y conteo por categoría (columna, valores)
+STATE_SPECS = {
+    "inst": {"table": "installments_payments", "key": "SK_ID_CURR", "prefix": "inst", "status": None},
+    "pos": {"table": "pos_cash_balance", "key": "SK_ID_CURR", "prefix": "pos", "status": ("NAME_CONTRACT_STATUS", "SK_ID_PREV")},
+    "cc": {"table": "credit_card_balance", "key": "SK_ID_CURR", "prefix": "cc", "status": None},
+    "bb": {"table": "bureau_balance", "key": "SK_ID_BUREAU", "prefix": "bb", "status": None},
+}
+DELTA_TABLES = {spec["table"]: name for name, spec in STATE_SPECS.items()}
+# Tablas padre: si cambian, el estado ya no corresponde a los datos
+PARENT_TABLES = ["previous_application", "bureau"]
+# Salidas que son conteos por categoría: una categoría ausente vale 0 si el cliente tiene conteos
+COUNT_PREFIXES = ("pos_status__", "bureau_active__")
+
+
+def _file_signature(path: Path) -> list[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _prepare(name: str, chunk: pd.DataFrame, prev_map: pd.DataFrame | None) -> pd.DataFrame:
+    """Las mismas filas que agrega el builder en modo --streaming."""
+    if name == "inst":
+        return features_installments._prepare_installments(chunk, prev_map)
+    if name == "pos":
+        return features_pos_cash._prepare_pos_cash(chunk, prev_map)
+    if name == "cc":
+        return features_credit_card._prepare_credit_card(chunk, prev_map)
+    return chunk
+
+
+def _stats(name: str, df: pd.DataFrame) -> dict[str, tuple[str, ...]]:
+    if name == "inst":
+        return stats_plan("inst", features_installments.AGG_COLUMNS, features_installments.AGG_STATS, None)
+    if name == "pos":
+        return stats_plan("pos", features_pos_cash.AGG_COLUMNS, features_pos_cash.AGG_STATS, None)
+    if name == "cc":
+        return stats_plan("cc", features_credit_card._num_like(df), features_credit_card.AGG_STATS, None)
+    # STATUS de bureau_balance no llega al agregado por cliente
+    return features_bureau._months_plan(None)
+
+
+def _raw_columns(name: str, path: Path) -> list[str]:
+    table = STATE_SPECS[name]["table"]
+    module = {"inst": features_installments, "pos": features_pos_cash, "cc": features_credit_card, "bb": features_bureau}[name]
+    cols = resolve_columns(path, module.COLUMNS[table])
+    return [c for c in cols if c != "STATUS"] if name == "bb" else cols
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenación de arange(start, stop) para cada par."""
+    lengths = stops - starts
+    if lengths.sum() == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return np.arange(lengths.sum(), dtype=np.int64) + offsets
+
+
+class SegmentStore:
+    """
+    Arrays por clave (float64) repartidos en segmentos inmutables; cada clave
+    vale lo del segmento más nuevo que la contiene. Los campos 2-D (conteos)
+    pueden ganar columnas al final: los segmentos viejos se completan con 0.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.meta = _read_json(self.path / "meta.json")
+        self._segments: dict[str, tuple[np.ndarray, dict[str, np.ndarray]]] = {}
+
+    @property
+    def segments(self) -> list[str]:
+        return self.meta.get("segments", [])
+
+    def _open(self, name: str) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        if name not in self._segments:
+            d = self.path / name
+            keys = np.load(d / "keys.npy", mmap_mode="r")
+            arrays = {f.stem: np.load(f, mmap_mode="r") for f in d.glob("*.npy") if f.name != "keys.npy"}
+            self._segments[name] = (keys, arrays)
+        return self._segments[name]
+
+    def keys(self) -> np.ndarray:
+        """Todas las claves con estado, ordenadas."""
+        parts = [self._open(s)[0] for s in self.segments]
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.float64)
+
+    def gather(self, keys: np.ndarray) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """(encontrada, {campo: valores}) para cada clave; las no encontradas quedan en 0."""
+        keys = np.asarray(keys, dtype=np.float64)
+        found = np.zeros(len(keys), dtype=bool)
+        out: dict[str, np.ndarray] = {}
+        for name in reversed(self.segments):
+            seg_keys, arrays = self._open(name)
+            if not out:
+                # El segmento más nuevo tiene el ancho completo de cada campo
+                out = {f: np.zeros((len(keys), *a.shape[1:]), dtype=a.dtype) for f, a in arrays.items()}
+            todo = np.flatnonzero(~found)
+            if len(todo) == 0:
+                break
+            if len(seg_keys) == 0:
+                continue
+            pos = np.searchsorted(seg_keys, keys[todo])
+            pos[pos == len(seg_keys)] = 0
+            hit = np.asarray(seg_keys[pos]) == keys[todo]
+            rows, pos = todo[hit], pos[hit]
+            for f, a in arrays.items():
+                v = a[pos]
+                if v.ndim == 2:
+                    out[f][rows, : v.shape[1]] = v
+                else:
+                    out[f][rows] = v
+            found[rows] = True
+        return found, out
+
+    def write(self, keys: np.ndarray, arrays: dict[str, np.ndarray], meta: dict) -> None:
+        """Publica un segmento nuevo con estas claves (y actualiza la metadata)."""
+        order = np.argsort(keys, kind="stable")
+        counter = self.meta.get("next_segment", 0)
+        name = f"seg-{counter:06d}"
+        d = self.path / name
+        # Restos de una escritura interrumpida (nunca publicada en meta.json)
+        shutil.rmtree(d, ignore_errors=True)
+        d.mkdir(parents=True)
+        np.save(d / "keys.npy", np.asarray(keys, dtype=np.float64)[order])
+        for f, a in arrays.items():
+            np.save(d / f"{f}.npy", np.asarray(a)[order])
+
+        self.meta = {**self.meta, **meta, "next_segment": counter + 1, "segments": [*self.segments, name]}
+        _write_json_atomic(self.path / "meta.json", self.meta)
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+
+    def compact(self) -> None:
+        """Reúne todos los segmentos en uno (el estado no cambia)."""
+        old = self.segments
+        if len(old) <= 1:
+            return
+        keys = self.keys()
+        _, arrays = self.gather(keys)
+        self._segments.clear()
+        self.meta = {**self.meta, "segments": []}
+        self.write(keys, arrays, {})
+        self._segments.clear()
+        for name in old:
+            shutil.rmtree(self.path / name, ignore_errors=True)
+
+
+class KeyedAggregate:
+    """Estado de una tabla hija (StreamingGroupStats + StreamingCounts) por clave."""
+
+    def __init__(self, path: str | Path, name: str):
+        self.name = name
+        self.spec = STATE_SPECS[name]
+        self.store = SegmentStore(path)
+
+    @property
+    def meta(self) -> dict:
+        return self.store.meta
+
+    def _new(self, stats: dict[str, tuple[str, ...]]) -> tuple[StreamingGroupStats, StreamingCounts | None]:
+        agg = StreamingGroupStats(self.spec["key"], stats)
+        status = StreamingCounts(self.spec["key"], *self.spec["status"]) if self.spec["status"] else None
+        return agg, status
+
+    def load(self, keys: np.ndarray | None = None) -> tuple[StreamingGroupStats, StreamingCounts | None]:
+        """Acumuladores con el estado de esas claves (None: todas); las que no tienen estado se omiten."""
+        keys = self.store.keys() if keys is None else np.unique(np.asarray(keys, dtype=np.float64))
+        found, arrays = self.store.gather(keys)
+        stats = {c: tuple(s) for c, s in self.meta["stats"].items()}
+        key_dtype = self.meta["key_dtype"]
+        agg = StreamingGroupStats.from_state(
+            self.spec["key"],
+            stats,
+            keys[found],
+            {f: a[found] for f, a in arrays.items()},
+            self.meta["dtypes"],
+            key_dtype,
+        )
+        status = None
+        if self.spec["status"]:
+            present = found & arrays["present"] if "present" in arrays else np.zeros(len(keys), dtype=bool)
+            categories = self.meta.get("categories", [])
+            status = StreamingCounts.from_state(
+                self.spec["key"],
+                *self.spec["status"],
+                keys[present],
+                categories,
+                arrays["counts"][present, : len(categories)] if categories else np.zeros((int(present.sum()), 0)),
+                key_dtype if categories else None,
+            )
+        return agg, status
+
+    def save(self, agg: StreamingGroupStats, status: StreamingCounts | None, meta: dict | None = None) -> int:
+        """Publica el estado de las claves de `agg` como segmento nuevo; devuelve cuántas son."""
+        keys, key_dtype, arrays, dtypes = agg.export_state()
+        extra = {"dtypes": dtypes, "key_dtype": key_dtype, **(meta or {})}
+        exported = status.export_state() if status is not None else None
+        if exported is not None:
+            s_keys, s_cats, s_counts = exported
+            # Orden de categorías estable entre segmentos: las nuevas van al final
+            categories = list(self.meta.get("categories", []))
+            categories += [c for c in s_cats if c not in categories]
+            counts = np.zeros((len(s_keys), len(categories)), dtype=np.int64)
+            counts[:, [categories.index(c) for c in s_cats]] = s_counts
+            pos = pd.Index(s_keys).get_indexer(keys)
+            arrays["present"] = pos >= 0
+            arrays["counts"] = np.where((pos >= 0)[:, None], counts[pos], 0)
+            extra["categories"] = categories
+        self.store.write(keys, arrays, extra)
+        return len(keys)
+
+    def features(self, agg: StreamingGroupStats, status: StreamingCounts | None) -> pd.DataFrame:
+        """Tabla de features de estas claves, como el builder en modo --streaming."""
+        prefix = self.spec["prefix"]
+        out = agg.to_frame(prefix=prefix)
+        counts = status.finalize() if status is not None else None
+        if counts is not None:
+            # Solo pos tiene conteos por categoría
+            out = out.join(features_pos_cash._status_columns(counts), how="left")
+        if self.name == "bb":
+            out = out.rename(columns=features_bureau.BB_MONTHS_COLUMNS)
+        return out.reset_index()
+
+
+class BureauRows:
+    """Filas de bureau ordenadas por SK_ID_CURR (dentro de cada cliente, en el orden original)."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.meta = _read_json(self.path / "meta.json")
+        self._arrays = {c: np.load(self.path / f"{c}.npy", mmap_mode="r") for c in self.meta["columns"]}
+        self._clients = np.load(self.path / "_clients.npy", mmap_mode="r")
+        self._offsets = np.load(self.path / "_offsets.npy", mmap_mode="r")
+        self._bureau_ids = np.load(self.path / "_bureau_ids.npy", mmap_mode="r")
+        self._bureau_clients = np.load(self.path / "_bureau_clients.npy", mmap_mode="r")
+
+    @staticmethod
+    def write(path: str | Path, bureau: pd.DataFrame) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=False)
+        b = bureau.iloc[np.argsort(bureau["SK_ID_CURR"].to_numpy(), kind="stable")]
+        categories = {}
+        for c in b.columns:
+            s = b[c]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                categories[c] = list(s.cat.categories)
+                np.save(path / f"{c}.npy", s.cat.codes.to_numpy())
+            else:
+                np.save(path / f"{c}.npy", s.to_numpy())
+        clients = b["SK_ID_CURR"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, clients[1:] != clients[:-1]]) if len(clients) else np.zeros(0, dtype=np.int64)
+        np.save(path / "_clients.npy", clients[starts])
+        np.save(path / "_offsets.npy", np.r_[starts, len(clients)].astype(np.int64))
+        by_bureau = np.argsort(b["SK_ID_BUREAU"].to_numpy(), kind="stable")
+        np.save(path / "_bureau_ids.npy", b["SK_ID_BUREAU"].to_numpy()[by_bureau])
+        np.save(path / "_bureau_clients.npy", clients[by_bureau])
+        meta = {"columns": list(b.columns), "categories": categories, "rows": int(len(b))}
+        _write_json_atomic(path / "meta.json", meta)
+
+    def clients_of(self, bureau_ids: np.ndarray) -> np.ndarray:
+        """Clientes dueños de esos SK_ID_BUREAU (los que no están en bureau se ignoran)."""
+        ids = np.unique(bureau_ids)
+        lo = np.searchsorted(self._bureau_ids, ids, side="left")
+        hi = np.searchsorted(self._bureau_ids, ids, side="right")
+        return np.unique(np.asarray(self._bureau_clients)[_ranges(lo, hi)])
+
+    def rows(self, clients: np.ndarray | None = None) -> pd.DataFrame:
+        """Filas de bureau de esos clientes (None: todas), con los dtypes originales."""
+        if clients is None:
+            idx = slice(None)
+        else:
+            clients = np.unique(clients)
+            pos = np.searchsorted(self._clients, clients)
+            ok = pos < len(self._clients)
+            pos = pos[ok]
+            pos = pos[np.asarray(self._clients[pos]) == clients[ok]]
+            idx = _ranges(np.asarray(self._offsets[pos]), np.asarray(self._offsets[pos + 1]))
+        data = {}
+        for c in self.meta["columns"]:
+            v = np.asarray(self._arrays[c][idx])
+            if c in self.meta["categories"]:
+                v = pd.Categorical.from_codes(v, categories=self.meta["categories"][c])
+            data[c] = v
+        return pd.DataFrame(data)
+
+
+class AggregateState:
+    """Estado incremental completo: tablas hijas, mapa SK_ID_PREV -> SK_ID_CURR y filas de bureau."""
+
+    def __init__(self, state_dir: str | Path = STATE_DIR):
+        self.dir = Path(state_dir)
+        self.meta = _read_json(self.dir / "meta.json")
+        if self.meta.get("format") != STATE_FORMAT:
+            raise FileNotFoundError(f"No hay estado agregado en {self.dir.resolve()}: ejecuta update_features.py --init.")
+        self.aggregates = {name: KeyedAggregate(self.dir / name, name) for name in STATE_SPECS}
+        self.bureau = BureauRows(self.dir / "bureau")
+        self._prev_ids = np.load(self.dir / "prev_map" / "SK_ID_PREV.npy", mmap_mode="r")
+        self._prev_clients = np.load(self.dir / "prev_map" / "SK_ID_CURR.npy", mmap_mode="r")
+
+    @classmethod
+    def build(
+        cls,
+        raw_dir: str | Path,
+        state_dir: str | Path = STATE_DIR,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+    ) -> "AggregateState":
+        """
+        Recorre las tablas crudas una vez (igual que build_dataset --streaming)
+        y guarda el estado. Se escribe aparte y reemplaza al anterior al final.
+        """
+        raw_dir, state_dir = Path(raw_dir), Path(state_dir)
+        tmp = state_dir.with_name(state_dir.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        # Mismos dtypes que build_dataset --streaming (sin downcast)
+        manifest = {"previous_application": {"columns": ["SK_ID_PREV", "SK_ID_CURR"]}, **features_bureau.COLUMNS}
+        tables = load_raw_tables(raw_dir, manifest=manifest, lazy=True)
+        prev_map = build_prev_map(tables["previous_application"])
+        order = np.argsort(prev_map["SK_ID_PREV"].to_numpy(), kind="stable")
+        (tmp / "prev_map").mkdir()
+        for c in ["SK_ID_PREV", "SK_ID_CURR"]:
+            np.save(tmp / "prev_map" / f"{c}.npy", prev_map[c].to_numpy()[order])
+        BureauRows.write(tmp / "bureau", tables["bureau"])
+        tables.release("previous_application", "bureau")
+
+        rows = {}
+        for name, spec in STATE_SPECS.items():
+            path = raw_dir / RAW_FILES[spec["table"]]
+            columns = _raw_columns(name, path)
+            state = KeyedAggregate(tmp / name, name)
+            agg = status = None
+            n = 0
+            for chunk in iter_parquet_chunks(path, columns, batch_rows):
+                if agg is None:
+                    raw_dtypes = {c: chunk[c].dtype.str for c in columns}
+                df = _prepare(name, chunk, prev_map if spec["key"] == "SK_ID_CURR" else None)
+                if agg is None:
+                    agg, status = state._new(_stats(name, df))
+                agg.update(df)
+                if status is not None:
+                    status.update(df)
+                n += len(chunk)
+            if agg is None:
+                raise ValueError(f"{path} no tiene filas.")
+            stats = {c: list(s) for c, s in agg.stats.items()}
+            state.save(agg, status, {"table": spec["table"], "columns": columns, "raw_dtypes": raw_dtypes, "stats": stats})
+            rows[spec["table"]] = n
+            del agg, status
+
+        meta = {
+            "format": STATE_FORMAT,
+            "raw_dir": str(raw_dir.resolve()),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "rows": rows,
+            "parents": {t: _file_signature(raw_dir / RAW_FILES[t]) for t in PARENT_TABLES},
+            "deltas": [],
+        }
+        _write_json_atomic(tmp / "meta.json", meta)
+
+        old = state_dir.with_name(state_dir.name + ".old")
+        if state_dir.exists():
+            os.replace(state_dir, old)
+        os.replace(tmp, state_dir)
+        shutil.rmtree(old, ignore_errors=True)
+        return cls(state_dir)
+
+    def check_parents(self, raw_dir: str | Path) -> None:
+        """Error si previous_application o bureau cambiaron desde --init."""
+        raw_dir = Path(raw_dir)
+        for t in PARENT_TABLES:
+            if _file_signature(raw_dir / RAW_FILES[t]) != self.meta["parents"][t]:
+                raise ValueError(f"{RAW_FILES[t]} cambió desde que se construyó el estado: reconstruirlo con --init.")
+
+    def prev_map_for(self, prev_ids: pd.Series) -> pd.DataFrame:
+        """Las filas del mapa SK_ID_PREV -> SK_ID_CURR para esos SK_ID_PREV (mismo orden relativo)."""
+        ids = np.unique(prev_ids.dropna().to_numpy())
+        lo = np.searchsorted(self._prev_ids, ids, side="left")
+        hi = np.searchsorted(self._prev_ids, ids, side="right")
+        idx = _ranges(lo, hi)
+        return pd.DataFrame({"SK_ID_PREV": self._prev_ids[idx], "SK_ID_CURR": self._prev_clients[idx]})
+
+    def _read_delta(self, name: str, path: Path, batch_rows: int) -> list[pd.DataFrame]:
+        """Lotes del delta con los dtypes que tendría la tabla completa (original + delta)."""
+        import pyarrow.parquet as pq
+
+        meta = self.aggregates[name].meta
+        table = meta["table"]
+        missing = [c for c in meta["columns"] if c not in pq.read_schema(path).names]
+        if missing:
+            raise ValueError(f"El delta de {table} no tiene las columnas {missing}.")
+        chunks = []
+        for chunk in iter_parquet_chunks(path, meta["columns"], batch_rows):
+            for c, dtype in meta["raw_dtypes"].items():
+                dtype = np.dtype(dtype)
+                if chunk[c].dtype == dtype:
+                    continue
+                # p. ej. int64 sin nulos en el delta y float64 (con nulos) en la tabla: se lee como float64
+                if not np.can_cast(chunk[c].dtype, dtype):
+                    raise ValueError(
+                        f"{table}.{c} es {chunk[c].dtype} en el delta y {dtype} en el estado "
+                        "(¿nulos en una columna entera?): reconstruir con --init."
+                    )
+                chunk[c] = chunk[c].astype(dtype)
+            chunks.append(chunk)
+        return chunks
+
+    def apply(self, table: str, path: str | Path, batch_rows: int = DEFAULT_BATCH_ROWS) -> dict:
+        """
+        Agrega las filas de un delta al estado. Devuelve
+        {"builder", "filas", "claves", "features"}: features son las filas
+        recalculadas (una por cliente afectado) del builder inst/pos/cc/bureau.
+        """
+        if table not in DELTA_TABLES:
+            raise ValueError(
+                f"Deltas soportados: {', '.join(DELTA_TABLES)}. Filas nuevas de {table} requieren reconstruir con --init."
+            )
+        path = Path(path)
+        name = DELTA_TABLES[table]
+        state = self.aggregates[name]
+        sha = file_sha256(path)
+        if sha in state.meta.get("deltas", []) or any(d["sha256"] == sha for d in self.meta["deltas"]):
+            raise ValueError(f"{path} ya se aplicó al estado.")
+        key = state.spec["key"]
+        chunks = self._read_delta(name, path, batch_rows)
+        frames = [_prepare(name, c, self.prev_map_for(c["SK_ID_PREV"]) if key == "SK_ID_CURR" else None) for c in chunks]
+        frames = [df for df in frames if len(df)]
+        keys = np.unique(np.concatenate([df[key].to_numpy(dtype=np.float64) for df in frames])) if frames else np.zeros(0)
+
+        agg, status = state.load(keys)
+        for df in frames:
+            agg.update(df)
+            if status is not None:
+                status.update(df)
+        if len(keys):
+            # El hash del delta se publica junto con el segmento: no se puede aplicar dos veces
+            state.save(agg, status, {"deltas": [*state.meta.get("deltas", []), sha]})
+
+        if name == "bb":
+            builder = "bureau"
+            features = self.bureau_features(self.bureau.clients_of(keys))
+        else:
+            builder = name
+            features = state.features(agg, status)
+
+        self.meta["deltas"].append(
+            {
+                "tabla": table,
+                "archivo": str(path.resolve()),
+                "sha256": sha,
+                "filas": int(sum(len(c) for c in chunks)),
+                "claves": int(len(keys)),
+                "aplicado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+        )
+        _write_json_atomic(self.dir / "meta.json", self.meta)
+        return {"builder": builder, "filas": self.meta["deltas"][-1]["filas"], "claves": int(len(keys)), "features": features}
+
+    def bureau_features(self, clients: np.ndarray | None = None) -> pd.DataFrame:
+        """bureau_* de esos clientes (None: todos) desde las filas de bureau y el estado bb."""
+        b = self.bureau.rows(clients)
+        bb = self.aggregates["bb"]
+        agg, status = bb.load(None if clients is None else b["SK_ID_BUREAU"].to_numpy())
+        return features_bureau._client_features(b, bb.features(agg, status))
+
+    def features(self, builder: str) -> pd.DataFrame:
+        """Tabla completa de un builder (inst, pos, cc o bureau) desde el estado."""
+        if builder == "bureau":
+            return self.bureau_features()
+        state = self.aggregates[builder]
+        return state.features(*state.load())
+
+
+def complete_counts(rows: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """
+    Completa las columnas de conteo (pos_status__*, bureau_active__*) que no
+    aparecen en `rows` porque ningún cliente afectado tiene esa categoría:
+    valen 0 si el cliente tiene algún conteo del grupo y NaN si no tiene ninguno.
+    """
+    out = {}
+    for prefix in COUNT_PREFIXES:
+        builder = prefix.split("_")[0] + "_"
+        wanted = [c for c in columns if c.startswith(prefix) and c not in rows.columns]
+        # Solo las columnas del builder que generó estas filas
+        if not wanted or not any(c.startswith(builder) for c in rows.columns):
+            continue
+        have = [c for c in rows.columns if c.startswith(prefix)]
+        present = rows[have].notna().any(axis=1) if have else pd.Series(False, index=rows.index)
+        for c in wanted:
+            out[c] = np.where(present, 0.0, np.nan)
+    return rows.assign(**out) if out else rows
@@ -0,0 +1,66 @@
+"""
+Ensamblado final del dataset: application + tablas de features por cliente.
+
+Equivale a
+    df = base.merge(app, on=key, how="left")
+    for feat in features: df = df.merge(feat, on=key, how="left")
+pero sin copiar el frame cada vez más ancho en cada merge: para cada tabla
+de features se calcula una sola vez la posición de cada id de la base
+(searchsorted sobre sus claves ordenadas) y todas las columnas se reúnen con
+un take en una sola pasada, construyendo el DataFrame de salida una vez.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+
+def row_positions(ids: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Fila de `keys` (claves únicas) para cada id; -1 si no está."""
+    if len(keys) == 0:
+        return np.full(len(ids), -1, dtype=np.intp)
+    sorter = None if (keys[1:] > keys[:-1]).all() else np.argsort(keys, kind="stable")
+    sorted_keys = keys if sorter is None else keys[sorter]
+    if (sorted_keys[1:] == sorted_keys[:-1]).any():
+        raise ValueError("Las claves de una tabla de features deben ser únicas.")
+
+    pos = np.searchsorted(sorted_keys, ids)
+    pos[pos == len(sorted_keys)] = 0
+    found = sorted_keys[pos] == ids
+    rows = pos if sorter is None else sorter[pos]
+    return np.where(found, rows, -1)
+
+
+def _values(s: pd.Series):
+    # ndarray para dtypes de NumPy; ExtensionArray (category, etc.) para el resto
+    return s.to_numpy() if isinstance(s.dtype, np.dtype) else s.array
+
+
+def assemble_features(app: pd.DataFrame, features: list[pd.DataFrame], key: str = "SK_ID_CURR") -> pd.DataFrame:
+    """
+    Une application (base de clientes) con las tablas de features (una fila
+    por cliente). Mismas filas, columnas y dtypes que la cadena de merges
+    left: las columnas enteras sin match pasan a float64 y las bool a object.
+    """
+    if key not in app.columns:
+        raise ValueError(f"application debe tener {key}.")
+    if not app[key].is_unique:
+        # Ids repetidos en application: se conserva la semántica del merge original
+        app = app[[key]].drop_duplicates().merge(app, on=key, how="left")
+
+    ids = app[key].to_numpy()
+    data = {c: _values(app[c]) for c in app.columns}
+
+    for feat in features:
+        rows = row_positions(ids, feat[key].to_numpy())
+        missing = (rows < 0).any()
+        for c in feat.columns:
+            if c == key:
+                continue
+            if c in data:
+                raise ValueError(f"Columna repetida entre tablas de features: {c}")
+            values = _values(feat[c])
+            data[c] = take(values, rows, allow_fill=True) if missing else values.take(rows)
+
+    return pd.DataFrame(data, index=pd.RangeIndex(len(ids)))
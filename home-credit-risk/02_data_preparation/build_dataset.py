@@ -1,57 +1,330 @@
 from __future__ import annotations
 
+import argparse
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
 
-from data_io import load_raw_tables, save_parquet, ensure_dir
+from assemble import assemble_features
+from feature_cache import FeatureCache
+from feature_store import write_feature_store
+from data_io import (
+    RAW_FILES,
+    ensure_dir,
+    load_raw_tables,
+    merge_manifests,
+    peak_rss_mb,
+    resolve_columns,
+    save_parquet,
+)
+from feature_manifest import load_required, wants
+import features_previous
+import features_installments
+import features_pos_cash
+import features_credit_card
+import features_bureau
 from features_previous import build_prev_map, previous_application_features
-from features_installments import installments_features
-from features_pos_cash import pos_cash_features
-from features_credit_card import credit_card_features
-from features_bureau import bureau_features
+from features_installments import installments_features, installments_features_streaming
+from features_pos_cash import pos_cash_features, pos_cash_features_streaming
+from features_credit_card import credit_card_features, credit_card_features_streaming
+from features_bureau import bureau_features, bureau_features_streaming, needs_bureau_balance
+from streaming_agg import DEFAULT_BATCH_ROWS
 
 
 ARTIFACTS_DIR = Path("artifacts")
 PROCESSED_DIR = Path("data/processed")
+CACHE_DIR = PROCESSED_DIR / "feature_cache"
+FEATURE_STORE_DIR = ARTIFACTS_DIR / "feature_store"
+# Row groups del dataset: train.py --mode sgd lo lee por partes sin decodificarlo completo
+DATASET_ROW_GROUP_ROWS = 16_384
+CODE_DIR = Path(__file__).resolve().parent
 
+# Módulo de features de cada builder y prefijo de sus columnas de salida
+BUILDER_FEATURES = {
+    "prev": features_previous,
+    "inst": features_installments,
+    "pos": features_pos_cash,
+    "cc": features_credit_card,
+    "bureau": features_bureau,
+}
+BUILDER_PREFIX = {"prev": "prev_", "inst": "inst_", "pos": "pos_", "cc": "cc_", "bureau": "bureau_"}
+# Builders que llegan a SK_ID_CURR a través de SK_ID_PREV
+NEEDS_PREV_MAP = {"inst", "pos", "cc"}
+PREV_MAP_MANIFEST = {"previous_application": {"columns": ["SK_ID_PREV", "SK_ID_CURR"]}}
 
-def main() -> None:
-    tables = load_raw_tables("data/raw")
 
-    app = tables["application"].copy()
-    prev = tables["previous_application"]
-    bureau = tables["bureau"]
-    bureau_balance = tables["bureau_balance"]
-    cc = tables["credit_card_balance"]
-    inst = tables["installments_payments"]
-    pos = tables["pos_cash_balance"]
+def active_builders(required: set[str] | None) -> list[str]:
+    """Builders con alguna salida pedida (todos sin manifiesto), en el orden del dataset."""
+    return [name for name in BUILDER_FEATURES if wants(required, BUILDER_PREFIX[name])]
 
-    if "SK_ID_CURR" not in app.columns:
-        raise ValueError("application_.parquet debe tener SK_ID_CURR.")
 
-    # Base de clientes
-    base = app[["SK_ID_CURR"]].drop_duplicates().copy()
+def column_manifest(required: set[str] | None) -> dict:
+    """
+    Columnas a leer por tabla. Sin manifiesto (required=None) application se
+    lee completa (todas sus columnas son features del modelo) y cada módulo
+    declara sus COLUMNS; con manifiesto, application se limita a las
+    columnas pedidas y cada módulo a su input_manifest(required). Las
+    tablas de builders omitidos quedan sin columnas.
+    """
+    builders = active_builders(required)
+    app = None if required is None else {"columns": ["SK_ID_CURR", "TARGET", *sorted(required)]}
+    manifests = [{"application": app}]
+    manifests += [BUILDER_FEATURES[name].input_manifest(required) for name in builders]
+    if NEEDS_PREV_MAP.intersection(builders):
+        manifests.append(PREV_MAP_MANIFEST)
+    out = merge_manifests(*manifests)
+    for table in RAW_FILES:
+        out.setdefault(table, {"columns": []})
+    return out
+
+
+# Solo se leen las columnas que usan los módulos de features.
+COLUMN_MANIFEST = column_manifest(None)
+CHILD_TABLES = [t for t in COLUMN_MANIFEST if t != "application"]
+
+# Builders de features (en el orden en que se unen al dataset) y las tablas que lee cada uno
+BUILDER_TABLES = {
+    "prev": ["previous_application"],
+    "inst": ["installments_payments"],
+    "pos": ["pos_cash_balance"],
+    "cc": ["credit_card_balance"],
+    "bureau": ["bureau", "bureau_balance"],
+}
+# Código del que depende cada builder (entra en la clave de caché)
+BUILDER_MODULES = {
+    "prev": "features_previous.py",
+    "inst": "features_installments.py",
+    "pos": "features_pos_cash.py",
+    "cc": "features_credit_card.py",
+    "bureau": "features_bureau.py",
+}
+SHARED_CODE = ["data_io.py", "agg_kernels.py", "streaming_agg.py", "feature_manifest.py"]
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Construye data/processed/dataset.parquet")
+    ap.add_argument("--raw-dir", default="data/raw")
+    ap.add_argument(
+        "--downcast",
+        action="store_true",
+        help=(
+            "Reducir int64/float64 a 32 bits en las tablas hijas (menos memoria; las medias de "
+            "columnas float32 pueden diferir en el último bit del dataset por defecto)"
+        ),
+    )
+    ap.add_argument(
+        "--eager",
+        action="store_true",
+        help="Cargar todas las tablas al inicio (por defecto se cargan bajo demanda y se liberan al usarse)",
+    )
+    ap.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Agregar las tablas hijas grandes por lotes (memoria acotada; ignora --downcast)",
+    )
+    ap.add_argument(
+        "--batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help="Filas por lote en modo --streaming",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Procesos para ejecutar los builders de features en paralelo (cada uno lee sus propios parquet)",
+    )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        help="Recalcular todas las features aunque estén en caché",
+    )
+    ap.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=2048,
+        help="Tamaño máximo de data/processed/feature_cache (se eliminan primero las entradas menos usadas)",
+    )
+    ap.add_argument(
+        "--no-feature-store",
+        action="store_true",
+        help="No escribir artifacts/feature_store (features del historial para la API)",
+    )
+    ap.add_argument(
+        "--required-features",
+        default=None,
+        help="Manifiesto de features requeridas (artifacts/feature_manifest.json de prune_features.py): "
+        "solo se leen y calculan esas columnas",
+    )
+    return ap.parse_args()
+
+
+def _release(tables, *names: str) -> None:
+    if hasattr(tables, "release"):
+        tables.release(*names)
+
+
+def build_features(
+    name: str,
+    tables,
+    prev_map: pd.DataFrame | None,
+    raw_dir: Path,
+    streaming: bool = False,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """Ejecuta un builder de features y libera sus tablas apenas termina."""
+    manifest = column_manifest(required)
+
+    def stream(table: str) -> dict:
+        path = raw_dir / RAW_FILES[table]
+        return {"columns": resolve_columns(path, manifest.get(table)), "batch_rows": batch_rows, "required": required}
+
+    if name == "prev":
+        out = previous_application_features(tables["previous_application"], required)
+    elif streaming and name == "inst":
+        out = installments_features_streaming(raw_dir / RAW_FILES["installments_payments"], prev_map, **stream("installments_payments"))
+    elif streaming and name == "pos":
+        out = pos_cash_features_streaming(raw_dir / RAW_FILES["pos_cash_balance"], prev_map, **stream("pos_cash_balance"))
+    elif streaming and name == "cc":
+        out = credit_card_features_streaming(raw_dir / RAW_FILES["credit_card_balance"], prev_map, **stream("credit_card_balance"))
+    elif streaming and name == "bureau":
+        out = bureau_features_streaming(tables["bureau"], raw_dir / RAW_FILES["bureau_balance"], **stream("bureau_balance"))
+    elif name == "inst":
+        out = installments_features(tables["installments_payments"], prev_map, required)
+    elif name == "pos":
+        out = pos_cash_features(tables["pos_cash_balance"], prev_map, required)
+    elif name == "cc":
+        out = credit_card_features(tables["credit_card_balance"], prev_map, required)
+    elif name == "bureau":
+        # bureau_balance (la tabla más grande) no se lee si ninguna salida la necesita
+        bb = tables["bureau_balance"] if needs_bureau_balance(required) else None
+        out = bureau_features(tables["bureau"], bb, required)
+    else:
+        raise ValueError(f"Builder desconocido: {name}")
+
+    _release(tables, *BUILDER_TABLES[name])
+    return out
+
 
-    # Features
-    prev_map = build_prev_map(prev)
+def _build_in_worker(
+    name: str,
+    raw_dir: Path,
+    downcast: bool,
+    streaming: bool,
+    batch_rows: int,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Punto de entrada de cada proceso: lee sus propias tablas desde parquet
+    (no se serializan DataFrames grandes entre procesos, solo el resultado agregado).
+    """
+    downcast_tables = CHILD_TABLES if downcast else []
+    tables = load_raw_tables(raw_dir, manifest=column_manifest(required), downcast=downcast_tables, lazy=True)
 
-    f_prev = previous_application_features(prev)
-    f_inst = installments_features(inst, prev_map)
-    f_pos = pos_cash_features(pos, prev_map)
-    f_cc = credit_card_features(cc, prev_map)
-    f_bureau = bureau_features(bureau, bureau_balance)
+    prev_map = None
+    if name in NEEDS_PREV_MAP:
+        # Solo las dos columnas del mapa; mismos dtypes que en el proceso principal
+        ids = load_raw_tables(raw_dir, manifest=PREV_MAP_MANIFEST, downcast=downcast_tables, lazy=True)
+        prev_map = build_prev_map(ids["previous_application"])
+        del ids
 
-    # Join
-    df = base.merge(app, on="SK_ID_CURR", how="left")
-    for feat in [f_prev, f_inst, f_pos, f_cc, f_bureau]:
-        df = df.merge(feat, on="SK_ID_CURR", how="left")
+    return build_features(name, tables, prev_map, raw_dir, streaming, batch_rows, required)
+
+
+def cache_key(cache: FeatureCache, name: str, raw_dir: Path, downcast: bool, required: set[str] | None = None) -> str:
+    """Hash de los parquet que lee el builder, su código y las opciones que afectan el resultado."""
+    tables = BUILDER_TABLES[name] + (["previous_application"] if name in NEEDS_PREV_MAP else [])
+    manifest = column_manifest(required)
+    # --streaming da el mismo resultado que sin --downcast: no entra en la clave
+    options = {"downcast": downcast, "columns": {t: manifest[t] for t in tables}}
+    if required is not None:
+        options["required"] = sorted(c for c in required if c.startswith(BUILDER_PREFIX[name]))
+    return cache.key(
+        name,
+        inputs=[raw_dir / RAW_FILES[t] for t in tables],
+        code=[CODE_DIR / f for f in [BUILDER_MODULES[name], *SHARED_CODE]],
+        options=options,
+    )
+
+
+def _builder_cost(name: str, raw_dir: Path) -> int:
+    return sum((raw_dir / RAW_FILES[t]).stat().st_size for t in BUILDER_TABLES[name])
+
+
+def main() -> None:
+    args = parse_args()
+    raw_dir = Path(args.raw_dir)
+    # Por defecto sin downcast: el dataset de entrenamiento conserva dtypes y valores
+    downcast = args.downcast and not args.streaming
+    # Con --required-features solo se leen/calculan las columnas del manifiesto
+    required = load_required(args.required_features) if args.required_features else None
+    builders = active_builders(required)
+    # En streaming las sumas se acumulan en el dtype original (resultado idéntico al de la construcción por defecto)
+    tables = load_raw_tables(
+        raw_dir,
+        manifest=column_manifest(required),
+        downcast=CHILD_TABLES if downcast else [],
+        lazy=not args.eager or args.streaming or args.jobs > 1,
+    )
+
+    # Features ya calculadas con los mismos parquet, código y opciones
+    cache = FeatureCache(CACHE_DIR, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    keys = {name: cache_key(cache, name, raw_dir, downcast, required) for name in builders}
+    features = {}
+    if not args.force:
+        for name in builders:
+            cached = cache.get(keys[name])
+            if cached is not None:
+                features[name] = cached
+    todo = [name for name in builders if name not in features]
+
+    # Features (cada tabla hija se libera apenas se agrega)
+    if args.jobs > 1 and len(todo) > 1:
+        # Los builders más pesados primero; application se lee mientras tanto
+        order = sorted(todo, key=lambda n: _builder_cost(n, raw_dir), reverse=True)
+        with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+            futures = {
+                name: ex.submit(_build_in_worker, name, raw_dir, downcast, args.streaming, args.batch_rows, required)
+                for name in order
+            }
+            app = tables["application"]
+            features.update({name: fut.result() for name, fut in futures.items()})
+    else:
+        prev_map = build_prev_map(tables["previous_application"]) if NEEDS_PREV_MAP.intersection(todo) else None
+        for name in todo:
+            features[name] = build_features(name, tables, prev_map, raw_dir, args.streaming, args.batch_rows, required)
+        del prev_map
+    _release(tables, *CHILD_TABLES)
+
+    for name in todo:
+        cache.put(keys[name], name, features[name])
+    cache.evict()
+    reused = [name for name in builders if name not in todo]
+    print(f"Features desde caché: {', '.join(reused) or '-'} | recalculadas: {', '.join(todo) or '-'}")
+    if required is not None:
+        skipped = [name for name in BUILDER_TABLES if name not in builders]
+        print(f"Manifiesto: {len(required)} features requeridas | builders omitidos: {', '.join(skipped) or '-'}")
+
+    app = tables["application"]
+    if "SK_ID_CURR" not in app.columns:
+        raise ValueError("application_.parquet debe tener SK_ID_CURR.")
+
+    # Join: base de clientes (application) + features, en una sola pasada
+    t0 = time.perf_counter()
+    history_cols = [c for name in builders for c in features[name].columns if c != "SK_ID_CURR"]
+    df = assemble_features(app, [features[name] for name in builders], key="SK_ID_CURR")
+    del app
+    _release(tables, "application")
+    print(f"Join final: {time.perf_counter() - t0:.2f} s")
 
     # Guardar dataset procesado
     ensure_dir(PROCESSED_DIR)
     out_path = PROCESSED_DIR / "dataset.parquet"
-    save_parquet(df, out_path)
+    save_parquet(df, out_path, row_group_size=DATASET_ROW_GROUP_ROWS)
 
     # Guardar schema de features (para API)
     ensure_dir(ARTIFACTS_DIR)
@@ -67,9 +340,22 @@ def main() -> None:
 
     print(f"OK: dataset guardado en {out_path}")
     print(f"OK: schema guardado en {ARTIFACTS_DIR / 'feature_schema.json'}")
+
+    # Feature store de serving: historial agregado por SK_ID_CURR (float32, memory-mapped)
+    if not args.no_feature_store:
+        store_path = write_feature_store(FEATURE_STORE_DIR, df["SK_ID_CURR"], df[history_cols])
+        print(f"OK: feature store ({len(df)} x {len(history_cols)}) guardado en {store_path}")
     if "TARGET" not in df.columns:
         print("AVISO: No encontré columna TARGET en application_.parquet (¿dataset sin etiqueta?).")
 
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Pico de memoria (RSS): {peak:.0f} MB")
+    if args.jobs > 1:
+        peak_worker = peak_rss_mb(children=True)
+        if peak_worker is not None:
+            print(f"Pico de memoria del mayor worker (RSS): {peak_worker:.0f} MB")
+
 
 if __name__ == "__main__":
     main()
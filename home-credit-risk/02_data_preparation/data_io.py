@@ -1,47 +1,221 @@
 from __future__ import annotations
 
+from collections.abc import Mapping
 from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
 import pandas as pd
 
 
 RAW_DIR_DEFAULT = Path("data/raw")
 PROCESSED_DIR_DEFAULT = Path("data/processed")
 
+RAW_FILES = {
+    "application": "application_.parquet",
+    "previous_application": "previous_application.parquet",
+    "bureau": "bureau.parquet",
+    "bureau_balance": "bureau_balance.parquet",
+    "credit_card_balance": "credit_card_balance.parquet",
+    "installments_payments": "installments_payments.parquet",
+    "pos_cash_balance": "POS_CASH_balance.parquet",
+    # "columns_desc": "HomeCredit_columns_description.parquet",  # opcional
+}
+
 
-def read_parquet(path: str | Path) -> pd.DataFrame:
+def read_parquet(
+    path: str | Path,
+    columns: list[str] | None = None,
+    categorical: Iterable[str] = (),
+) -> pd.DataFrame:
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"No existe el archivo: {path.resolve()}")
-    return pd.read_parquet(path)
 
+    categorical = [c for c in categorical if columns is None or c in columns]
+    if not categorical:
+        return pd.read_parquet(path, columns=columns)
+
+    # Lee los strings directamente como diccionario -> dtype category
+    df = pd.read_parquet(path, columns=columns, read_dictionary=categorical)
+    for c in categorical:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            # Categorías ordenadas como los strings (mismo orden que con object)
+            df[c] = df[c].cat.reorder_categories(sorted(df[c].cat.categories))
+    return df
+
+
+# ---------------------------------------------------------------------------
+# Manifiestos de columnas
+#
+# Cada módulo de features declara qué columnas usa por tabla:
+#   {"tabla": {"columns": [...], "prefixes": [...], "categorical": [...]}}
+# - columns: nombres exactos (se ignoran los que no existan en el parquet)
+# - prefixes: columnas NUMÉRICAS cuyo nombre empieza por alguno de ellos
+# - categorical: columnas string que se leen como category
+# Una tabla con manifiesto None se lee completa.
+# ---------------------------------------------------------------------------
+
+def merge_manifests(*manifests: dict) -> dict:
+    """Une los manifiestos de varios módulos (unión de columnas por tabla)."""
+    out: dict[str, dict | None] = {}
+    for m in manifests:
+        for table, spec in m.items():
+            if spec is None or (table in out and out[table] is None):
+                out[table] = None
+                continue
+            cur = out.setdefault(table, {"columns": [], "prefixes": [], "categorical": []})
+            for key in cur:
+                cur[key] = list(dict.fromkeys(cur[key] + list(spec.get(key, []))))
+    return out
+
+
+def resolve_columns(path: str | Path, spec: dict | None) -> list[str] | None:
+    """Traduce un manifiesto a la lista de columnas a leer según el schema del parquet."""
+    if spec is None:
+        return None
+
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(path)
+    wanted = set(spec.get("columns", []))
+    prefixes = tuple(spec.get("prefixes", []))
+
+    cols = []
+    for field in schema:
+        if field.name in wanted:
+            cols.append(field.name)
+        elif prefixes and field.name.startswith(prefixes) and _is_numeric_type(field.type):
+            cols.append(field.name)
+    return cols
+
+
+def _is_numeric_type(t) -> bool:
+    import pyarrow.types as pat
+
+    return pat.is_integer(t) or pat.is_floating(t) or pat.is_decimal(t) or pat.is_boolean(t)
+
+
+def downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    int64 -> int32 si el rango cabe; float64 -> float32 solo si la conversión
+    es exacta (sin pérdida de precisión). Modifica df en sitio.
+    """
+    i32 = np.iinfo(np.int32)
+    for c in df.columns:
+        s = df[c]
+        if s.dtype == np.int64:
+            if len(s) == 0 or (s.min() >= i32.min and s.max() <= i32.max):
+                df[c] = s.astype(np.int32)
+        elif s.dtype == np.float64:
+            v = s.to_numpy()
+            v32 = v.astype(np.float32)
+            if np.array_equal(v32.astype(np.float64), v, equal_nan=True):
+                df[c] = v32
+    return df
 
-def load_raw_tables(raw_dir: str | Path = RAW_DIR_DEFAULT) -> dict[str, pd.DataFrame]:
+
+def _load_table(
+    raw_dir: Path,
+    name: str,
+    manifest: dict | None,
+    downcast: bool,
+) -> pd.DataFrame:
+    path = raw_dir / RAW_FILES[name]
+    spec = manifest.get(name) if manifest is not None else None
+    cols = resolve_columns(path, spec) if manifest is not None else None
+    categorical = spec.get("categorical", []) if spec else []
+
+    df = read_parquet(path, columns=cols, categorical=categorical)
+    if downcast:
+        downcast_numeric(df)
+    return df
+
+
+class LazyTables(Mapping):
+    """
+    Tablas crudas que se leen recién al accederlas (y quedan en caché).
+    release(name) las libera cuando ya no se necesitan.
+    """
+
+    def __init__(self, raw_dir: Path, names: list[str], manifest: dict | None, downcast: set[str]):
+        self._raw_dir = raw_dir
+        self._names = names
+        self._manifest = manifest
+        self._downcast = downcast
+        self._cache: dict[str, pd.DataFrame] = {}
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._cache:
+            self._cache[name] = _load_table(self._raw_dir, name, self._manifest, name in self._downcast)
+        return self._cache[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def release(self, *names: str) -> None:
+        for name in names:
+            self._cache.pop(name, None)
+
+
+def load_raw_tables(
+    raw_dir: str | Path = RAW_DIR_DEFAULT,
+    manifest: dict | None = None,
+    downcast: bool | Iterable[str] = False,
+    lazy: bool = False,
+) -> Mapping[str, pd.DataFrame]:
+    """
+    Carga las tablas crudas.
+
+    - manifest: columnas a leer por tabla (ver merge_manifests); None = todas.
+    - downcast: reduce int64/float64 a 32 bits cuando no hay pérdida
+      (True = todas las tablas, o un iterable con los nombres de tabla).
+    - lazy: devuelve LazyTables (lectura bajo demanda) en vez de un dict.
+    """
     raw_dir = Path(raw_dir)
+    if isinstance(downcast, bool):
+        downcast = set(RAW_FILES) if downcast else set()
 
-    files = {
-        "application": raw_dir / "application_.parquet",
-        "previous_application": raw_dir / "previous_application.parquet",
-        "bureau": raw_dir / "bureau.parquet",
-        "bureau_balance": raw_dir / "bureau_balance.parquet",
-        "credit_card_balance": raw_dir / "credit_card_balance.parquet",
-        "installments_payments": raw_dir / "installments_payments.parquet",
-        "pos_cash_balance": raw_dir / "POS_CASH_balance.parquet",
-        # "columns_desc": raw_dir / "HomeCredit_columns_description.parquet",  # opcional
-    }
-
-    tables: dict[str, pd.DataFrame] = {}
-    missing = []
-    for k, p in files.items():
-        if p.exists():
-            tables[k] = read_parquet(p)
-        else:
-            missing.append(str(p))
+    missing = [str(raw_dir / f) for f in RAW_FILES.values() if not (raw_dir / f).exists()]
     if missing:
         raise FileNotFoundError(
             "Faltan archivos en data/raw/. Revisa estos:\n" + "\n".join(missing)
         )
 
-    return tables
+    tables = LazyTables(raw_dir, list(RAW_FILES), manifest, set(downcast))
+    if lazy:
+        return tables
+    return {k: tables[k] for k in tables}
+
+
+def peak_rss_mb(children: bool = False) -> float | None:
+    """
+    Pico de memoria residente del proceso (MB), si el SO lo permite.
+    children=True: pico del mayor proceso hijo ya terminado.
+    """
+    try:
+        import resource
+        import sys
+
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        # Linux reporta KB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    if children:
+        return None
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)  # Windows
+    except (ImportError, AttributeError):
+        return None
 
 
 def ensure_dir(path: str | Path) -> Path:
@@ -50,7 +224,7 @@ def ensure_dir(path: str | Path) -> Path:
     return p
 
 
-def save_parquet(df: pd.DataFrame, path: str | Path) -> None:
+def save_parquet(df: pd.DataFrame, path: str | Path, row_group_size: int | None = None) -> None:
     path = Path(path)
     ensure_dir(path.parent)
-    df.to_parquet(path, index=False)
+    df.to_parquet(path, index=False, row_group_size=row_group_size)
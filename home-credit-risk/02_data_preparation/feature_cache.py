@@ -0,0 +1,124 @@
+"""
+Caché de tablas de features en data/processed/feature_cache/.
+
+Cada entrada se identifica por un hash de:
+- el contenido de los parquet crudos que lee el builder,
+- el código que lo genera (módulo de features + utilidades compartidas),
+- las opciones que cambian el resultado (p. ej. downcast).
+
+Si nada de eso cambió, build_dataset reutiliza la tabla en vez de
+recalcularla. El hash de cada parquet se memoriza por (tamaño, mtime) para
+no releer archivos grandes que no cambiaron. Al superar max_bytes se
+eliminan las entradas usadas hace más tiempo.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+
+CACHE_FORMAT = 1
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return {}
+
+
+class FeatureCache:
+    def __init__(self, cache_dir: str | Path, max_bytes: int):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._index_path = self.dir / "index.json"
+        self._hashes_path = self.dir / "file_hashes.json"
+        self._index = _read_json(self._index_path)
+        self._hashes = _read_json(self._hashes_path)
+
+    # ----- claves -----
+
+    def content_hash(self, path: str | Path) -> str:
+        """sha256 del archivo, memorizado mientras no cambien tamaño ni mtime."""
+        path = Path(path).resolve()
+        st = path.stat()
+        memo = self._hashes.get(str(path))
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["sha256"]
+        digest = file_sha256(path)
+        self._hashes[str(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        _write_json_atomic(self._hashes_path, self._hashes)
+        return digest
+
+    def key(self, name: str, inputs: Iterable[str | Path], code: Iterable[str | Path], options: dict) -> str:
+        h = hashlib.sha256()
+        h.update(json.dumps({"format": CACHE_FORMAT, "name": name, "options": options}, sort_keys=True).encode())
+        for p in inputs:
+            h.update(b"in:" + self.content_hash(p).encode())
+        for p in code:
+            h.update(b"code:" + file_sha256(p).encode())
+        return h.hexdigest()[:32]
+
+    # ----- entradas -----
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.parquet"
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        path = self._path(key)
+        if key not in self._index or not path.exists():
+            return None
+        df = pd.read_parquet(path)
+        self._index[key]["last_used"] = time.time()
+        _write_json_atomic(self._index_path, self._index)
+        return df
+
+    def put(self, key: str, name: str, df: pd.DataFrame) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self._index[key] = {"name": name, "bytes": path.stat().st_size, "last_used": time.time()}
+        _write_json_atomic(self._index_path, self._index)
+
+    def evict(self) -> list[str]:
+        """Elimina entradas (las menos usadas primero) hasta quedar bajo max_bytes."""
+        # Entradas cuyo archivo ya no existe
+        for key in [k for k in self._index if not self._path(k).exists()]:
+            del self._index[key]
+
+        removed = []
+        total = sum(e["bytes"] for e in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            self._path(key).unlink(missing_ok=True)
+            total -= entry["bytes"]
+            removed.append(key)
+        for key in removed:
+            del self._index[key]
+        _write_json_atomic(self._index_path, self._index)
+        return removed
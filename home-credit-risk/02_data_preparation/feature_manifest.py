@@ -0,0 +1,79 @@
+"""
+Manifiesto de features requeridas ("required outputs").
+
+03_modeling/prune_features.py escribe artifacts/feature_manifest.json con las
+columnas del dataset que el modelo realmente usa. build_dataset.py
+--required-features lo pasa a cada módulo de features como un set de
+nombres de salida y cada módulo:
+- calcula solo los estadísticos (columna, stat) pedidos (stats_plan);
+- omite conteos por categoría, tablas y builders completos sin salidas
+  pedidas;
+- lee del parquet solo las columnas de origen de esas salidas
+  (source_columns + su input_manifest).
+required=None significa "todas": el resultado es el de siempre.
+
+Los nombres de salida siguen el patrón de group_stats:
+{prefijo}_{columna}_{stat}, más {prefijo}_count y los conteos
+{prefijo}_{algo}__{categoría}.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+
+def load_required(path: str | Path) -> set[str]:
+    """Columnas requeridas de un manifiesto (feature_manifest.json o un feature_schema.json)."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el manifiesto de features: {path.resolve()}")
+    data = json.loads(path.read_text(encoding="utf-8"))
+    cols = data.get("feature_cols")
+    if not isinstance(cols, list) or not cols:
+        raise ValueError(f"{path} no tiene una lista feature_cols.")
+    return set(cols)
+
+
+def wants(required: set[str] | None, *prefixes: str) -> bool:
+    """¿Hay alguna salida pedida con alguno de estos prefijos? (siempre True sin manifiesto)."""
+    return required is None or any(c.startswith(prefixes) for c in required)
+
+
+def stats_plan(
+    prefix: str,
+    columns: list[str],
+    stats: tuple[str, ...],
+    required: set[str] | None,
+) -> dict[str, tuple[str, ...]]:
+    """{columna: estadísticos} a calcular; las columnas sin ninguno quedan fuera."""
+    plan = {}
+    for c in columns:
+        keep = tuple(s for s in stats if required is None or f"{prefix}_{c}_{s}" in required)
+        if keep:
+            plan[c] = keep
+    return plan
+
+
+def source_columns(required: set[str] | None, prefix: str, stats: tuple[str, ...]) -> set[str] | None:
+    """Columnas de origen de las salidas {prefix}_{columna}_{stat} pedidas (None: todas)."""
+    if required is None:
+        return None
+    head = f"{prefix}_"
+    out = set()
+    for name in required:
+        if not name.startswith(head):
+            continue
+        for s in stats:
+            tail = f"_{s}"
+            if name.endswith(tail) and len(name) > len(head) + len(tail):
+                out.add(name[len(head) : -len(tail)])
+    return out
+
+
+def select_outputs(out: pd.DataFrame, required: set[str] | None, key: str = "SK_ID_CURR") -> pd.DataFrame:
+    """Deja la clave y las columnas pedidas (en su orden original)."""
+    if required is None:
+        return out
+    return out[[c for c in out.columns if c == key or c in required]]
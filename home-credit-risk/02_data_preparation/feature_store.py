@@ -0,0 +1,252 @@
+"""
+Feature store de serving: las features agregadas del historial (prev_*,
+inst_*, pos_*, cc_*, bureau_*) de cada SK_ID_CURR, para que la API las
+complete cuando el request solo trae los campos de application.
+
+Formato (artifacts/feature_store/):
+    CURRENT                 nombre de la versión activa (se reemplaza atómicamente)
+    <versión>/ids.npy       SK_ID_CURR ordenados (int64)
+    <versión>/features.f32  matriz float32 (n_ids x n_features), fila por cliente
+    <versión>/meta.json     columnas, forma y fecha de construcción
+
+La API abre la matriz con np.memmap (sin copiarla a memoria) y busca cada id
+con searchsorted sobre ids.npy (O(log n)); la fila es una vista de la matriz.
+Una versión nueva se escribe completa en su propia carpeta y recién entonces
+se publica en CURRENT, así que un servidor en marcha nunca ve una a medias.
+patch_feature_store arma una versión nueva copiando la actual y
+reemplazando solo las filas de los clientes actualizados (ver
+02_data_preparation/update_features.py).
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+STORE_FORMAT = 1
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+
+
+def write_feature_store(
+    store_dir: str | Path,
+    ids: pd.Series,
+    features: pd.DataFrame,
+    keep: int = KEEP_VERSIONS,
+) -> Path:
+    """
+    Escribe una versión nueva del store y la publica en CURRENT.
+    `features` debe estar alineado con `ids` (una fila por cliente).
+    Conserva las últimas `keep` versiones y elimina las anteriores.
+    """
+    store_dir = Path(store_dir)
+    ids = ids.to_numpy()
+    if len(ids) != len(features):
+        raise ValueError("ids y features deben tener el mismo número de filas.")
+    if pd.isna(ids).any():
+        raise ValueError("SK_ID_CURR no puede tener nulos en el feature store.")
+    ids = ids.astype(np.int64)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    if (ids[1:] == ids[:-1]).any():
+        raise ValueError("SK_ID_CURR repetidos: el feature store necesita un id por fila.")
+
+    version = _new_version()
+    path = store_dir / version
+    path.mkdir(parents=True, exist_ok=False)
+
+    np.save(path / "ids.npy", ids)
+    columns = list(features.columns)
+    mm = np.memmap(path / "features.f32", dtype=np.float32, mode="w+", shape=(len(ids), len(columns)))
+    # Columna por columna: nunca se materializa la matriz completa en float64
+    for j, c in enumerate(columns):
+        mm[:, j] = features[c].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    mm.flush()
+    del mm
+
+    meta = {
+        "format": STORE_FORMAT,
+        "version": version,
+        "id_col": "SK_ID_CURR",
+        "columns": columns,
+        "n_rows": int(len(ids)),
+        "dtype": "float32",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    (path / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    _publish(store_dir, version, keep)
+    return path
+
+
+def patch_feature_store(
+    store_dir: str | Path,
+    updates: list[pd.DataFrame],
+    keep: int = KEEP_VERSIONS,
+) -> tuple[Path, int] | None:
+    """
+    Versión nueva del store igual a la actual salvo las filas de `updates`
+    (DataFrames con SK_ID_CURR y columnas del store). Solo se escriben las
+    columnas que existen en el store; los ids que no están se ignoran.
+    Devuelve (carpeta, filas reemplazadas), o None si no hay versión publicada.
+    """
+    store_dir = Path(store_dir)
+    current = FeatureStore.open_current(store_dir)
+    if current is None:
+        return None
+
+    version = _new_version()
+    path = store_dir / version
+    path.mkdir(parents=True, exist_ok=False)
+    shutil.copyfile(store_dir / current.version / "ids.npy", path / "ids.npy")
+    shutil.copyfile(store_dir / current.version / "features.f32", path / "features.f32")
+
+    mm = np.memmap(path / "features.f32", dtype=np.float32, mode="r+", shape=current.matrix.shape)
+    col_pos = {c: j for j, c in enumerate(current.columns)}
+    patched = set()
+    for rows in updates:
+        pos = current.positions(rows["SK_ID_CURR"].to_numpy(dtype=np.int64))
+        hit = pos >= 0
+        for c in rows.columns:
+            if c in col_pos:
+                mm[pos[hit], col_pos[c]] = rows[c].to_numpy(dtype=np.float64, na_value=np.nan)[hit]
+        patched.update(pos[hit].tolist())
+    mm.flush()
+    del mm
+
+    meta = {
+        **current.meta,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "base_version": current.version,
+        "patched_rows": len(patched),
+    }
+    (path / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    del current
+    _publish(store_dir, version, keep)
+    return path, len(patched)
+
+
+def _new_version() -> str:
+    # Ordenable por fecha de construcción (las versiones viejas se eliminan por nombre)
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000_000:09d}"
+
+
+def _publish(store_dir: Path, version: str, keep: int) -> None:
+    """Publica la versión en CURRENT (atómico) y elimina las viejas."""
+    tmp = store_dir / (CURRENT_FILE + ".tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, store_dir / CURRENT_FILE)
+
+    versions = sorted(p for p in store_dir.iterdir() if p.is_dir())
+    for old in versions[:-keep] if keep > 0 else []:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def current_version(store_dir: str | Path) -> str | None:
+    p = Path(store_dir) / CURRENT_FILE
+    if not p.exists():
+        return None
+    return p.read_text(encoding="utf-8").strip() or None
+
+
+class FeatureStore:
+    """Una versión del store abierta en modo lectura (memory-mapped)."""
+
+    def __init__(self, path: str | Path):
+        path = Path(path)
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if self.meta.get("format") != STORE_FORMAT:
+            raise ValueError(f"Formato de feature store no soportado: {self.meta.get('format')}")
+        self.version: str = self.meta["version"]
+        self.columns: List[str] = self.meta["columns"]
+        self.ids = np.load(path / "ids.npy", mmap_mode="r")
+        n = self.meta["n_rows"]
+        self.matrix = np.memmap(path / "features.f32", dtype=np.float32, mode="r", shape=(n, len(self.columns)))
+
+    @classmethod
+    def open_current(cls, store_dir: str | Path) -> "FeatureStore | None":
+        version = current_version(store_dir)
+        return None if version is None else cls(Path(store_dir) / version)
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def positions(self, ids: np.ndarray) -> np.ndarray:
+        """Fila de cada id en la matriz; -1 si el cliente no tiene historial."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(ids.shape, -1, dtype=np.intp)
+        pos = np.searchsorted(self.ids, ids)
+        pos[pos == len(self)] = 0
+        return np.where(self.ids[pos] == ids, pos, -1)
+
+    def row(self, sk_id: int) -> np.ndarray | None:
+        """Vista (sin copia) de la fila del cliente, o None si no está."""
+        pos = int(np.searchsorted(self.ids, sk_id))
+        if pos < len(self) and int(self.ids[pos]) == sk_id:
+            return self.matrix[pos]
+        return None
+
+    def fill_record(self, data: Dict[str, Any], id_col: str = "SK_ID_CURR") -> Dict[str, Any]:
+        """
+        Completa un request con las features del historial del cliente.
+        Los valores que trae el request tienen prioridad; solo se agregan
+        las features ausentes o nulas.
+        """
+        sk_id = _as_id(data.get(id_col))
+        row = None if sk_id is None else self.row(sk_id)
+        if row is None:
+            return data
+
+        out = dict(data)
+        for c, v in zip(self.columns, row.tolist()):
+            if _is_missing(out.get(c)):
+                out[c] = v
+        return out
+
+    def fill_frame(self, x: pd.DataFrame, id_col: str = "SK_ID_CURR") -> pd.DataFrame:
+        """Versión por lotes de fill_record (una búsqueda vectorizada para todo el lote)."""
+        if id_col not in x.columns or len(x) == 0:
+            return x
+        ids = pd.to_numeric(x[id_col], errors="coerce")
+        known = ids.notna().to_numpy()
+        pos = np.full(len(x), -1, dtype=np.intp)
+        pos[known] = self.positions(ids[known].to_numpy(dtype=np.int64))
+        hit = pos >= 0
+        if not hit.any():
+            return x
+
+        values = np.full((len(x), len(self.columns)), np.nan, dtype=np.float64)
+        values[hit] = self.matrix[pos[hit]]
+        history = pd.DataFrame(values, columns=self.columns, index=x.index)
+
+        # El request manda sobre el historial: solo se completan celdas nulas
+        filled = {c: x[c].where(x[c].notna(), history[c]) for c in self.columns if c in x.columns}
+        added = [c for c in self.columns if c not in x.columns]
+        x = x.assign(**filled) if filled else x
+        return pd.concat([x, history[added]], axis=1) if added else x
+
+
+def _is_missing(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+def _as_id(value: Any) -> int | None:
+    if value is None:
+        return None
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not np.isfinite(f) or f != int(f):
+        return None
+    return int(f)
@@ -1,84 +1,186 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import pandas as pd
 
+from agg_kernels import count_by_category, group_stats
+from feature_manifest import select_outputs, source_columns, stats_plan, wants
+from streaming_agg import DEFAULT_BATCH_ROWS, StreamingCounts, StreamingGroupStats, iter_parquet_chunks
+
+
+# Columnas que usa este módulo (ver data_io.merge_manifests)
+COLUMNS = {
+    "bureau": {
+        "columns": ["SK_ID_CURR", "SK_ID_BUREAU", "CREDIT_ACTIVE"],
+        "prefixes": ["AMT_", "DAYS_", "CREDIT_"],
+        "categorical": ["CREDIT_ACTIVE"],
+    },
+    "bureau_balance": {
+        "columns": ["SK_ID_BUREAU", "MONTHS_BALANCE", "STATUS"],
+        "categorical": ["STATUS"],
+    },
+}
+
+
+# Nombres históricos de los agregados de MONTHS_BALANCE por SK_ID_BUREAU
+BB_MONTHS_COLUMNS = {"bb_MONTHS_BALANCE_min": "bb_months_min", "bb_MONTHS_BALANCE_max": "bb_months_max"}
+BB_COLUMNS = ["bb_count", "bb_months_min", "bb_months_max"]
+AGG_STATS = ("mean", "max", "min")
+
+
+def _bb_required(required: set[str] | None) -> set[str] | None:
+    """Columnas de bureau_balance agregado (bb_*) que necesitan las salidas pedidas."""
+    if required is None:
+        return None
+    return {c for c in source_columns(required, "bureau", AGG_STATS) if c in BB_COLUMNS}
 
-def bureau_features(bureau: pd.DataFrame, bureau_balance: pd.DataFrame) -> pd.DataFrame:
+
+def input_manifest(required: set[str] | None) -> dict:
+    """
+    COLUMNS reducido a lo que necesitan las salidas pedidas (None: todas).
+    Si ninguna sale de bureau_balance, de esa tabla solo queda la clave (no se lee).
+    """
+    if required is None:
+        return COLUMNS
+    cols = ["SK_ID_CURR", "SK_ID_BUREAU"]
+    if wants(required, "bureau_active__"):
+        cols.append("CREDIT_ACTIVE")
+    cols += sorted(c for c in source_columns(required, "bureau", AGG_STATS) if c not in BB_COLUMNS)
+    bb_cols = ["SK_ID_BUREAU"]
+    if _bb_required(required) & {"bb_months_min", "bb_months_max"}:
+        bb_cols.append("MONTHS_BALANCE")
+    return {
+        "bureau": {"columns": cols, "categorical": ["CREDIT_ACTIVE"]},
+        "bureau_balance": {"columns": bb_cols},
+    }
+
+
+def needs_bureau_balance(required: set[str] | None) -> bool:
+    return required is None or bool(_bb_required(required))
+
+
+def bureau_features(
+    bureau: pd.DataFrame,
+    bureau_balance: pd.DataFrame | None,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
     """
     bureau + bureau_balance:
     - bureau_balance agrega por SK_ID_BUREAU
     - se une a bureau
     - se agrega por SK_ID_CURR
+    bureau_balance puede ser None si needs_bureau_balance(required) es False.
     """
-    b = bureau.copy()
-    bb = bureau_balance.copy()
+    _check_bureau(bureau)
+    bb_feat = bureau_balance_features(bureau_balance, _bb_required(required)) if needs_bureau_balance(required) else None
+    return _client_features(bureau, bb_feat, required)
 
+
+def _check_bureau(b: pd.DataFrame) -> None:
     if "SK_ID_BUREAU" not in b.columns or "SK_ID_CURR" not in b.columns:
         raise ValueError("bureau debe tener SK_ID_BUREAU y SK_ID_CURR.")
+
+
+def _status_columns(counts: pd.DataFrame) -> pd.DataFrame:
+    counts.columns = [f"bb_status__{str(c).lower()}" for c in counts.columns]
+    return counts
+
+
+def _bb_count_values(bb_columns) -> str:
+    return "MONTHS_BALANCE" if "MONTHS_BALANCE" in bb_columns else bb_columns[0]
+
+
+def _months_plan(bb_required: set[str] | None) -> dict[str, tuple[str, ...]]:
+    stats = tuple(s for s in ("min", "max") if bb_required is None or f"bb_months_{s}" in bb_required)
+    return {"MONTHS_BALANCE": stats}
+
+
+def bureau_balance_features(bureau_balance: pd.DataFrame, bb_required: set[str] | None = None) -> pd.DataFrame:
+    """
+    1) Agregar bureau_balance por bureau (SK_ID_BUREAU).
+    bb_required: columnas bb_* a calcular (None: todas, con los conteos de STATUS).
+    """
+    bb = bureau_balance
     if "SK_ID_BUREAU" not in bb.columns:
         raise ValueError("bureau_balance debe tener SK_ID_BUREAU.")
 
-    # 1) Agregar bureau_balance por bureau
-    bb_grp = bb.groupby("SK_ID_BUREAU", observed=True)
-    bb_feat = pd.DataFrame(index=bb_grp.size().index)
-    bb_feat["bb_count"] = bb_grp.size()
-
-    if "MONTHS_BALANCE" in bb.columns:
-        s = bb_grp["MONTHS_BALANCE"]
-        bb_feat["bb_months_min"] = s.min()
-        bb_feat["bb_months_max"] = s.max()
+    months = [c for c in ["MONTHS_BALANCE"] if c in bb.columns]
+    bb_feat = group_stats(bb, "SK_ID_BUREAU", months, _months_plan(bb_required), prefix="bb").rename(columns=BB_MONTHS_COLUMNS)
 
-    if "STATUS" in bb.columns:
+    # Los conteos de STATUS no llegan al agregado por cliente: solo sin manifiesto
+    if "STATUS" in bb.columns and bb_required is None:
         # Conteos de estados
-        counts = (
-            bb.pivot_table(
-                index="SK_ID_BUREAU",
-                columns="STATUS",
-                values="MONTHS_BALANCE" if "MONTHS_BALANCE" in bb.columns else bb.columns[0],
-                aggfunc="count",
-                fill_value=0,
-            )
-        )
-        counts.columns = [f"bb_status__{str(c).lower()}" for c in counts.columns]
-        bb_feat = bb_feat.join(counts, how="left")
-
-    bb_feat = bb_feat.reset_index()
-
+        counts = count_by_category(bb, "SK_ID_BUREAU", "STATUS", _bb_count_values(bb.columns))
+        bb_feat = bb_feat.join(_status_columns(counts), how="left")
+
+    return bb_feat.reset_index()
+
+
+def bureau_balance_features_streaming(
+    path: str | Path,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    bb_required: set[str] | None = None,
+) -> pd.DataFrame:
+    """Igual que bureau_balance_features, leyendo el parquet por lotes."""
+    agg = status = None
+    for bb in iter_parquet_chunks(path, columns, batch_rows):
+        if agg is None:
+            if "SK_ID_BUREAU" not in bb.columns:
+                raise ValueError("bureau_balance debe tener SK_ID_BUREAU.")
+            agg = StreamingGroupStats("SK_ID_BUREAU", _months_plan(bb_required))
+            if bb_required is None:
+                status = StreamingCounts("SK_ID_BUREAU", "STATUS", _bb_count_values(bb.columns))
+        agg.update(bb)
+        if status is not None:
+            status.update(bb)
+    if agg is None:
+        raise ValueError(f"{path} no tiene filas.")
+
+    bb_feat = agg.to_frame(prefix="bb").rename(columns=BB_MONTHS_COLUMNS)
+
+    counts = status.finalize() if status is not None else None
+    if counts is not None:
+        bb_feat = bb_feat.join(_status_columns(counts), how="left")
+
+    return bb_feat.reset_index()
+
+
+def bureau_features_streaming(
+    bureau: pd.DataFrame,
+    bureau_balance_path: str | Path,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """bureau_features con bureau_balance (la tabla grande) agregada por lotes."""
+    _check_bureau(bureau)
+    bb_feat = None
+    if needs_bureau_balance(required):
+        bb_feat = bureau_balance_features_streaming(bureau_balance_path, columns, batch_rows, _bb_required(required))
+    return _client_features(bureau, bb_feat, required)
+
+
+def _client_features(b: pd.DataFrame, bb_feat: pd.DataFrame | None, required: set[str] | None = None) -> pd.DataFrame:
     # 2) Unir a bureau
-    b2 = b.merge(bb_feat, on="SK_ID_BUREAU", how="left")
+    b2 = b.merge(bb_feat, on="SK_ID_BUREAU", how="left") if bb_feat is not None else b
 
     # 3) Agregar por cliente
-    grp = b2.groupby("SK_ID_CURR", observed=True)
-    out = pd.DataFrame(index=grp.size().index)
-    out["bureau_count"] = grp.size()
-
    # Selección segura: SOLO columnas numéricas reales
     candidate_cols = [c for c in b2.columns if c.startswith(("AMT_", "DAYS_", "CREDIT_"))]
-    candidate_cols += [c for c in ["bb_count", "bb_months_min", "bb_months_max"] if c in b2.columns]
+    candidate_cols += [c for c in BB_COLUMNS if c in b2.columns]
     candidate_cols = list(dict.fromkeys(candidate_cols))
 
     num_cols = [c for c in candidate_cols if pd.api.types.is_numeric_dtype(b2[c])]
 
-    for c in num_cols:
-        s = grp[c]
-        out[f"bureau_{c}_mean"] = s.mean()
-        out[f"bureau_{c}_max"] = s.max()
-        out[f"bureau_{c}_min"] = s.min()
-
+    out = group_stats(b2, "SK_ID_CURR", num_cols, stats_plan("bureau", num_cols, AGG_STATS, required), prefix="bureau")
 
     # Si existe CREDIT_ACTIVE, conteos
-    if "CREDIT_ACTIVE" in b2.columns:
-        counts = (
-            b2.pivot_table(
-                index="SK_ID_CURR",
-                columns="CREDIT_ACTIVE",
-                values="SK_ID_BUREAU",
-                aggfunc="count",
-                fill_value=0,
-            )
-        )
+    if "CREDIT_ACTIVE" in b2.columns and wants(required, "bureau_active__"):
+        counts = count_by_category(b2, "SK_ID_CURR", "CREDIT_ACTIVE", "SK_ID_BUREAU")
         counts.columns = [f"bureau_active__{str(c).lower().replace(' ', '_')}" for c in counts.columns]
         out = out.join(counts, how="left")
 
     out = out.reset_index()
-    return out
+    return select_outputs(out, required)
@@ -1,18 +1,39 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import pandas as pd
 
+from agg_kernels import group_stats
+from feature_manifest import select_outputs, source_columns, stats_plan
+from streaming_agg import DEFAULT_BATCH_ROWS, StreamingGroupStats, iter_parquet_chunks
+
+
+# Columnas que usa este módulo (ver data_io.merge_manifests)
+COLUMNS = {
+    "credit_card_balance": {
+        "columns": ["SK_ID_PREV", "SK_ID_CURR", "MONTHS_BALANCE"],
+        "prefixes": ["AMT_", "CNT_"],
+    },
+}
+
+
+AGG_STATS = ("mean", "max", "min")
+
+
+def input_manifest(required: set[str] | None) -> dict:
+    """COLUMNS reducido a lo que necesitan las salidas pedidas (None: todas)."""
+    if required is None:
+        return COLUMNS
+    cols = ["SK_ID_PREV", "SK_ID_CURR", *sorted(source_columns(required, "cc", AGG_STATS))]
+    return {"credit_card_balance": {"columns": cols}}
 
-def credit_card_features(credit_card: pd.DataFrame, prev_map: pd.DataFrame) -> pd.DataFrame:
-    """
-    credit_card_balance -> features por SK_ID_CURR (via SK_ID_PREV).
-    """
-    df = credit_card.copy()
 
-    if "SK_ID_PREV" not in df.columns:
+def _prepare_credit_card(credit_card: pd.DataFrame, prev_map: pd.DataFrame) -> pd.DataFrame:
+    if "SK_ID_PREV" not in credit_card.columns:
         raise ValueError("credit_card_balance debe tener SK_ID_PREV.")
 
-    df = df.merge(prev_map, on="SK_ID_PREV", how="left", suffixes=("", "_prev"))
+    df = credit_card.merge(prev_map, on="SK_ID_PREV", how="left", suffixes=("", "_prev"))
 
     # Normalizar SK_ID_CURR
     if "SK_ID_CURR" not in df.columns:
@@ -23,18 +44,45 @@ def credit_card_features(credit_card: pd.DataFrame, prev_map: pd.DataFrame) -> p
                 f"No se pudo generar SK_ID_CURR en CC. Columnas post-merge: {list(df.columns)}"
             )
 
-    df = df[df["SK_ID_CURR"].notna()].copy()
+    return df[df["SK_ID_CURR"].notna()]
 
-    grp = df.groupby("SK_ID_CURR", observed=True)
-    out = pd.DataFrame(index=grp.size().index)
-    out["cc_count"] = grp.size()
 
+def _num_like(df: pd.DataFrame) -> list[str]:
     # Columnas numéricas típicas
-    num_like = [c for c in df.columns if c.startswith("AMT_") or c.startswith("CNT_") or c in ["MONTHS_BALANCE"]]
-    for c in num_like:
-        s = grp[c]
-        out[f"cc_{c}_mean"] = s.mean()
-        out[f"cc_{c}_max"] = s.max()
-        out[f"cc_{c}_min"] = s.min()
-
-    return out.reset_index()
+    return [c for c in df.columns if c.startswith("AMT_") or c.startswith("CNT_") or c in ["MONTHS_BALANCE"]]
+
+
+def credit_card_features(
+    credit_card: pd.DataFrame,
+    prev_map: pd.DataFrame,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """
+    credit_card_balance -> features por SK_ID_CURR (via SK_ID_PREV).
+    """
+    df = _prepare_credit_card(credit_card, prev_map)
+
+    cols = _num_like(df)
+    out = group_stats(df, "SK_ID_CURR", cols, stats_plan("cc", cols, AGG_STATS, required), prefix="cc")
+
+    return select_outputs(out.reset_index(), required)
+
+
+def credit_card_features_streaming(
+    path: str | Path,
+    prev_map: pd.DataFrame,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """Igual que credit_card_features, leyendo el parquet por lotes."""
+    agg = None
+    for chunk in iter_parquet_chunks(path, columns, batch_rows):
+        df = _prepare_credit_card(chunk, prev_map)
+        if agg is None:
+            agg = StreamingGroupStats("SK_ID_CURR", stats_plan("cc", _num_like(df), AGG_STATS, required))
+        agg.update(df)
+    if agg is None:
+        raise ValueError(f"{path} no tiene filas.")
+
+    return select_outputs(agg.to_frame(prefix="cc").reset_index(), required)
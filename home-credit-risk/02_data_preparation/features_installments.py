@@ -1,20 +1,64 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 
+from agg_kernels import group_stats
+from feature_manifest import select_outputs, source_columns, stats_plan
+from streaming_agg import DEFAULT_BATCH_ROWS, StreamingGroupStats, iter_parquet_chunks
 
-def installments_features(installments: pd.DataFrame, prev_map: pd.DataFrame) -> pd.DataFrame:
-    """
-    installments_payments -> features por SK_ID_CURR.
-    Usa previous_application como puente.
-    """
-    df = installments.copy()
 
-    if "SK_ID_PREV" not in df.columns:
+# Columnas que usa este módulo (ver data_io.merge_manifests)
+COLUMNS = {
+    "installments_payments": {
+        "columns": [
+            "SK_ID_PREV",
+            "SK_ID_CURR",
+            "AMT_PAYMENT",
+            "AMT_INSTALMENT",
+            "DAYS_ENTRY_PAYMENT",
+            "DAYS_INSTALMENT",
+        ],
+    },
+}
+
+AGG_COLUMNS = [
+    "AMT_PAYMENT",
+    "AMT_INSTALMENT",
+    "inst_pay_ratio",
+    "inst_pay_diff",
+    "inst_days_late",
+    "inst_is_late",
+]
+AGG_STATS = ("mean", "max", "sum")
+# Columnas crudas de las que sale cada columna derivada
+DERIVED_SOURCES = {
+    "inst_pay_ratio": ["AMT_PAYMENT", "AMT_INSTALMENT"],
+    "inst_pay_diff": ["AMT_PAYMENT", "AMT_INSTALMENT"],
+    "inst_days_late": ["DAYS_ENTRY_PAYMENT", "DAYS_INSTALMENT"],
+    "inst_is_late": ["DAYS_ENTRY_PAYMENT", "DAYS_INSTALMENT"],
+}
+
+
+def input_manifest(required: set[str] | None) -> dict:
+    """COLUMNS reducido a lo que necesitan las salidas pedidas (None: todas)."""
+    if required is None:
+        return COLUMNS
+    cols = ["SK_ID_PREV", "SK_ID_CURR"]
+    for c in source_columns(required, "inst", AGG_STATS):
+        cols += DERIVED_SOURCES.get(c, [c])
+    return {"installments_payments": {"columns": list(dict.fromkeys(cols))}}
+
+
+def _prepare_installments(installments: pd.DataFrame, prev_map: pd.DataFrame) -> pd.DataFrame:
+    """Une con prev_map, filtra clientes y calcula las columnas derivadas por fila."""
+    if "SK_ID_PREV" not in installments.columns:
         raise ValueError("installments_payments debe tener SK_ID_PREV.")
 
-    df = df.merge(prev_map, on="SK_ID_PREV", how="left", suffixes=("", "_prev"))
+    # merge ya devuelve un DataFrame nuevo: no hace falta copiar la entrada
+    df = installments.merge(prev_map, on="SK_ID_PREV", how="left", suffixes=("", "_prev"))
 
     # Si por alguna razón quedó con sufijo, lo normalizamos
     if "SK_ID_CURR" not in df.columns:
@@ -30,30 +74,44 @@ def installments_features(installments: pd.DataFrame, prev_map: pd.DataFrame) ->
 
     # ----- FEATURES -----
     if "AMT_PAYMENT" in df.columns and "AMT_INSTALMENT" in df.columns:
-        df["inst_pay_ratio"] = df["AMT_PAYMENT"] / df["AMT_INSTALMENT"].replace(0, pd.NA)
+        # np.nan (no pd.NA) para que la columna siga siendo float y no object
+        df["inst_pay_ratio"] = df["AMT_PAYMENT"] / df["AMT_INSTALMENT"].replace(0, np.nan)
         df["inst_pay_diff"] = df["AMT_PAYMENT"] - df["AMT_INSTALMENT"]
 
     if "DAYS_ENTRY_PAYMENT" in df.columns and "DAYS_INSTALMENT" in df.columns:
         df["inst_days_late"] = df["DAYS_ENTRY_PAYMENT"] - df["DAYS_INSTALMENT"]
         df["inst_is_late"] = (df["inst_days_late"] > 0).astype("int8")
 
-    grp = df.groupby("SK_ID_CURR", observed=True)
-
-    out = pd.DataFrame(index=grp.size().index)
-    out["inst_count"] = grp.size()
-
-    for c in [
-        "AMT_PAYMENT",
-        "AMT_INSTALMENT",
-        "inst_pay_ratio",
-        "inst_pay_diff",
-        "inst_days_late",
-        "inst_is_late",
-    ]:
-        if c in df.columns:
-            s = grp[c]
-            out[f"inst_{c}_mean"] = s.mean()
-            out[f"inst_{c}_max"] = s.max()
-            out[f"inst_{c}_sum"] = s.sum()
-
-    return out.reset_index()
+    return df
+
+
+def installments_features(
+    installments: pd.DataFrame,
+    prev_map: pd.DataFrame,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """
+    installments_payments -> features por SK_ID_CURR.
+    Usa previous_application como puente.
+    """
+    df = _prepare_installments(installments, prev_map)
+
+    cols = [c for c in AGG_COLUMNS if c in df.columns]
+    out = group_stats(df, "SK_ID_CURR", cols, stats_plan("inst", cols, AGG_STATS, required), prefix="inst")
+
+    return select_outputs(out.reset_index(), required)
+
+
+def installments_features_streaming(
+    path: str | Path,
+    prev_map: pd.DataFrame,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """Igual que installments_features, leyendo el parquet por lotes."""
+    agg = StreamingGroupStats("SK_ID_CURR", stats_plan("inst", AGG_COLUMNS, AGG_STATS, required))
+    for chunk in iter_parquet_chunks(path, columns, batch_rows):
+        agg.update(_prepare_installments(chunk, prev_map))
+
+    return select_outputs(agg.to_frame(prefix="inst").reset_index(), required)
@@ -1,14 +1,43 @@
 from __future__ import annotations
+
+from pathlib import Path
+
 import pandas as pd
 
+from agg_kernels import count_by_category, group_stats
+from feature_manifest import select_outputs, source_columns, stats_plan, wants
+from streaming_agg import DEFAULT_BATCH_ROWS, StreamingCounts, StreamingGroupStats, iter_parquet_chunks
+
+
+# Columnas que usa este módulo (ver data_io.merge_manifests)
+COLUMNS = {
+    "pos_cash_balance": {
+        "columns": ["SK_ID_PREV", "SK_ID_CURR", "MONTHS_BALANCE", "SK_DPD", "SK_DPD_DEF", "NAME_CONTRACT_STATUS"],
+        "categorical": ["NAME_CONTRACT_STATUS"],
+    },
+}
+
 
-def pos_cash_features(pos_cash: pd.DataFrame, prev_map: pd.DataFrame) -> pd.DataFrame:
-    df = pos_cash.copy()
+AGG_COLUMNS = ["MONTHS_BALANCE", "SK_DPD", "SK_DPD_DEF"]
+AGG_STATS = ("mean", "max", "min")
 
-    if "SK_ID_PREV" not in df.columns:
+
+def input_manifest(required: set[str] | None) -> dict:
+    """COLUMNS reducido a lo que necesitan las salidas pedidas (None: todas)."""
+    if required is None:
+        return COLUMNS
+    cols = ["SK_ID_PREV", "SK_ID_CURR"]
+    if wants(required, "pos_status__"):
+        cols.append("NAME_CONTRACT_STATUS")
+    cols += [c for c in AGG_COLUMNS if c in source_columns(required, "pos", AGG_STATS)]
+    return {"pos_cash_balance": {"columns": cols, "categorical": ["NAME_CONTRACT_STATUS"]}}
+
+
+def _prepare_pos_cash(pos_cash: pd.DataFrame, prev_map: pd.DataFrame) -> pd.DataFrame:
+    if "SK_ID_PREV" not in pos_cash.columns:
         raise ValueError("POS_CASH_balance debe tener SK_ID_PREV.")
 
-    df = df.merge(prev_map, on="SK_ID_PREV", how="left", suffixes=("", "_prev"))
+    df = pos_cash.merge(prev_map, on="SK_ID_PREV", how="left", suffixes=("", "_prev"))
 
     # Normalizar SK_ID_CURR
     if "SK_ID_CURR" not in df.columns:
@@ -19,31 +48,52 @@ def pos_cash_features(pos_cash: pd.DataFrame, prev_map: pd.DataFrame) -> pd.Data
                 f"No se pudo generar SK_ID_CURR en POS. Columnas post-merge: {list(df.columns)}"
             )
 
-    df = df[df["SK_ID_CURR"].notna()].copy()
-
-    grp = df.groupby("SK_ID_CURR", observed=True)
-    out = pd.DataFrame(index=grp.size().index)
-    out["pos_count"] = grp.size()
-
-    for c in ["MONTHS_BALANCE", "SK_DPD", "SK_DPD_DEF"]:
-        if c in df.columns:
-            s = grp[c]
-            out[f"pos_{c}_mean"] = s.mean()
-            out[f"pos_{c}_max"] = s.max()
-            out[f"pos_{c}_min"] = s.min()
-
-    if "NAME_CONTRACT_STATUS" in df.columns:
-        counts = (
-            df.pivot_table(
-                index="SK_ID_CURR",
-                columns="NAME_CONTRACT_STATUS",
-                values="SK_ID_PREV",
-                aggfunc="count",
-                fill_value=0,
-            )
-        )
-        counts.columns = [f"pos_status__{str(c).lower().replace(' ', '_')}" for c in counts.columns]
-        out = out.join(counts, how="left")
+    return df[df["SK_ID_CURR"].notna()]
+
+
+def _status_columns(counts: pd.DataFrame) -> pd.DataFrame:
+    counts.columns = [f"pos_status__{str(c).lower().replace(' ', '_')}" for c in counts.columns]
+    return counts
+
+
+def pos_cash_features(
+    pos_cash: pd.DataFrame,
+    prev_map: pd.DataFrame,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    df = _prepare_pos_cash(pos_cash, prev_map)
+
+    cols = [c for c in AGG_COLUMNS if c in df.columns]
+    out = group_stats(df, "SK_ID_CURR", cols, stats_plan("pos", cols, AGG_STATS, required), prefix="pos")
+
+    if "NAME_CONTRACT_STATUS" in df.columns and wants(required, "pos_status__"):
+        counts = count_by_category(df, "SK_ID_CURR", "NAME_CONTRACT_STATUS", "SK_ID_PREV")
+        out = out.join(_status_columns(counts), how="left")
+
+    return select_outputs(out.reset_index(), required)
+
+
+def pos_cash_features_streaming(
+    path: str | Path,
+    prev_map: pd.DataFrame,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """Igual que pos_cash_features, leyendo el parquet por lotes."""
+    agg = StreamingGroupStats("SK_ID_CURR", stats_plan("pos", AGG_COLUMNS, AGG_STATS, required))
+    status = StreamingCounts("SK_ID_CURR", "NAME_CONTRACT_STATUS", "SK_ID_PREV") if wants(required, "pos_status__") else None
+    for chunk in iter_parquet_chunks(path, columns, batch_rows):
+        df = _prepare_pos_cash(chunk, prev_map)
+        agg.update(df)
+        if status is not None:
+            status.update(df)
+
+    out = agg.to_frame(prefix="pos")
+
+    counts = status.finalize() if status is not None else None
+    if counts is not None:
+        out = out.join(_status_columns(counts), how="left")
 
-    return out.reset_index()
+    return select_outputs(out.reset_index(), required)
 
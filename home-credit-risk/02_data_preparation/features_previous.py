@@ -3,6 +3,31 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 
+from agg_kernels import count_by_category, group_stats
+from feature_manifest import select_outputs, source_columns, stats_plan, wants
+
+
+# Columnas que usa este módulo (ver data_io.merge_manifests)
+COLUMNS = {
+    "previous_application": {
+        "columns": ["SK_ID_PREV", "SK_ID_CURR", "NAME_CONTRACT_STATUS"],
+        "prefixes": ["AMT_", "DAYS_"],
+        "categorical": ["NAME_CONTRACT_STATUS"],
+    },
+}
+AGG_STATS = ("mean", "max", "min")
+
+
+def input_manifest(required: set[str] | None) -> dict:
+    """COLUMNS reducido a lo que necesitan las salidas pedidas (None: todas)."""
+    if required is None:
+        return COLUMNS
+    cols = ["SK_ID_PREV", "SK_ID_CURR"]
+    if wants(required, "prev_status__"):
+        cols.append("NAME_CONTRACT_STATUS")
+    cols += sorted(source_columns(required, "prev", AGG_STATS))
+    return {"previous_application": {"columns": cols, "categorical": ["NAME_CONTRACT_STATUS"]}}
+
 
 def build_prev_map(previous_application: pd.DataFrame) -> pd.DataFrame:
     """
@@ -24,40 +49,27 @@ def build_prev_map(previous_application: pd.DataFrame) -> pd.DataFrame:
 
 
 
-def previous_application_features(previous_application: pd.DataFrame) -> pd.DataFrame:
-    """Agregaciones por cliente desde previous_application."""
-    df = previous_application.copy()
+def previous_application_features(
+    previous_application: pd.DataFrame,
+    required: set[str] | None = None,
+) -> pd.DataFrame:
+    """Agregaciones por cliente desde previous_application (required: ver feature_manifest)."""
+    df = previous_application
 
     if "SK_ID_CURR" not in df.columns:
         raise ValueError("previous_application debe tener SK_ID_CURR.")
 
-    # Contadores simples por cliente
-    grp = df.groupby("SK_ID_CURR", observed=True)
-
-    out = pd.DataFrame(index=grp.size().index)
-    out["prev_app_count"] = grp.size()
-
-    # Ejemplos robustos (si existen columnas típicas)
+    # Contadores simples por cliente y ejemplos robustos (si existen columnas típicas)
     num_cols = [c for c in df.columns if c.startswith("AMT_") or c.startswith("DAYS_")]
-    for c in num_cols:
-        s = grp[c]
-        out[f"prev_{c}_mean"] = s.mean()
-        out[f"prev_{c}_max"] = s.max()
-        out[f"prev_{c}_min"] = s.min()
+    plan = stats_plan("prev", num_cols, AGG_STATS, required)
+    out = group_stats(df, "SK_ID_CURR", num_cols, plan, prefix="prev", count_name="prev_app_count")
 
     # Si existe NAME_CONTRACT_STATUS, hacemos conteos por estado
-    if "NAME_CONTRACT_STATUS" in df.columns:
-        counts = (
-            df.pivot_table(
-                index="SK_ID_CURR",
-                columns="NAME_CONTRACT_STATUS",
-                values="SK_ID_PREV" if "SK_ID_PREV" in df.columns else df.columns[0],
-                aggfunc="count",
-                fill_value=0,
-            )
-        )
+    if "NAME_CONTRACT_STATUS" in df.columns and wants(required, "prev_status__"):
+        values = "SK_ID_PREV" if "SK_ID_PREV" in df.columns else df.columns[0]
+        counts = count_by_category(df, "SK_ID_CURR", "NAME_CONTRACT_STATUS", values)
         counts.columns = [f"prev_status__{str(c).lower().replace(' ', '_')}" for c in counts.columns]
         out = out.join(counts, how="left")
 
     out = out.reset_index()
-    return out
+    return select_outputs(out, required)
@@ -0,0 +1,404 @@
+"""
+Agregación por bloques (streaming) para las tablas hijas grandes.
+
+El parquet se lee por lotes de filas (dentro de cada row group) y por cada
+clave se mantiene un estado agregable: filas, nobs, suma, mínimo y máximo.
+La memoria queda acotada por el tamaño del lote y el número de claves, no
+por el tamaño de la tabla.
+
+Las sumas replican la suma compensada (Kahan) que usa pandas en
+groupby().sum()/mean(), fila a fila y en el mismo orden, así que el
+resultado es idéntico bit a bit al camino en memoria.
+
+export_state/from_state permiten guardar ese estado y seguir acumulando
+más tarde (ver aggregate_state.py): continuar con filas nuevas da lo mismo
+que haber procesado la tabla original seguida de esas filas.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from agg_kernels import count_by_category, fits_dtype
+
+
+DEFAULT_BATCH_ROWS = 500_000
+
+
+def _int_columns_with_nulls(pf, columns: list[str] | None) -> list[str]:
+    """
+    Columnas enteras con nulos en algún row group: pandas las lee como float64
+    al cargar la tabla completa, así que cada lote debe usar el mismo dtype.
+    """
+    import pyarrow.types as pat
+
+    schema = pf.schema_arrow
+    names = columns if columns is not None else schema.names
+    out = []
+    for name in names:
+        if not pat.is_integer(schema.field(name).type):
+            continue
+        j = pf.schema_arrow.get_field_index(name)
+        for i in range(pf.metadata.num_row_groups):
+            stats = pf.metadata.row_group(i).column(j).statistics
+            if stats is not None and stats.has_null_count:
+                has_nulls = stats.null_count > 0
+            else:
+                has_nulls = pf.read_row_group(i, columns=[name]).column(0).null_count > 0
+            if has_nulls:
+                out.append(name)
+                break
+    return out
+
+
+def iter_parquet_chunks(
+    path: str | Path,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Lee el parquet lote a lote, con los mismos dtypes que pd.read_parquet."""
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el archivo: {path.resolve()}")
+
+    pf = pq.ParquetFile(path)
+    as_float = _int_columns_with_nulls(pf, columns)
+    for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+        df = batch.to_pandas()
+        for c in as_float:
+            df[c] = df[c].astype(np.float64)
+        yield df
+
+
+def iter_parquet_row_groups(
+    path: str | Path,
+    columns: list[str] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Como iter_parquet_chunks, pero lee un row group completo por vez y lo
+    parte en lotes de hasta batch_rows filas. Para archivos escritos en row
+    groups chicos (dataset.parquet) el pico de memoria es bastante menor que
+    con iter_batches, que pre-carga y concatena entre row groups.
+    """
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el archivo: {path.resolve()}")
+
+    pf = pq.ParquetFile(path)
+    as_float = _int_columns_with_nulls(pf, columns)
+    for i in range(pf.metadata.num_row_groups):
+        table = pf.read_row_group(i, columns=columns)
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            df = batch.to_pandas()
+            for c in as_float:
+                df[c] = df[c].astype(np.float64)
+            yield df
+        del table
+
+
+def _occurrence_steps(codes: np.ndarray) -> Iterator[np.ndarray]:
+    """
+    Recorre las filas de un lote agrupadas por "k-ésima aparición de su clave":
+    en cada paso cada clave aparece a lo sumo una vez y, para una misma clave,
+    los pasos respetan el orden original de las filas.
+    """
+    n = len(codes)
+    if n == 0:
+        return
+    order = np.argsort(codes, kind="stable")
+    sc = codes[order]
+    starts = np.flatnonzero(np.r_[True, sc[1:] != sc[:-1]])
+    rank = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+
+    by_rank = np.argsort(rank, kind="stable")
+    rows = order[by_rank]
+    r = rank[by_rank]
+    bounds = np.flatnonzero(np.r_[True, r[1:] != r[:-1], True])
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        yield rows[a:b]
+
+
+class _KeyIndex:
+    """Asigna a cada clave un slot estable a medida que aparecen lotes nuevos."""
+
+    def __init__(self):
+        self.index = pd.Index([], dtype=np.float64)
+        self.key_dtype: np.dtype | None = None
+
+    def codes(self, keys: np.ndarray) -> np.ndarray:
+        self.key_dtype = keys.dtype if self.key_dtype is None else np.result_type(self.key_dtype, keys.dtype)
+        k = keys.astype(np.float64, copy=False)
+        codes = self.index.get_indexer(k)
+        new = codes < 0
+        if new.any():
+            self.index = self.index.append(pd.Index(pd.unique(k[new])))
+            codes = self.index.get_indexer(k)
+        return codes
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def sorted_keys(self, name: str) -> tuple[np.ndarray, pd.Index]:
+        """(orden de slots, índice ordenado como groupby(sort=True))."""
+        order = np.argsort(self.index.to_numpy(), kind="stable")
+        keys = self.index.to_numpy()[order].astype(self.key_dtype or np.float64)
+        return order, pd.Index(keys, name=name)
+
+
+def _grow(a: np.ndarray, n: int, fill) -> np.ndarray:
+    if len(a) >= n:
+        return a
+    out = np.full(max(n, 2 * len(a)), fill, dtype=a.dtype)
+    out[: len(a)] = a
+    return out
+
+
+class StreamingGroupStats:
+    """
+    Estadísticos por clave sobre lotes sucesivos.
+    stats: {columna: ("mean", "max", "min", "sum", ...)}
+    """
+
+    # Campos del estado por columna (además del dtype)
+    STATE_FIELDS = ("nobs", "sumx", "comp", "isum", "max", "min")
+
+    def __init__(self, key: str, stats: dict[str, tuple[str, ...]]):
+        self.key = key
+        self.stats = stats
+        self._keys = _KeyIndex()
+        self._size = np.zeros(0, dtype=np.int64)
+        self._cols: dict[str, dict] = {}
+
+    def export_state(self) -> tuple[np.ndarray, str, dict[str, np.ndarray], dict[str, str]]:
+        """
+        (claves como float64 en orden de slot, dtype de la clave,
+        {"size" | "columna__campo": array}, {columna: dtype}): el estado
+        acumulado, para persistirlo.
+        """
+        n = len(self._keys)
+        arrays = {"size": self._size[:n]}
+        for col, st in self._cols.items():
+            for f in self.STATE_FIELDS:
+                arrays[f"{col}__{f}"] = st[f][:n]
+        dtypes = {col: st["dtype"].str for col, st in self._cols.items()}
+        key_dtype = np.dtype(self._keys.key_dtype or np.float64).str
+        return self._keys.index.to_numpy(), key_dtype, arrays, dtypes
+
+    @classmethod
+    def from_state(
+        cls,
+        key: str,
+        stats: dict[str, tuple[str, ...]],
+        keys: np.ndarray,
+        arrays: dict[str, np.ndarray],
+        dtypes: dict[str, str],
+        key_dtype: str | None,
+    ) -> "StreamingGroupStats":
+        """Reconstruye un acumulador desde export_state (o un subconjunto de sus claves)."""
+        agg = cls(key, stats)
+        agg._keys.index = pd.Index(np.asarray(keys, dtype=np.float64))
+        agg._keys.key_dtype = None if key_dtype is None else np.dtype(key_dtype)
+        agg._size = np.array(arrays["size"], dtype=np.int64)
+        for col, dtype in dtypes.items():
+            st = agg._state(col, np.dtype(dtype))
+            for f in cls.STATE_FIELDS:
+                st[f] = np.array(arrays[f"{col}__{f}"], dtype=st[f].dtype)
+        return agg
+
+    def _state(self, col: str, dtype: np.dtype) -> dict:
+        st = self._cols.get(col)
+        if st is None:
+            is_float = dtype.kind == "f"
+            acc = dtype if is_float else np.dtype(np.float64)
+            st = {
+                "dtype": dtype,
+                "nobs": np.zeros(0, dtype=np.int64),
+                "sumx": np.zeros(0, dtype=acc),
+                "comp": np.zeros(0, dtype=acc),
+                "isum": np.zeros(0, dtype=np.int64),
+                "max": np.zeros(0, dtype=acc if is_float else np.int64),
+                "min": np.zeros(0, dtype=acc if is_float else np.int64),
+            }
+            self._cols[col] = st
+        elif st["dtype"] != dtype:
+            raise ValueError(f"La columna {col} cambió de dtype entre lotes ({st['dtype']} -> {dtype}).")
+        return st
+
+    def _resize(self, n: int) -> None:
+        self._size = _grow(self._size, n, 0)
+        for st in self._cols.values():
+            st["nobs"] = _grow(st["nobs"], n, 0)
+            st["sumx"] = _grow(st["sumx"], n, 0)
+            st["comp"] = _grow(st["comp"], n, 0)
+            st["isum"] = _grow(st["isum"], n, 0)
+            if st["max"].dtype.kind == "f":
+                st["max"] = _grow(st["max"], n, -np.inf)
+                st["min"] = _grow(st["min"], n, np.inf)
+            else:
+                st["max"] = _grow(st["max"], n, np.iinfo(np.int64).min)
+                st["min"] = _grow(st["min"], n, np.iinfo(np.int64).max)
+
+    def update(self, df: pd.DataFrame) -> None:
+        codes = self._keys.codes(df[self.key].to_numpy())
+        for col in self.stats:
+            if col in df.columns:
+                self._state(col, df[col].dtype)
+        self._resize(len(self._keys))
+        np.add.at(self._size, codes, 1)
+
+        for col in self.stats:
+            if col not in df.columns:
+                continue
+            st = self._cols[col]
+            v = df[col].to_numpy()
+            if st["dtype"].kind == "f":
+                self._update_float(st, codes, v)
+            else:
+                self._update_int(st, codes, v)
+
+    @staticmethod
+    def _update_int(st: dict, codes: np.ndarray, v: np.ndarray) -> None:
+        # Enteros: suma/max/min exactos (no dependen del orden)
+        v64 = v.astype(np.int64)
+        np.add.at(st["nobs"], codes, 1)
+        np.add.at(st["isum"], codes, v64)
+        np.maximum.at(st["max"], codes, v64)
+        np.minimum.at(st["min"], codes, v64)
+        # mean en pandas: float64 + suma compensada, fila a fila
+        StreamingGroupStats._kahan(st, codes, v.astype(np.float64), track=False)
+
+    @staticmethod
+    def _update_float(st: dict, codes: np.ndarray, v: np.ndarray) -> None:
+        ok = ~np.isnan(v)
+        np.add.at(st["nobs"], codes, ok)
+        StreamingGroupStats._kahan(st, codes, v, track=True)
+
+    @staticmethod
+    def _kahan(st: dict, codes: np.ndarray, v: np.ndarray, track: bool) -> None:
+        sumx, comp, mx, mn = st["sumx"], st["comp"], st["max"], st["min"]
+        for rows in _occurrence_steps(codes):
+            lab = codes[rows]
+            val = v[rows]
+            ok = ~np.isnan(val)
+            if not ok.all():
+                lab, val = lab[ok], val[ok]
+            # Mismo orden de operaciones que group_sum/group_mean de pandas
+            s = sumx[lab]
+            y = val - comp[lab]
+            t = s + y
+            c = t - s - y
+            c[np.isnan(c)] = 0
+            comp[lab] = c
+            sumx[lab] = t
+            if track:
+                cur = mx[lab]
+                mx[lab] = np.where(val > cur, val, cur)
+                cur = mn[lab]
+                mn[lab] = np.where(val < cur, val, cur)
+
+    def finalize(self) -> tuple[pd.Index, pd.Series, dict[tuple[str, str], pd.Series]]:
+        """(índice ordenado, tamaño por clave, {(columna, stat): Series})."""
+        order, index = self._keys.sorted_keys(self.key)
+        size = pd.Series(self._size[order], index=index)
+
+        out: dict[tuple[str, str], pd.Series] = {}
+        for col, stats in self.stats.items():
+            st = self._cols.get(col)
+            if st is None:
+                continue
+            dtype = st["dtype"]
+            is_float = dtype.kind == "f"
+            nobs = st["nobs"][order]
+            for stat in stats:
+                if stat == "mean":
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        v = st["sumx"][order] / nobs.astype(st["sumx"].dtype)
+                    v[nobs == 0] = np.nan
+                elif stat == "sum":
+                    v = st["sumx"][order] if is_float else st["isum"][order]
+                    if dtype.kind == "i" and fits_dtype(v, dtype):
+                        v = v.astype(dtype)  # como groupby().sum() de pandas
+                elif stat in ("max", "min"):
+                    v = st[stat][order]
+                    if is_float:
+                        v = np.where(nobs == 0, np.nan, v)
+                    v = v.astype(dtype)
+                else:
+                    raise ValueError(f"Estadístico no soportado: {stat}")
+                out[(col, stat)] = pd.Series(v, index=index)
+        return index, size, out
+
+    def to_frame(self, prefix: str, count_name: str | None = None) -> pd.DataFrame:
+        """Mismo layout que agg_kernels.group_stats: conteo y luego {prefix}_{col}_{stat}."""
+        index, size, stats = self.finalize()
+        data = {count_name or f"{prefix}_count": size}
+        for (col, stat), v in stats.items():
+            data[f"{prefix}_{col}_{stat}"] = v
+        return pd.DataFrame(data, index=index)
+
+
+class StreamingCounts:
+    """Equivalente por lotes de pivot_table(index=key, columns=cat, values=..., aggfunc="count")."""
+
+    def __init__(self, key: str, column: str, values: str):
+        self.key = key
+        self.column = column
+        self.values = values
+        self._key_dtype: np.dtype | None = None
+        self._acc: pd.DataFrame | None = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        if self.column not in df.columns:
+            return
+        dt = df[self.key].dtype
+        self._key_dtype = dt if self._key_dtype is None else np.result_type(self._key_dtype, dt)
+        part = count_by_category(df, self.key, self.column, self.values)
+        part.index = part.index.astype(np.float64)
+        part.columns = part.columns.astype(object)
+        self._acc = part if self._acc is None else self._acc.add(part, fill_value=0)
+
+    def export_state(self) -> tuple[np.ndarray, list, np.ndarray] | None:
+        """(claves como float64, categorías, conteos int64) acumulados; None si no hubo lotes."""
+        if self._acc is None:
+            return None
+        acc = self._acc.fillna(0)
+        return acc.index.to_numpy(dtype=np.float64), list(acc.columns), acc.to_numpy(dtype=np.int64)
+
+    @classmethod
+    def from_state(
+        cls,
+        key: str,
+        column: str,
+        values: str,
+        keys: np.ndarray,
+        categories: list,
+        counts: np.ndarray,
+        key_dtype: str | None,
+    ) -> "StreamingCounts":
+        """Reconstruye el acumulador desde export_state (o un subconjunto de sus claves)."""
+        sc = cls(key, column, values)
+        if key_dtype is not None:
+            sc._key_dtype = np.dtype(key_dtype)
+            sc._acc = pd.DataFrame(
+                np.asarray(counts, dtype=np.int64).reshape(len(keys), len(categories)),
+                index=pd.Index(np.asarray(keys, dtype=np.float64)),
+                columns=pd.Index(categories, dtype=object),
+            )
+        return sc
+
+    def finalize(self) -> pd.DataFrame | None:
+        if self._acc is None:
+            return None
+        # Categorías que faltan en algún lote quedan en NaN tras add -> 0
+        counts = self._acc.fillna(0).astype(np.int64).sort_index().sort_index(axis=1)
+        counts.index = pd.Index(counts.index.to_numpy().astype(self._key_dtype), name=self.key)
+        counts.columns.name = self.column
+        return counts
@@ -0,0 +1,118 @@
+"""
+Actualización incremental de las features del historial (inst_*, pos_*,
+cc_*, bureau_*) con filas nuevas de las tablas hijas, sin correr
+build_dataset.py sobre todas las tablas.
+
+1. --init recorre las tablas crudas una vez y guarda el estado agregado por
+   cliente en data/processed/aggregate_state (ver aggregate_state.py).
+2. --delta TABLA=archivo.parquet agrega las filas nuevas al estado (solo
+   las claves del delta) y publica una versión del feature store de serving
+   con las filas de los clientes afectados reemplazadas; la API la toma sola
+   (recarga CURRENT).
+3. --export DIR escribe la tabla completa de cada builder desde el estado:
+   la misma que build_dataset --streaming sobre las tablas originales
+   seguidas de los deltas aplicados.
+
+Uso (desde home-credit-risk/):
+    python 02_data_preparation/update_features.py --init
+    python 02_data_preparation/update_features.py --delta installments_payments=pagos_nuevos.parquet
+    python 02_data_preparation/update_features.py --export data/processed/aggregate_features
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from aggregate_state import DELTA_TABLES, STATE_DIR, AggregateState, complete_counts
+from build_dataset import FEATURE_STORE_DIR
+from data_io import ensure_dir, peak_rss_mb, save_parquet
+from feature_store import FeatureStore, patch_feature_store
+from streaming_agg import DEFAULT_BATCH_ROWS
+
+
+EXPORT_BUILDERS = ["inst", "pos", "cc", "bureau"]
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Actualiza inst_/pos_/cc_/bureau_ con filas nuevas de las tablas hijas")
+    ap.add_argument("--raw-dir", default="data/raw")
+    ap.add_argument("--state-dir", default=str(STATE_DIR))
+    ap.add_argument("--init", action="store_true", help="(Re)construir el estado desde las tablas de --raw-dir")
+    ap.add_argument(
+        "--delta",
+        action="append",
+        default=[],
+        metavar="TABLA=PARQUET",
+        help=f"Filas nuevas de una tabla hija ({', '.join(DELTA_TABLES)}); se puede repetir",
+    )
+    ap.add_argument("--export", default=None, metavar="DIR", help="Escribir <builder>.parquet completos desde el estado")
+    ap.add_argument(
+        "--no-feature-store",
+        action="store_true",
+        help="No publicar en artifacts/feature_store las filas de los clientes actualizados",
+    )
+    ap.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Filas por lote al leer los parquet")
+    args = ap.parse_args()
+    if not (args.init or args.delta or args.export):
+        ap.error("indicar --init, --delta y/o --export")
+    return args
+
+
+def _parse_delta(spec: str) -> tuple[str, Path]:
+    table, sep, path = spec.partition("=")
+    if not sep or not path:
+        raise ValueError(f"--delta espera TABLA=PARQUET: {spec}")
+    return table, Path(path)
+
+
+def main() -> None:
+    args = parse_args()
+    raw_dir = Path(args.raw_dir)
+    deltas = [_parse_delta(d) for d in args.delta]
+
+    if args.init:
+        t0 = time.perf_counter()
+        state = AggregateState.build(raw_dir, args.state_dir, args.batch_rows)
+        rows = ", ".join(f"{t}: {n:,}" for t, n in state.meta["rows"].items())
+        print(f"OK: estado agregado en {args.state_dir} ({rows} filas) en {time.perf_counter() - t0:.1f} s")
+    else:
+        state = AggregateState(args.state_dir)
+
+    if deltas:
+        state.check_parents(raw_dir)
+        updates = []
+        for table, path in deltas:
+            t0 = time.perf_counter()
+            res = state.apply(table, path, args.batch_rows)
+            print(
+                f"{table}: {res['filas']:,} filas, {res['claves']:,} claves -> "
+                f"{len(res['features']):,} clientes con {res['builder']}_* recalculadas en {time.perf_counter() - t0:.3f} s"
+            )
+            updates.append(res["features"])
+
+        if not args.no_feature_store:
+            store = FeatureStore.open_current(FEATURE_STORE_DIR)
+            if store is None:
+                print(f"AVISO: no hay feature store publicado en {FEATURE_STORE_DIR}; solo se actualizó el estado.")
+            else:
+                # Categorías sin filas en el delta: 0 para los clientes con conteos
+                updates = [complete_counts(u, store.columns) for u in updates]
+                t0 = time.perf_counter()
+                path, patched = patch_feature_store(FEATURE_STORE_DIR, updates)
+                print(f"OK: feature store {path} ({patched:,} filas reemplazadas) en {time.perf_counter() - t0:.2f} s")
+
+    if args.export:
+        out = ensure_dir(args.export)
+        for name in EXPORT_BUILDERS:
+            df = state.features(name)
+            save_parquet(df, out / f"{name}.parquet")
+            print(f"OK: {name} ({len(df)} x {df.shape[1] - 1}) en {out / f'{name}.parquet'}")
+
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Pico de memoria (RSS): {peak:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
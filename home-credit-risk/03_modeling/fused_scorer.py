@@ -0,0 +1,299 @@
+"""
+Scorer lineal "fusionado": exporta el Pipeline entrenado
+(SimpleImputer(median) + OneHotEncoder + LogisticRegression, o
+SGDClassifier con log_loss) a arrays de NumPy y puntúa sin sklearn.
+
+    z = intercept + imputar(num) @ num_coef + sum_c peso_c[categoría]
+    p = expit(z) = 1 / (1 + exp(-z))
+
+Las columnas one-hot quedan plegadas en una tabla de pesos por columna
+categórica. El artefacto es un .npz plano (sin pickle).
+
+Uso (desde home-credit-risk/):
+    python 03_modeling/fused_scorer.py   # exporta artifacts/scorer.npz desde model.joblib
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+
+ARTIFACTS_DIR = Path("artifacts")
+SCORER_FORMAT = 1
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _is_nan(v: Any) -> bool:
+    return isinstance(v, float) and math.isnan(v)
+
+
+def _steps(step) -> tuple[SimpleImputer, OneHotEncoder | None]:
+    steps = [s for _, s in step.steps] if isinstance(step, Pipeline) else [step]
+    imp = next((s for s in steps if isinstance(s, SimpleImputer)), None)
+    oh = next((s for s in steps if isinstance(s, OneHotEncoder)), None)
+    if imp is None or len(steps) != (1 if oh is None else 2):
+        raise ValueError(f"Paso no soportado por el scorer fusionado: {step!r}")
+    if oh is not None and (oh.drop_idx_ is not None or oh.handle_unknown != "ignore"):
+        raise ValueError("OneHotEncoder con drop o handle_unknown!='ignore' no soportado.")
+    return imp, oh
+
+
+def export_fused_scorer(model: Pipeline, path: str | Path, model_sha256: str = "") -> Path:
+    """Pliega el Pipeline entrenado en arrays y lo guarda como .npz."""
+    pre = model.named_steps.get("pre")
+    clf = model[-1]
+    is_logistic = isinstance(clf, LogisticRegression) or (isinstance(clf, SGDClassifier) and clf.loss == "log_loss")
+    if not isinstance(pre, ColumnTransformer) or not is_logistic:
+        raise ValueError("Se espera Pipeline([('pre', ColumnTransformer), ('clf', LogisticRegression)]).")
+    if clf.coef_.shape[0] != 1:
+        raise ValueError("Solo se soporta clasificación binaria.")
+
+    coef = clf.coef_[0]
+    pos = 0
+    num_cols: List[str] = []
+    medians: List[float] = []
+    num_coef: List[float] = []
+    cat_cols: List[str] = []
+    cat_values: List[str] = []
+    cat_is_none: List[bool] = []
+    cat_weights: List[float] = []
+    cat_offsets = [0]
+    cat_default: List[float] = []
+
+    for name, step, cols in pre.transformers_:
+        if name == "remainder" or step == "drop":
+            continue
+        imp, oh = _steps(step)
+        # SimpleImputer descarta columnas sin valores observados en fit
+        kept = [i for i, v in enumerate(imp.statistics_) if imp.keep_empty_features or not _is_nan(v)]
+
+        for j, i in enumerate(kept):
+            stat = imp.statistics_[i]
+            if oh is None:
+                num_cols.append(cols[i])
+                medians.append(float(stat))
+                num_coef.append(float(coef[pos]))
+                pos += 1
+                continue
+
+            cats = list(oh.categories_[j])
+            w = coef[pos : pos + len(cats)]
+            pos += len(cats)
+
+            cat_cols.append(cols[i])
+            cat_values.extend("" if c is None else str(c) for c in cats)
+            cat_is_none.extend(c is None for c in cats)
+            cat_weights.extend(float(v) for v in w)
+            cat_offsets.append(len(cat_values))
+            # Faltante -> se imputa la moda -> su peso (0 si no es categoría conocida)
+            cat_default.append(next((float(v) for c, v in zip(cats, w) if c == stat), 0.0))
+
+    if pos != coef.shape[0]:
+        raise ValueError(f"El preprocesador genera {pos} columnas y el modelo tiene {coef.shape[0]} coeficientes.")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        format=np.int64(SCORER_FORMAT),
+        model_sha256=np.str_(model_sha256),
+        classes=np.asarray(clf.classes_).astype(np.int64),
+        intercept=np.float64(clf.intercept_[0]),
+        num_cols=np.asarray(num_cols, dtype=str),
+        medians=np.asarray(medians, dtype=np.float64),
+        num_coef=np.asarray(num_coef, dtype=np.float64),
+        cat_cols=np.asarray(cat_cols, dtype=str),
+        cat_values=np.asarray(cat_values, dtype=str),
+        cat_is_none=np.asarray(cat_is_none, dtype=bool),
+        cat_weights=np.asarray(cat_weights, dtype=np.float64),
+        cat_offsets=np.asarray(cat_offsets, dtype=np.int64),
+        cat_default=np.asarray(cat_default, dtype=np.float64),
+    )
+    return path
+
+
+class FusedScorer:
+    """Puntúa con medianas, tablas de pesos por categoría y un producto punto."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        if int(arrays["format"]) != SCORER_FORMAT:
+            raise ValueError(f"Formato de scorer no soportado: {int(arrays['format'])}")
+
+        self.model_sha256 = str(arrays["model_sha256"])
+        self.classes_ = arrays["classes"]
+        self.intercept = float(arrays["intercept"])
+        self.num_cols = [str(c) for c in arrays["num_cols"]]
+        self.medians = arrays["medians"]
+        self.num_coef = arrays["num_coef"]
+        self.cat_cols = [str(c) for c in arrays["cat_cols"]]
+
+        offsets = arrays["cat_offsets"]
+        values, is_none, weights = arrays["cat_values"], arrays["cat_is_none"], arrays["cat_weights"]
+        self.cat_default = arrays["cat_default"]
+        # Por columna: índice de categorías, pesos (+0 para desconocida) y peso de None
+        self._cat_tables = []
+        for k in range(len(self.cat_cols)):
+            sl = slice(offsets[k], offsets[k + 1])
+            known = ~is_none[sl]
+            none_w = weights[sl][is_none[sl]]
+            self._cat_tables.append((
+                pd.Index(values[sl][known].astype(object)),
+                np.append(weights[sl][known], 0.0),
+                float(none_w[0]) if len(none_w) else 0.0,
+            ))
+
+        # Lookups para puntuar un solo dict (camino del API)
+        self._num_lookup = {c: (float(m), float(w)) for c, m, w in zip(self.num_cols, self.medians, self.num_coef)}
+        self._cat_lookup = {
+            c: (dict(zip(index, table[:-1])), float(self.cat_default[k]))
+            for k, (c, (index, table, _)) in enumerate(zip(self.cat_cols, self._cat_tables))
+        }
+        self._base_z = self.intercept + float(self.medians @ self.num_coef) + float(self.cat_default.sum())
+
+    @property
+    def feature_cols(self) -> List[str]:
+        return self.num_cols + self.cat_cols
+
+    def decision_function(self, X: pd.DataFrame) -> np.ndarray:
+        n = len(X)
+        if self.num_cols:
+            v = X.reindex(columns=self.num_cols).to_numpy(dtype=np.float64, na_value=np.nan)
+            v = np.where(np.isnan(v), self.medians, v)
+            z = v @ self.num_coef + self.intercept
+        else:
+            z = np.full(n, self.intercept)
+
+        for k, c in enumerate(self.cat_cols):
+            index, table, none_w = self._cat_tables[k]
+            if c not in X.columns:
+                z += self.cat_default[k]
+                continue
+            s = X[c].to_numpy(dtype=object)
+            contrib = table[index.get_indexer(s)]
+            # Igual que SimpleImputer: None es categoría, NaN/pd.NA se imputa con la moda
+            is_none = s == None  # noqa: E711 (comparación elemento a elemento)
+            missing = pd.isna(s) & ~is_none
+            contrib[is_none] = none_w
+            contrib[missing] = self.cat_default[k]
+            z += contrib
+        return z
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        # expit como LogisticRegression.predict_proba: sin overflow para z muy negativos
+        p = expit(self.decision_function(X))
+        return np.column_stack([1.0 - p, p])
+
+    def score_record(self, data: Dict[str, Any]) -> float:
+        """
+        Probabilidad para un solo solicitante (dict del request). Como en el
+        API, None y NaN se tratan como faltantes.
+        """
+        z = self._base_z
+        for key, value in data.items():
+            if value is None or _is_nan(value):
+                continue
+            num = self._num_lookup.get(key)
+            if num is not None:
+                med, w = num
+                z += (float(value) - med) * w
+                continue
+            cat = self._cat_lookup.get(key)
+            if cat is not None:
+                weights, default_w = cat
+                z += weights.get(value, 0.0) - default_w
+        return float(expit(z))
+
+
+def load_fused_scorer(path: str | Path, mmap_mode: str | None = None) -> FusedScorer:
+    """
+    Carga desde scorer.npz o desde un directorio exportado con
+    export_mmap_scorer; en ese caso los arrays se abren con `mmap_mode`
+    (varios procesos comparten las mismas páginas).
+    """
+    path = Path(path)
+    if path.is_dir():
+        return FusedScorer({p.stem: np.load(p, mmap_mode=mmap_mode, allow_pickle=False) for p in path.glob("*.npy")})
+    with np.load(path, allow_pickle=False) as f:
+        return FusedScorer({k: f[k] for k in f.files})
+
+
+def export_mmap_scorer(scorer_path: str | Path, out_root: str | Path) -> Path:
+    """
+    Copia scorer.npz a out_root/scorer-<sha del modelo>/, un .npy sin comprimir
+    por array, para abrirlo con np.load(mmap_mode="r"). Si ya existe para ese
+    modelo no se reescribe; el directorio aparece completo o no aparece.
+    """
+    with np.load(scorer_path, allow_pickle=False) as f:
+        arrays = {k: f[k] for k in f.files}
+    out = Path(out_root) / f"scorer-{str(arrays['model_sha256'])[:16] or 'sin-sha'}"
+    if out.exists():
+        return out
+
+    tmp = out.with_name(f"{out.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for k, v in arrays.items():
+        np.save(tmp / f"{k}.npy", v)
+    try:
+        os.rename(tmp, out)
+    except OSError:
+        # Otro proceso lo exportó primero
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+def load_fresh_fused_scorer(
+    scorer_path: str | Path,
+    model_path: str | Path,
+    mmap_dir: str | Path | None = None,
+) -> FusedScorer | None:
+    """
+    Carga el scorer solo si fue exportado desde el model.joblib actual
+    (evita servir un scorer desactualizado tras re-entrenar). Con mmap_dir,
+    los arrays se sirven memory-mapped desde una copia en ese directorio.
+    """
+    scorer_path, model_path = Path(scorer_path), Path(model_path)
+    if not scorer_path.exists():
+        return None
+    scorer = load_fused_scorer(scorer_path)
+    if model_path.exists() and scorer.model_sha256 != file_sha256(model_path):
+        print(f"AVISO: {scorer_path} no corresponde a {model_path}; se ignora.")
+        return None
+    if mmap_dir is not None:
+        scorer = load_fused_scorer(export_mmap_scorer(scorer_path, mmap_dir), mmap_mode="r")
+    return scorer
+
+
+def main() -> None:
+    import joblib
+
+    model_path = ARTIFACTS_DIR / "model.joblib"
+    if not model_path.exists():
+        raise FileNotFoundError("No existe artifacts/model.joblib. Ejecuta: python 03_modeling/train.py")
+
+    out = export_fused_scorer(joblib.load(model_path), ARTIFACTS_DIR / "scorer.npz", file_sha256(model_path))
+    print(f"OK: scorer fusionado guardado en {out}")
+
+
+if __name__ == "__main__":
+    main()
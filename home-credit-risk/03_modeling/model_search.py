@@ -0,0 +1,190 @@
+"""
+Búsqueda de modelo con validación cruzada (train.py --mode search).
+
+- El preprocesador (imputación + escalado + one-hot) se ajusta una vez por
+  fold y las matrices dispersas resultantes se guardan con joblib.Memory en
+  TRAIN_CACHE_DIR: todas las configuraciones del fold las comparten y una
+  nueva búsqueda sobre el mismo dataset no vuelve a transformar nada.
+- Las configuraciones se evalúan fold por fold, en paralelo con joblib.
+  Después de cada fold se abandonan las que tienen un ROC-AUC medio peor que
+  el de la mejor por más de `abandon_margin` (carrera tipo racing): los folds
+  siguientes solo se calculan para las que siguen en carrera.
+- Cada ajuste registra su tiempo; el reporte se guarda como
+  artifacts/model_search.json.
+"""
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from joblib import Memory, Parallel, delayed, hash as joblib_hash
+from sklearn.base import BaseEstimator
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+
+DEFAULT_C_GRID = [0.01, 0.1, 1.0, 10.0]
+DEFAULT_CLASS_WEIGHTS = ["balanced", "none"]
+DEFAULT_FOLDS = 3
+DEFAULT_ABANDON_MARGIN = 0.01
+CV_SEED = 42
+
+
+def build_grid(c_grid: list[float], class_weights: list[str], hgb: bool) -> list[dict]:
+    """Configuraciones a evaluar: logística por C y class_weight y, opcionalmente, HGB por class_weight."""
+    grid = [
+        {"modelo": "logistic", "C": float(c), "class_weight": cw}
+        for cw in class_weights
+        for c in c_grid
+    ]
+    if hgb:
+        grid += [{"modelo": "hgb", "class_weight": cw} for cw in class_weights]
+    for i, cfg in enumerate(grid):
+        cfg["id"] = i
+    return grid
+
+
+def config_name(cfg: dict) -> str:
+    if cfg["modelo"] == "logistic":
+        return f"logistic(C={cfg['C']:g}, class_weight={cfg['class_weight']})"
+    return f"hgb(class_weight={cfg['class_weight']})"
+
+
+def make_estimator(cfg: dict, max_iter: int, tol: float) -> BaseEstimator:
+    class_weight = None if cfg["class_weight"] == "none" else cfg["class_weight"]
+    if cfg["modelo"] == "logistic":
+        # lbfgs sobre la matriz dispersa ya escalada: converge en ~100 iteraciones
+        # (saga necesita cientos de pasadas y es ~20x más lento para la grilla)
+        return LogisticRegression(C=cfg["C"], class_weight=class_weight, solver="lbfgs", max_iter=max_iter, tol=tol)
+    return HistGradientBoostingClassifier(class_weight=class_weight, early_stopping=False, random_state=CV_SEED)
+
+
+def dataset_key(path: Path) -> str:
+    """Identifica la versión del dataset para la caché de folds (tamaño + mtime)."""
+    st = path.stat()
+    return f"{path.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def preprocessor_key(pre: ColumnTransformer) -> str:
+    """Huella de la configuración (sin ajustar) del preprocesador para la caché de folds."""
+    return joblib_hash(pre.get_params(deep=True))
+
+
+def _fold_matrices(
+    key: str,
+    n_splits: int,
+    fold: int,
+    num_cols: list[str],
+    cat_cols: list[str],
+    X: pd.DataFrame,
+    y: np.ndarray,
+    make_pre: Callable[[list[str], list[str]], ColumnTransformer],
+):
+    """Matrices transformadas (train, val) de un fold; el preprocesador se ajusta solo con el train del fold."""
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=CV_SEED)
+    tr, va = list(skf.split(np.zeros(len(y)), y))[fold]
+    pre = make_pre(num_cols, cat_cols)
+    Xtr = pre.fit_transform(X.iloc[tr])
+    Xva = pre.transform(X.iloc[va])
+    return Xtr, y[tr], Xva, y[va]
+
+
+def _fit_score(cfg: dict, Xtr, ytr, Xva, yva, max_iter: int, tol: float) -> dict:
+    est = make_estimator(cfg, max_iter, tol)
+    if cfg["modelo"] == "hgb":
+        # HGB no acepta matrices dispersas (el escalado no cambia los cortes de los árboles)
+        Xtr, Xva = Xtr.toarray(), Xva.toarray()
+    t0 = time.perf_counter()
+    est.fit(Xtr, ytr)
+    fit_s = time.perf_counter() - t0
+    auc = roc_auc_score(yva, est.predict_proba(Xva)[:, 1])
+    return {"id": cfg["id"], "roc_auc": float(auc), "fit_s": round(fit_s, 3)}
+
+
+def search(
+    X: pd.DataFrame,
+    y: np.ndarray,
+    num_cols: list[str],
+    cat_cols: list[str],
+    make_pre: Callable[[list[str], list[str]], ColumnTransformer],
+    grid: list[dict],
+    key: str,
+    cache_dir: Path | None,
+    n_splits: int = DEFAULT_FOLDS,
+    abandon_margin: float = DEFAULT_ABANDON_MARGIN,
+    jobs: int = -1,
+    max_iter: int = 1000,
+    tol: float = 1e-4,
+) -> dict:
+    """Devuelve el reporte de la búsqueda; report["mejor"] es la configuración ganadora."""
+    t_start = time.perf_counter()
+    memory = Memory(str(cache_dir) if cache_dir is not None else None, verbose=0)
+    fold_matrices = memory.cache(_fold_matrices, ignore=["X", "y", "make_pre"])
+    # make_pre no entra en la clave de joblib: la huella de sus parámetros sí,
+    # para no reutilizar matrices de otro preprocesador (imputación, one-hot, dtype)
+    key = f"{key}:{preprocessor_key(make_pre(num_cols, cat_cols))}"
+
+    results = {cfg["id"]: {**cfg, "nombre": config_name(cfg), "folds": [], "fit_s": [], "abandonada_en_fold": None} for cfg in grid}
+    active = [cfg["id"] for cfg in grid]
+    folds_report = []
+
+    with Parallel(n_jobs=jobs) as parallel:
+        for fold in range(n_splits):
+            args = (key, n_splits, fold, num_cols, cat_cols, X, y, make_pre)
+            cached = cache_dir is not None and fold_matrices.check_call_in_cache(*args)
+            t0 = time.perf_counter()
+            Xtr, ytr, Xva, yva = fold_matrices(*args)
+            pre_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            scores = parallel(
+                delayed(_fit_score)(results[i], Xtr, ytr, Xva, yva, max_iter, tol) for i in active
+            )
+            fits_s = time.perf_counter() - t0
+            for s in scores:
+                results[s["id"]]["folds"].append(s["roc_auc"])
+                results[s["id"]]["fit_s"].append(s["fit_s"])
+
+            # Abandono temprano: media de los folds hechos contra la mejor media
+            means = {i: float(np.mean(results[i]["folds"])) for i in active}
+            best = max(means.values())
+            abandoned = [i for i in active if fold < n_splits - 1 and means[i] < best - abandon_margin]
+            for i in abandoned:
+                results[i]["abandonada_en_fold"] = fold
+            folds_report.append({
+                "fold": fold,
+                "preprocesamiento_s": round(pre_s, 3),
+                "preprocesamiento_en_cache": bool(cached),
+                "ajustes": len(active),
+                "ajustes_s": round(fits_s, 3),
+                "abandonadas": [results[i]["nombre"] for i in abandoned],
+            })
+            active = [i for i in active if i not in abandoned]
+            del Xtr, Xva
+
+    for r in results.values():
+        r["roc_auc_media"] = float(np.mean(r["folds"]))
+        r["roc_auc_std"] = float(np.std(r["folds"]))
+        r["fit_s_total"] = round(float(np.sum(r["fit_s"])), 3)
+    # Solo compiten las que completaron todos los folds
+    finished = [r for r in results.values() if r["abandonada_en_fold"] is None]
+    best = max(finished, key=lambda r: r["roc_auc_media"])
+
+    return {
+        "folds": n_splits,
+        "margen_abandono": abandon_margin,
+        "jobs": jobs,
+        "configuraciones": sorted(results.values(), key=lambda r: -r["roc_auc_media"]),
+        "por_fold": folds_report,
+        "ajustes_realizados": int(sum(len(r["folds"]) for r in results.values())),
+        "ajustes_sin_abandono": len(grid) * n_splits,
+        "total_s": round(time.perf_counter() - t_start, 2),
+        "mejor": {k: best[k] for k in ("id", "modelo", "nombre", "roc_auc_media", "roc_auc_std")}
+        | {k: best[k] for k in ("C", "class_weight") if k in best},
+    }
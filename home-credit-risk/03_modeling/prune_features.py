@@ -0,0 +1,185 @@
+"""
+Poda de features guiada por el modelo entrenado.
+
+Rankea las columnas del dataset por su importancia en artifacts/model.joblib
+y escribe artifacts/feature_manifest.json con las que se conservan. Con ese
+manifiesto, build_dataset.py --required-features solo lee y calcula esas
+columnas (ver 02_data_preparation/feature_manifest.py) y el dataset, el
+feature store y el encoder de la API quedan con el ancho podado.
+
+Métodos:
+- coef (modelos lineales): |w| · desvío de la columna transformada
+  (imputada / one-hot), sumado por columna original. Es el cambio del
+  logit ante un desvío típico de la feature; no necesita volver a puntuar.
+- permutation: caída del ROC-AUC al permutar cada columna
+  (sklearn.inspection.permutation_importance); sirve para cualquier modelo.
+
+La importancia se mide sobre una muestra del 80 % de train (misma partición
+que train.py), así que las métricas de validación de un re-entrenamiento
+con el dataset podado no se usaron para elegir las columnas.
+
+Uso (desde home-credit-risk/):
+    python 03_modeling/prune_features.py --method coef --keep-fraction 0.95
+    python 02_data_preparation/build_dataset.py --required-features artifacts/feature_manifest.json
+    python 03_modeling/train.py
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.inspection import permutation_importance
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from train import ARTIFACTS_DIR, ID_COL, PROCESSED_PATH, TARGET_COL
+
+
+DEFAULT_KEEP_FRACTION = 0.95
+DEFAULT_SAMPLE_ROWS = 20_000
+DEFAULT_REPEATS = 3
+MANIFEST_PATH = ARTIFACTS_DIR / "feature_manifest.json"
+SEED = 42
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Poda de features -> artifacts/feature_manifest.json")
+    ap.add_argument("--method", choices=["coef", "permutation"], default="coef")
+    ap.add_argument(
+        "--keep-fraction",
+        type=float,
+        default=DEFAULT_KEEP_FRACTION,
+        help="Conservar las columnas más importantes hasta cubrir esta fracción de la importancia total",
+    )
+    ap.add_argument("--top-k", type=int, default=None, help="Conservar exactamente las k más importantes (ignora --keep-fraction)")
+    ap.add_argument("--sample-rows", type=int, default=DEFAULT_SAMPLE_ROWS, help="Filas de train para medir la importancia")
+    ap.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="permutation: permutaciones por columna")
+    ap.add_argument("--jobs", type=int, default=1, help="permutation: procesos de joblib")
+    ap.add_argument("--out", default=str(MANIFEST_PATH))
+    return ap.parse_args()
+
+
+def _is_nan(v) -> bool:
+    return isinstance(v, float) and math.isnan(v)
+
+
+def output_sources(pre: ColumnTransformer) -> list[str]:
+    """Columna original de cada columna de salida del preprocesador (imputer [+ one-hot])."""
+    sources: list[str] = []
+    for name, step, cols in pre.transformers_:
+        if name == "remainder" or step == "drop":
+            continue
+        steps = [s for _, s in step.steps] if isinstance(step, Pipeline) else [step]
+        imp = next(s for s in steps if isinstance(s, SimpleImputer))
+        oh = next((s for s in steps if isinstance(s, OneHotEncoder)), None)
+        # SimpleImputer descarta columnas sin valores observados en fit
+        kept = [cols[i] for i, v in enumerate(imp.statistics_) if imp.keep_empty_features or not _is_nan(v)]
+        if oh is None:
+            sources += kept
+        else:
+            for col, cats in zip(kept, oh.categories_):
+                sources += [col] * len(cats)
+    return sources
+
+
+def coef_importance(model: Pipeline, X: pd.DataFrame) -> pd.Series:
+    """|w| · desvío de cada columna transformada, sumado por columna original."""
+    pre, clf = model.named_steps["pre"], model[-1]
+    if not hasattr(clf, "coef_"):
+        raise ValueError("--method coef necesita un modelo lineal; usa --method permutation.")
+    Z = pre.transform(X)
+    if sparse.issparse(Z):
+        Z = Z.tocsc()
+        mean = np.asarray(Z.mean(axis=0)).ravel()
+        var = np.asarray(Z.multiply(Z).mean(axis=0)).ravel() - mean**2
+    else:
+        var = np.asarray(Z, dtype=np.float64).var(axis=0)
+    contrib = np.abs(np.asarray(clf.coef_, dtype=np.float64)[0]) * np.sqrt(np.clip(var, 0.0, None))
+    sources = output_sources(pre)
+    if len(sources) != len(contrib):
+        raise ValueError(f"El preprocesador genera {len(sources)} columnas y el modelo tiene {len(contrib)} coeficientes.")
+    imp = pd.Series(contrib).groupby(np.asarray(sources)).sum()
+    # Columnas que el imputer descartó: importancia 0
+    return imp.reindex(X.columns, fill_value=0.0)
+
+
+def perm_importance(model: Pipeline, X: pd.DataFrame, y: np.ndarray, repeats: int, jobs: int) -> pd.Series:
+    """Caída media del ROC-AUC al permutar cada columna (negativa = ruido)."""
+    res = permutation_importance(model, X, y, scoring="roc_auc", n_repeats=repeats, random_state=SEED, n_jobs=jobs)
+    return pd.Series(res.importances_mean, index=X.columns)
+
+
+def select_features(importance: pd.Series, keep_fraction: float, top_k: int | None) -> list[str]:
+    """Columnas a conservar, de más a menos importante."""
+    ranked = importance.clip(lower=0.0).sort_values(ascending=False, kind="stable")
+    ranked = ranked[ranked > 0]
+    if top_k is not None:
+        return list(ranked.index[:top_k])
+    if not 0.0 < keep_fraction <= 1.0:
+        raise ValueError(f"--keep-fraction debe estar en (0, 1]: {keep_fraction}")
+    cum = ranked.cumsum() / ranked.sum()
+    # La primera columna con la que se alcanza la fracción también entra
+    n = int(np.searchsorted(cum.to_numpy(), keep_fraction - 1e-12)) + 1
+    return list(ranked.index[:n])
+
+
+def main() -> None:
+    args = parse_args()
+    schema = json.loads((ARTIFACTS_DIR / "feature_schema.json").read_text(encoding="utf-8"))
+    model = joblib.load(ARTIFACTS_DIR / "model.joblib")
+    feature_cols = schema["feature_cols"]
+
+    df = pd.read_parquet(PROCESSED_PATH, columns=[TARGET_COL, *feature_cols])
+    y = df[TARGET_COL].astype(int).to_numpy()
+    idx_train, _ = train_test_split(np.arange(len(y)), test_size=0.2, random_state=SEED, stratify=y)
+    if len(idx_train) > args.sample_rows:
+        idx_train = np.sort(np.random.default_rng(SEED).choice(idx_train, args.sample_rows, replace=False))
+    X = df.iloc[idx_train][feature_cols]
+    y = y[idx_train]
+    del df
+
+    t0 = time.perf_counter()
+    if args.method == "coef":
+        importance = coef_importance(model, X)
+    else:
+        importance = perm_importance(model, X, y, args.repeats, args.jobs)
+    elapsed = time.perf_counter() - t0
+
+    keep = set(select_features(importance, args.keep_fraction, args.top_k))
+    if not keep:
+        raise ValueError("Ninguna feature tiene importancia positiva: no se escribe el manifiesto.")
+    ranked = importance.sort_values(ascending=False, kind="stable")
+    manifest = {
+        "id_col": schema.get("id_col", ID_COL),
+        "target_col": schema.get("target_col"),
+        # En el orden del dataset (el orden de build_dataset no depende del manifiesto)
+        "feature_cols": [c for c in feature_cols if c in keep],
+        "metodo": args.method,
+        "keep_fraction": None if args.top_k is not None else args.keep_fraction,
+        "top_k": args.top_k,
+        "filas_muestra": int(len(X)),
+        "columnas_originales": len(feature_cols),
+        "columnas_seleccionadas": len(keep),
+        "importancia_s": round(elapsed, 2),
+        "importancias": {c: round(float(v), 8) for c, v in ranked.items()},
+    }
+    ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Importancia ({args.method}) sobre {len(X):,} filas: {elapsed:.1f} s")
+    print(f"OK: {len(keep)} de {len(feature_cols)} features en {args.out}")
+    print("Más importantes:", ", ".join(list(ranked.index[:10])))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import argparse
 import json
+import sys
+import time
 from pathlib import Path
+from typing import Iterator
 
 import joblib
 import numpy as np
@@ -11,75 +15,459 @@ from sklearn.impute import SimpleImputer
 from sklearn.metrics import roc_auc_score, average_precision_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 
+from fused_scorer import export_fused_scorer, file_sha256, load_fused_scorer
+import model_search
 
-ARTIFACTS_DIR = Path("artifacts")
-PROCESSED_PATH = Path("data/processed/dataset.parquet")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from data_io import peak_rss_mb  # noqa: E402
+from streaming_agg import iter_parquet_chunks  # noqa: E402
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "04_evaluation"))
+from bootstrap_ci import DEFAULT_RESAMPLES, DEFAULT_SEED, bootstrap_metrics  # noqa: E402
 
-def main() -> None:
-    if not PROCESSED_PATH.exists():
-        raise FileNotFoundError(
-            f"No existe {PROCESSED_PATH}. Ejecuta primero: python 02_data_preparation/build_dataset.py"
-        )
 
-    df = pd.read_parquet(PROCESSED_PATH)
+ARTIFACTS_DIR = Path("artifacts")
+PROCESSED_PATH = Path("data/processed/dataset.parquet")
+TRAIN_CACHE_DIR = Path("data/processed/train_cache")
+ID_COL = "SK_ID_CURR"
+TARGET_COL = "TARGET"
 
-    if "TARGET" not in df.columns:
-        raise ValueError("No existe TARGET en el dataset. Necesitas application_train con TARGET para entrenar.")
 
-    y = df["TARGET"].astype(int)
-    X = df.drop(columns=["TARGET"])
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Entrena el modelo (artifacts/model.joblib + scorer.npz)")
+    ap.add_argument(
+        "--mode",
+        choices=["dense", "sparse", "sgd", "search"],
+        default="dense",
+        help=(
+            "dense: matriz densa + lbfgs (baseline). "
+            "sparse: float32, one-hot disperso + saga, preprocesador en caché. "
+            "sgd: SGD por lotes leyendo el parquet por partes (sin cargarlo completo). "
+            "search: validación cruzada sobre una grilla de modelos y re-ajuste del mejor"
+        ),
+    )
+    ap.add_argument(
+        "--max-iter",
+        type=int,
+        default=None,
+        help="Iteraciones del solver (dense: 2000, sparse/saga: 200, search/lbfgs: 1000)",
+    )
+    ap.add_argument("--tol", type=float, default=1e-4)
+    ap.add_argument("--no-cache", action="store_true", help="sparse: no usar Pipeline(memory=...) para el preprocesador")
+    ap.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=2048,
+        help="sparse/search: tamaño máximo de data/processed/train_cache (se eliminan primero las entradas menos usadas)",
+    )
+    ap.add_argument("--epochs", type=int, default=5, help="sgd: pasadas sobre el parquet")
+    ap.add_argument("--batch-rows", type=int, default=16_384, help="sgd: filas por lote")
+    ap.add_argument("--alpha", type=float, default=1e-4, help="sgd: regularización L2")
+    ap.add_argument(
+        "--fit-sample",
+        type=int,
+        default=20_000,
+        help="sgd: filas de entrenamiento (al azar) para ajustar imputer, one-hot y escalado",
+    )
+    ap.add_argument("--cv", type=int, default=model_search.DEFAULT_FOLDS, help="search: número de folds")
+    ap.add_argument(
+        "--c-grid",
+        type=float,
+        nargs="*",
+        default=model_search.DEFAULT_C_GRID,
+        help="search: valores de C (sin valores y con --hgb: solo HGB)",
+    )
+    ap.add_argument(
+        "--class-weights",
+        nargs="+",
+        choices=["balanced", "none"],
+        default=model_search.DEFAULT_CLASS_WEIGHTS,
+        help="search: class_weight a probar",
+    )
+    ap.add_argument("--hgb", action="store_true", help="search: incluir HistGradientBoostingClassifier")
+    ap.add_argument(
+        "--abandon-margin",
+        type=float,
+        default=model_search.DEFAULT_ABANDON_MARGIN,
+        help="search: abandonar configuraciones con ROC-AUC medio peor que la mejor por más de este margen",
+    )
+    ap.add_argument("--jobs", type=int, default=-1, help="search: procesos de joblib (-1: todos los núcleos)")
+    ap.add_argument(
+        "--bootstrap",
+        type=int,
+        default=DEFAULT_RESAMPLES,
+        help="Remuestreos bootstrap para los IC de las métricas de validación (0: no calcular)",
+    )
+    ap.add_argument("--bootstrap-seed", type=int, default=DEFAULT_SEED)
+    return ap.parse_args()
 
-    # Separar columnas
-    id_col = "SK_ID_CURR"
-    if id_col in X.columns:
-        X = X.drop(columns=[id_col])
 
+def split_columns(X: pd.DataFrame) -> tuple[list[str], list[str]]:
     cat_cols = [c for c in X.columns if X[c].dtype == "object"]
     num_cols = [c for c in X.columns if c not in cat_cols]
+    return num_cols, cat_cols
+
+
+def make_preprocessor(num_cols: list[str], cat_cols: list[str], scalable: bool = False) -> ColumnTransformer:
+    """
+    Imputación + one-hot. En modo escalable el numérico se estandariza (saga
+    y SGD convergen mal sin escalar; el escalado se pliega en los
+    coeficientes al final, ver fold_scaler), el one-hot sale en float32 y el
+    resultado se mantiene disperso.
+    """
+    num_steps = [("imp", SimpleImputer(strategy="median"))]
+    oh = OneHotEncoder(handle_unknown="ignore")
+    if scalable:
+        num_steps.append(("scale", StandardScaler()))
+        oh = OneHotEncoder(handle_unknown="ignore", dtype=np.float32)
 
-    pre = ColumnTransformer(
+    return ColumnTransformer(
         transformers=[
-            ("num", Pipeline([("imp", SimpleImputer(strategy="median"))]), num_cols),
+            ("num", Pipeline(num_steps), num_cols),
             ("cat", Pipeline([
                 ("imp", SimpleImputer(strategy="most_frequent")),
-                ("oh", OneHotEncoder(handle_unknown="ignore")),
+                ("oh", oh),
             ]), cat_cols),
         ],
         remainder="drop",
+        sparse_threshold=1.0 if scalable else 0.3,
     )
 
+
+def read_dataset(path: Path, float32: bool) -> pd.DataFrame:
+    """Lee el dataset; con float32 las columnas numéricas se convierten columna a columna en Arrow."""
+    if not float32:
+        return pd.read_parquet(path)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    for i, field in enumerate(table.schema):
+        if field.name in (ID_COL, TARGET_COL):
+            continue
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float32()))
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def as_float64(X: pd.DataFrame) -> pd.DataFrame:
+    """Numéricas a float64 (la API y el scorer fusionado puntúan en float64)."""
+    num = [c for c in X.columns if X[c].dtype == np.float32]
+    return X.astype({c: np.float64 for c in num}) if num else X
+
+
+def fold_scaler(model: Pipeline) -> None:
+    """
+    Pliega el StandardScaler numérico en el clasificador (w' = w / scale,
+    b' = b - sum(w' * mean)) y lo quita del preprocesador. El modelo guardado
+    queda como imputer + one-hot + lineal, igual al baseline, así que el
+    scorer fusionado, el encoder de la API y evaluate.py no cambian.
+    """
+    pre, clf = model.named_steps["pre"], model[-1]
+    coef = np.asarray(clf.coef_, dtype=np.float64).copy()
+    intercept = np.asarray(clf.intercept_, dtype=np.float64).copy()
+
+    for i, (name, step, cols) in enumerate(pre.transformers_):
+        if not isinstance(step, Pipeline):
+            continue
+        imp = step.named_steps.get("imp")
+        if isinstance(imp, SimpleImputer) and imp.statistics_.dtype == np.float32:
+            # Medianas en float64: así las lee el scorer fusionado (NaN incluido)
+            imp.statistics_ = imp.statistics_.astype(np.float64)
+        scaler = step.named_steps.get("scale")
+        if scaler is None:
+            continue
+        sl = pre.output_indices_[name]
+        w = coef[:, sl] / scaler.scale_
+        intercept -= w @ scaler.mean_
+        coef[:, sl] = w
+        pre.transformers_[i] = (name, Pipeline([s for s in step.steps if s[0] != "scale"]), cols)
+
+    clf.coef_, clf.intercept_ = coef, intercept
+
+
+# ----- dense / sparse: todo en memoria -----
+
+def fit_in_memory(args: argparse.Namespace) -> tuple[Pipeline, list, dict]:
+    scalable = args.mode == "sparse"
+    df = read_dataset(PROCESSED_PATH, float32=scalable)
+
+    if TARGET_COL not in df.columns:
+        raise ValueError("No existe TARGET en el dataset. Necesitas application_train con TARGET para entrenar.")
+
+    y = df[TARGET_COL].astype(int)
+    X = df.drop(columns=[TARGET_COL])
+    del df
+
+    # Separar columnas
+    if ID_COL in X.columns:
+        X = X.drop(columns=[ID_COL])
+
+    num_cols, cat_cols = split_columns(X)
+    pre = make_preprocessor(num_cols, cat_cols, scalable)
+
     # Modelo baseline sólido + class_weight para desbalance
-    clf = LogisticRegression(
-        max_iter=2000,
-        n_jobs=None,
-        class_weight="balanced",
-        solver="lbfgs",
+    if scalable:
+        clf = LogisticRegression(
+            max_iter=args.max_iter or 200,
+            tol=args.tol,
+            class_weight="balanced",
+            solver="saga",
+        )
+    else:
+        clf = LogisticRegression(
+            max_iter=args.max_iter or 2000,
+            n_jobs=None,
+            class_weight="balanced",
+            solver="lbfgs",
+        )
+
+    # Con memory, un re-entrenamiento con los mismos datos reutiliza el preprocesador ajustado
+    memory = None if (not scalable or args.no_cache) else str(TRAIN_CACHE_DIR)
+    model = Pipeline(steps=[("pre", pre), ("clf", clf)], memory=memory)
+
+    X_train, X_val, y_train, y_val = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
     )
+    del X
 
-    model = Pipeline(steps=[("pre", pre), ("clf", clf)])
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+    model.memory = None  # no guardar la ruta de la caché en model.joblib
+    fold_scaler(model)
+
+    info = {"fit_s": round(fit_s, 2), "n_train": int(len(X_train)), "iteraciones": int(np.max(clf.n_iter_))}
+    return model, [(as_float64(X_val), y_val.to_numpy())], info
+
+
+# ----- search: validación cruzada sobre una grilla -----
 
+def fit_search(args: argparse.Namespace) -> tuple[Pipeline, list, dict]:
+    """
+    Misma partición 80/20 que los otros modos: la búsqueda (ver
+    model_search.py) usa solo el 80 % de train y el mejor modelo se
+    re-ajusta con todo ese 80 %; el 20 % queda para las métricas finales.
+    """
+    df = read_dataset(PROCESSED_PATH, float32=True)
+    if TARGET_COL not in df.columns:
+        raise ValueError("No existe TARGET en el dataset. Necesitas application_train con TARGET para entrenar.")
+    y = df[TARGET_COL].astype(int)
+    X = df.drop(columns=[c for c in (TARGET_COL, ID_COL) if c in df.columns])
+    del df
+
+    num_cols, cat_cols = split_columns(X)
     X_train, X_val, y_train, y_val = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
+    del X
+
+    max_iter = args.max_iter or 1000
+    grid = model_search.build_grid(args.c_grid, args.class_weights, args.hgb)
+    if not grid:
+        raise ValueError("La grilla de búsqueda está vacía (--c-grid sin valores y sin --hgb).")
+    report = model_search.search(
+        X_train.reset_index(drop=True),
+        y_train.to_numpy(),
+        num_cols,
+        cat_cols,
+        make_pre=lambda num, cat: make_preprocessor(num, cat, scalable=True),
+        grid=grid,
+        key=model_search.dataset_key(PROCESSED_PATH),
+        cache_dir=None if args.no_cache else TRAIN_CACHE_DIR,
+        n_splits=args.cv,
+        abandon_margin=args.abandon_margin,
+        jobs=args.jobs,
+        max_iter=max_iter,
+        tol=args.tol,
+    )
+    best = report["mejor"]
 
+    # Re-ajuste del mejor con todo el train
+    clf = model_search.make_estimator(best, max_iter, args.tol)
+    if best["modelo"] == "logistic":
+        pre = make_preprocessor(num_cols, cat_cols, scalable=True)
+    else:
+        # Árboles: sin escalado y con salida densa (HGB no acepta matrices dispersas)
+        pre = make_preprocessor(num_cols, cat_cols).set_params(sparse_threshold=0.0)
+    model = Pipeline(steps=[("pre", pre), ("clf", clf)])
+    t0 = time.perf_counter()
     model.fit(X_train, y_train)
-    proba = model.predict_proba(X_val)[:, 1]
+    refit_s = time.perf_counter() - t0
+    if best["modelo"] == "logistic":
+        fold_scaler(model)
+    report["reajuste_s"] = round(refit_s, 2)
 
-    roc = roc_auc_score(y_val, proba)
-    pr = average_precision_score(y_val, proba)
+    ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    (ARTIFACTS_DIR / "model_search.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for r in report["configuraciones"]:
+        state = f"abandonada en fold {r['abandonada_en_fold']}" if r["abandonada_en_fold"] is not None else "completa"
+        print(f"  {r['nombre']:<45} AUC {r['roc_auc_media']:.4f} ± {r['roc_auc_std']:.4f}  {r['fit_s_total']:>7.1f} s  {state}")
+    print(
+        f"Búsqueda: {report['ajustes_realizados']}/{report['ajustes_sin_abandono']} ajustes en {report['total_s']:.1f} s"
+        f" | mejor: {best['nombre']}"
+    )
+
+    info = {
+        "fit_s": round(report["total_s"] + refit_s, 2),
+        "n_train": int(len(X_train)),
+        "busqueda": {"mejor": best["nombre"], "cv_roc_auc": best["roc_auc_media"], "reporte": "artifacts/model_search.json"},
+    }
+    return model, [(as_float64(X_val), y_val.to_numpy())], info
+
+
+# ----- sgd: por lotes desde el parquet -----
+
+def fit_sgd(args: argparse.Namespace) -> tuple[Pipeline, Iterator, dict]:
+    """
+    Entrena sin cargar el dataset completo:
+    1. lee solo TARGET y arma el mismo split que los modos en memoria;
+    2. ajusta el preprocesador con una muestra al azar del train;
+    3. SGDClassifier(log_loss).partial_fit lote a lote, `epochs` pasadas,
+       con pesos por clase equivalentes a class_weight="balanced".
+    """
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(PROCESSED_PATH)
+    columns = [f.name for f in pf.schema_arrow if f.name != ID_COL]
+    if TARGET_COL not in columns:
+        raise ValueError("No existe TARGET en el dataset. Necesitas application_train con TARGET para entrenar.")
+    y = pq.read_table(PROCESSED_PATH, columns=[TARGET_COL]).column(0).to_numpy().astype(int)
+
+    idx_train, _ = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42, stratify=y)
+    is_train = np.zeros(len(y), dtype=bool)
+    is_train[idx_train] = True
+    counts = np.bincount(y[is_train], minlength=2)
+    class_weight = len(idx_train) / (2.0 * counts)
+
+    def batches(rows: np.ndarray | None = None) -> Iterator[tuple[pd.DataFrame, np.ndarray, np.ndarray]]:
+        """(X del lote con float32, y, máscara de filas de train) lote a lote."""
+        start = 0
+        for chunk in iter_parquet_chunks(PROCESSED_PATH, columns=columns, batch_rows=args.batch_rows):
+            n = len(chunk)
+            yb = chunk.pop(TARGET_COL).to_numpy().astype(int)
+            num = [c for c in chunk.columns if chunk[c].dtype.kind in "if"]
+            chunk[num] = chunk[num].astype(np.float32)
+            yield chunk, yb, is_train[start : start + n]
+            start += n
+
+    # Preprocesador: muestra de train (las categorías que no aparezcan se ignoran)
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(42)
+    p = min(1.0, args.fit_sample / len(idx_train))
+    sample = pd.concat(
+        [Xb[mask & (rng.random(len(Xb)) < p)] for Xb, _, mask in batches()],
+        ignore_index=True,
+    )
+    num_cols, cat_cols = split_columns(sample)
+    pre = make_preprocessor(num_cols, cat_cols, scalable=True).fit(sample)
+    n_sample = len(sample)
+    del sample
+
+    clf = SGDClassifier(loss="log_loss", alpha=args.alpha, average=True, tol=None, random_state=42)
+    classes = np.array([0, 1])
+    for epoch in range(args.epochs):
+        for Xb, yb, mask in batches():
+            if not mask.any():
+                continue
+            # (el dataset está ordenado por SK_ID_CURR, sin relación con TARGET: no hace falta barajar)
+            yt = yb[mask]
+            clf.partial_fit(pre.transform(Xb[mask]), yt, classes=classes, sample_weight=class_weight[yt])
+    fit_s = time.perf_counter() - t0
+
+    model = Pipeline(steps=[("pre", pre), ("clf", clf)])
+    fold_scaler(model)
+
+    def val_batches():
+        for Xb, yb, mask in batches():
+            if (~mask).any():
+                yield as_float64(Xb[~mask]), yb[~mask]
+
+    info = {
+        "fit_s": round(fit_s, 2),
+        "n_train": int(len(idx_train)),
+        "n_muestra_preprocesador": int(n_sample),
+        "epochs": args.epochs,
+    }
+    return model, val_batches(), info
+
+
+def main() -> None:
+    args = parse_args()
+    if not PROCESSED_PATH.exists():
+        raise FileNotFoundError(
+            f"No existe {PROCESSED_PATH}. Ejecuta primero: python 02_data_preparation/build_dataset.py"
+        )
+
+    if args.mode == "sgd":
+        model, val_batches, info = fit_sgd(args)
+    elif args.mode == "search":
+        model, val_batches, info = fit_search(args)
+    else:
+        model, val_batches, info = fit_in_memory(args)
+
+    if args.mode in ("sparse", "search") and not args.no_cache:
+        # La clave incluye el mtime del dataset: cada build_dataset deja entradas
+        # que no se vuelven a leer y salen primero (joblib ordena por último acceso)
+        joblib.Memory(str(TRAIN_CACHE_DIR), verbose=0).reduce_size(bytes_limit=int(args.cache_max_mb * 1024 * 1024))
 
     ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model, ARTIFACTS_DIR / "model.joblib")
+    model_path = ARTIFACTS_DIR / "model.joblib"
+    joblib.dump(model, model_path)
+
+    # Scorer fusionado (NumPy puro) para API/evaluación; debe reproducir predict_proba.
+    # Solo existe para modelos lineales: con HGB (--mode search --hgb) se usa el Pipeline.
+    scorer_path = ARTIFACTS_DIR / "scorer.npz"
+    scorer = None
+    if hasattr(model[-1], "coef_"):
+        scorer_path = export_fused_scorer(model, scorer_path, file_sha256(model_path))
+        scorer = load_fused_scorer(scorer_path)
+    elif scorer_path.exists():
+        scorer_path.unlink()
 
-    metrics = {"roc_auc": float(roc), "pr_auc": float(pr)}
+    probas, ys, max_diff = [], [], 0.0
+    for X_val, y_val in val_batches:
+        proba = model.predict_proba(X_val)[:, 1]
+        if scorer is not None:
+            max_diff = max(max_diff, float(np.abs(scorer.predict_proba(X_val)[:, 1] - proba).max()))
+        probas.append(proba)
+        ys.append(y_val)
+    if max_diff > 1e-9:
+        raise RuntimeError(f"El scorer fusionado difiere de predict_proba (max |diff| = {max_diff:.2e}).")
+    proba, y_val = np.concatenate(probas), np.concatenate(ys)
+
+    roc = roc_auc_score(y_val, proba)
+    pr = average_precision_score(y_val, proba)
+
+    peak = peak_rss_mb()
+    metrics = {
+        "roc_auc": float(roc),
+        "pr_auc": float(pr),
+        "modo": args.mode,
+        **info,
+        "pico_rss_mb": round(peak, 1) if peak is not None else None,
+    }
+    if args.bootstrap > 0:
+        metrics["bootstrap"] = bootstrap_metrics(y_val, proba, n_resamples=args.bootstrap, seed=args.bootstrap_seed)
     (ARTIFACTS_DIR / "train_metrics.json").write_text(json.dumps(metrics, indent=2), encoding="utf-8")
 
     print("OK: modelo guardado en artifacts/model.joblib")
-    print("Métricas validación:", metrics)
+    if scorer is not None:
+        print(f"OK: scorer fusionado guardado en {scorer_path} (max |diff| = {max_diff:.2e})")
+    else:
+        print("AVISO: el modelo no es lineal; no hay scorer fusionado (la API usa el Pipeline)")
+    print(f"Ajuste ({args.mode}): {info['fit_s']:.1f} s | pico de memoria (RSS): {metrics['pico_rss_mb']} MB")
+    print("Métricas validación:", {"roc_auc": metrics["roc_auc"], "pr_auc": metrics["pr_auc"]})
+    if "bootstrap" in metrics:
+        bs = metrics["bootstrap"]
+        print(
+            f"IC {bs['nivel']:.0%} ({bs['remuestreos']} remuestreos): "
+            + " | ".join(f"{m} [{bs[m]['ic_inf']:.4f}, {bs[m]['ic_sup']:.4f}]" for m in ("roc_auc", "pr_auc"))
+        )
 
 
 if __name__ == "__main__":
@@ -1,16 +1,37 @@
 from __future__ import annotations
 
+import argparse
 import json
+import sys
 from pathlib import Path
 
 import joblib
 import numpy as np
 import pandas as pd
-from sklearn.metrics import roc_auc_score, average_precision_score, confusion_matrix
+from sklearn.metrics import roc_auc_score, average_precision_score
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "03_modeling"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from fused_scorer import load_fresh_fused_scorer  # noqa: E402
+from streaming_agg import iter_parquet_row_groups  # noqa: E402
+from bootstrap_ci import DEFAULT_RESAMPLES, DEFAULT_SEED, bootstrap_metrics  # noqa: E402
+from threshold_sweep import (  # noqa: E402
+    DEFAULT_COSTS,
+    DEFAULT_GRID_STEP,
+    best_pair,
+    surface_to_json,
+    threshold_grid,
+    threshold_surface,
+)
 
 
 ARTIFACTS_DIR = Path("artifacts")
 DATASET_PATH = Path("data/processed/dataset.parquet")
+DEFAULT_BATCH_ROWS = 65_536
+# Umbrales de referencia (los fijos de antes del barrido)
+REFERENCE_THRESHOLDS = (0.20, 0.50)
+
+DECISIONS = np.array(["APROBAR", "REVISIÓN MANUAL", "RECHAZAR"])
 
 
 def decision_from_prob(p: float, approve_th: float = 0.20, reject_th: float = 0.50) -> str:
@@ -21,43 +42,220 @@ def decision_from_prob(p: float, approve_th: float = 0.20, reject_th: float = 0.
     return "REVISIÓN MANUAL"
 
 
-def main() -> None:
-    model_path = ARTIFACTS_DIR / "model.joblib"
-    if not model_path.exists():
-        raise FileNotFoundError("No existe artifacts/model.joblib. Ejecuta: python 03_modeling/train.py")
+def decision_codes(proba: np.ndarray, approve_th: float = 0.20, reject_th: float = 0.50) -> np.ndarray:
+    """
+    Versión vectorizada de decision_from_prob: índice en DECISIONS por fila.
+    Con np.select un NaN cae en revisión manual, igual que en la versión escalar.
+    """
+    return np.select([proba < approve_th, proba >= reject_th], [0, 2], default=1).astype(np.int8)
+
+
+class EvaluationAccumulator:
+    """
+    Acumula la evaluación lote a lote: matriz de confusión y conteo de
+    decisiones se suman de forma incremental. ROC-AUC y PR-AUC exactas
+    necesitan todas las puntuaciones, así que se guardan proba (float64) y
+    TARGET (int8): 9 bytes por fila en lugar de la matriz de features.
+    """
+
+    def __init__(self, approve_th: float, reject_th: float) -> None:
+        self.approve_th = approve_th
+        self.reject_th = reject_th
+        self.n = 0
+        self._proba: list[np.ndarray] = []
+        self._y: list[np.ndarray] = []
+        # cm[y, y_hat] con y_hat = "RECHAZAR" como positivo (default alto)
+        self._cm = np.zeros((2, 2), dtype=np.int64)
+        self._counts = np.zeros(len(DECISIONS), dtype=np.int64)
+        # Primera fila de cada decisión: value_counts desempata por orden de aparición
+        self._first = np.full(len(DECISIONS), -1, dtype=np.int64)
 
-    df = pd.read_parquet(DATASET_PATH)
+    def update(self, y: np.ndarray, proba: np.ndarray) -> None:
+        y = np.asarray(y, dtype=np.int8)
+        proba = np.asarray(proba, dtype=np.float64)
+        y_hat = (proba >= self.reject_th).astype(np.int8)
+        self._cm += np.bincount(y.astype(np.int64) * 2 + y_hat, minlength=4).reshape(2, 2)
+
+        codes = decision_codes(proba, self.approve_th, self.reject_th)
+        self._counts += np.bincount(codes, minlength=len(DECISIONS))
+        for k in np.flatnonzero(self._first < 0):
+            hits = np.flatnonzero(codes == k)
+            if len(hits):
+                self._first[k] = self.n + hits[0]
+
+        self._proba.append(proba)
+        self._y.append(y)
+        self.n += len(y)
+
+    def confusion_matrix(self) -> list[list[int]]:
+        """Como sklearn.metrics.confusion_matrix: solo las clases presentes en y o y_hat."""
+        present = np.flatnonzero((self._cm.sum(axis=1) + self._cm.sum(axis=0)) > 0)
+        return self._cm[np.ix_(present, present)].tolist()
+
+    def decision_counts(self) -> dict[str, int]:
+        """Como pd.Series(decisions).value_counts(): mayor conteo primero, empates por aparición."""
+        present = [k for k in range(len(DECISIONS)) if self._counts[k] > 0]
+        present.sort(key=lambda k: (-self._counts[k], self._first[k]))
+        return {str(DECISIONS[k]): int(self._counts[k]) for k in present}
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """TARGET y probabilidades de todas las filas vistas, en orden."""
+        if len(self._y) > 1:
+            self._y = [np.concatenate(self._y)]
+            self._proba = [np.concatenate(self._proba)]
+        if not self._y:
+            return np.empty(0, dtype=np.int8), np.empty(0, dtype=np.float64)
+        return self._y[0], self._proba[0]
+
+    def report(self, approve_th: float | None = None, reject_th: float | None = None) -> dict:
+        """
+        Reporte con los umbrales del acumulador o, si se pasan otros (p. ej.
+        los optimizados al final), con conteos recalculados en una pasada
+        vectorizada sobre las probabilidades guardadas.
+        """
+        if self.n == 0:
+            raise ValueError("El dataset no tiene filas para evaluar.")
+        y, proba = self.arrays()
+        acc = self
+        if (approve_th, reject_th) != (None, None) and (approve_th, reject_th) != (self.approve_th, self.reject_th):
+            acc = EvaluationAccumulator(approve_th, reject_th)
+            acc.update(y, proba)
+        return {
+            "roc_auc": float(roc_auc_score(y, proba)),
+            "pr_auc": float(average_precision_score(y, proba)),
+            "approve_threshold": acc.approve_th,
+            "reject_threshold": acc.reject_th,
+            "confusion_matrix_at_reject_threshold": acc.confusion_matrix(),
+            "decision_counts": acc.decision_counts(),
+        }
+
+
+def split_xy(df: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
     if "TARGET" not in df.columns:
         raise ValueError("No existe TARGET. No puedo evaluar sin etiqueta.")
-
-    y = df["TARGET"].astype(int)
+    y = df["TARGET"].astype(int).to_numpy()
     X = df.drop(columns=["TARGET"])
     if "SK_ID_CURR" in X.columns:
         X = X.drop(columns=["SK_ID_CURR"])
+    return X, y
 
-    model = joblib.load(model_path)
-    proba = model.predict_proba(X)[:, 1]
 
-    roc = roc_auc_score(y, proba)
-    pr = average_precision_score(y, proba)
+def iter_dataset(streaming: bool, batch_rows: int):
+    """
+    El dataset completo en un solo lote o, con streaming, lote a lote por
+    row groups (memoria acotada por el row group y batch_rows, no por el
+    tamaño del dataset).
+    """
+    if not streaming:
+        yield split_xy(pd.read_parquet(DATASET_PATH))
+        return
+    for chunk in iter_parquet_row_groups(DATASET_PATH, batch_rows=batch_rows):
+        yield split_xy(chunk)
 
-    # Umbrales negocio (puedes ajustarlos)
-    approve_th = 0.20
-    reject_th = 0.50
 
-    decisions = [decision_from_prob(float(p), approve_th, reject_th) for p in proba]
-    y_hat = (proba >= reject_th).astype(int)  # "RECHAZAR" como positivo (default alto)
+def load_scorer(kind: str = "auto"):
+    """
+    Devuelve un objeto con predict_proba: el scorer fusionado (scorer.npz)
+    si existe y corresponde al modelo, o el Pipeline de model.joblib.
+    """
+    model_path = ARTIFACTS_DIR / "model.joblib"
+    if kind in ("auto", "fused"):
+        scorer = load_fresh_fused_scorer(ARTIFACTS_DIR / "scorer.npz", model_path)
+        if scorer is not None:
+            return scorer
+        if kind == "fused":
+            raise FileNotFoundError("No existe un artifacts/scorer.npz válido. Ejecuta: python 03_modeling/fused_scorer.py")
+
+    if not model_path.exists():
+        raise FileNotFoundError("No existe artifacts/model.joblib. Ejecuta: python 03_modeling/train.py")
+    return joblib.load(model_path)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--scorer",
+        choices=["auto", "fused", "pipeline"],
+        default="auto",
+        help="auto: scorer.npz si está disponible, si no model.joblib",
+    )
+    ap.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Leer y puntuar el dataset por lotes en lugar de cargarlo completo",
+    )
+    ap.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Filas por lote con --streaming")
+    ap.add_argument("--grid-step", type=float, default=DEFAULT_GRID_STEP, help="Paso de la grilla de umbrales en [0, 1]")
+    ap.add_argument("--cost-bad-approved", type=float, default=DEFAULT_COSTS["malo_aprobado"])
+    ap.add_argument("--cost-good-rejected", type=float, default=DEFAULT_COSTS["bueno_rechazado"])
+    ap.add_argument("--cost-review", type=float, default=DEFAULT_COSTS["revision"])
+    ap.add_argument(
+        "--thresholds",
+        type=float,
+        nargs=2,
+        metavar=("APPROVE", "REJECT"),
+        default=None,
+        help="Umbrales fijos para thresholds.json en lugar del par de menor costo",
+    )
+    ap.add_argument(
+        "--bootstrap",
+        type=int,
+        default=DEFAULT_RESAMPLES,
+        help="Remuestreos bootstrap para los IC de ROC-AUC, PR-AUC y conteos de decisión (0: no calcular)",
+    )
+    ap.add_argument("--bootstrap-seed", type=int, default=DEFAULT_SEED)
+    ap.add_argument("--jobs", type=int, default=1, help="Procesos para los remuestreos bootstrap")
+    args = ap.parse_args()
+
+    model = load_scorer(args.scorer)
 
-    cm = confusion_matrix(y, y_hat).tolist()
+    acc = EvaluationAccumulator(*REFERENCE_THRESHOLDS)
+    for X, y in iter_dataset(args.streaming, args.batch_rows):
+        acc.update(y, model.predict_proba(X)[:, 1])
 
-    report = {
-        "roc_auc": float(roc),
-        "pr_auc": float(pr),
-        "approve_threshold": approve_th,
-        "reject_threshold": reject_th,
-        "confusion_matrix_at_reject_threshold": cm,
-        "decision_counts": pd.Series(decisions).value_counts().to_dict(),
+    # Barrido de todos los pares (aprobar <= rechazar) de la grilla
+    costs = {
+        "malo_aprobado": args.cost_bad_approved,
+        "bueno_rechazado": args.cost_good_rejected,
+        "revision": args.cost_review,
     }
+    grid = threshold_grid(args.grid_step)
+    surface = threshold_surface(*acc.arrays(), grid, costs)
+    best = best_pair(surface)
+    optimum = {k: v[best].item() for k, v in surface.items()}
+    ref = np.flatnonzero(
+        np.isclose(surface["approve_th"], REFERENCE_THRESHOLDS[0]) & np.isclose(surface["reject_th"], REFERENCE_THRESHOLDS[1])
+    )
+    reference = {k: v[ref[0]].item() for k, v in surface.items()} if len(ref) else None
+
+    if args.thresholds is not None:
+        approve_th, reject_th = args.thresholds
+        if not 0.0 <= approve_th <= reject_th <= 1.0:
+            raise ValueError(f"Umbrales inválidos: approve_th={approve_th}, reject_th={reject_th}")
+    else:
+        approve_th, reject_th = optimum["approve_th"], optimum["reject_th"]
+
+    report = acc.report(approve_th, reject_th)
+    report["threshold_optimization"] = {
+        "origen": "fijo" if args.thresholds is not None else "optimizado",
+        "costos": costs,
+        "paso_grilla": args.grid_step,
+        "optimo": optimum,
+        "referencia": reference,
+        "surface": surface_to_json(surface),
+    }
+
+    if args.bootstrap > 0:
+        y_all, proba_all = acc.arrays()
+        report["bootstrap"] = bootstrap_metrics(
+            y_all,
+            proba_all,
+            n_resamples=args.bootstrap,
+            seed=args.bootstrap_seed,
+            jobs=args.jobs,
+            decisions=decision_codes(proba_all, approve_th, reject_th),
+            labels=[str(d) for d in DECISIONS],
+        )
 
     (ARTIFACTS_DIR / "evaluation_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
     (ARTIFACTS_DIR / "thresholds.json").write_text(
@@ -66,7 +264,18 @@ def main() -> None:
     )
 
     print("OK: reporte guardado en artifacts/evaluation_report.json")
-    print(report)
+    print({k: v for k, v in report.items() if k not in ("threshold_optimization", "bootstrap")})
+    if "bootstrap" in report:
+        bs = report["bootstrap"]
+        print(
+            f"IC {bs['nivel']:.0%} ({bs['remuestreos']} remuestreos): "
+            + " | ".join(f"{m} [{bs[m]['ic_inf']:.4f}, {bs[m]['ic_sup']:.4f}]" for m in ("roc_auc", "pr_auc"))
+        )
+    print(
+        f"Umbrales ({report['threshold_optimization']['origen']}): aprobar < {approve_th:g}, rechazar >= {reject_th:g} | "
+        f"costo por solicitud óptimo {optimum['costo_por_solicitud']:.4f} "
+        f"(aprobar < {optimum['approve_th']:g}, rechazar >= {optimum['reject_th']:g})"
+    )
 
 
 if __name__ == "__main__":
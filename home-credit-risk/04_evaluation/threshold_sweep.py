@@ -0,0 +1,127 @@
+"""
+Barrido de umbrales (aprobar, rechazar) sobre todo el rango [0, 1].
+
+Las probabilidades se ordenan una sola vez; para cada umbral t, las filas
+con p < t son un prefijo del arreglo ordenado (np.searchsorted) y los
+positivos de ese prefijo salen de la suma acumulada de TARGET. Con eso cada
+par (a, r) se resuelve con restas:
+
+    aprobados   = p < a         -> n_bajo(a),        malos: pos_bajo(a)
+    rechazados  = p >= r        -> n - n_bajo(r),    buenos: neg - neg_bajo(r)
+    revisión    = el resto
+
+Costo O(n log n + k²) en lugar de recorrer las n filas por cada par.
+Las probabilidades NaN van a revisión manual (como decision_from_prob).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+DEFAULT_GRID_STEP = 0.01
+
+# Costo de negocio por solicitud, en unidades relativas (configurable desde evaluate.py)
+DEFAULT_COSTS = {
+    "malo_aprobado": 10.0,     # default aprobado automáticamente
+    "bueno_rechazado": 1.0,    # buen cliente rechazado (ingreso perdido)
+    "revision": 0.5,           # costo operativo de una revisión manual
+}
+
+
+def threshold_grid(step: float = DEFAULT_GRID_STEP) -> np.ndarray:
+    """Umbrales candidatos 0, step, 2·step, ..., 1 (redondeados para que 0.2 sea 0.2)."""
+    if not 0.0 < step <= 1.0:
+        raise ValueError(f"Paso de la grilla inválido: {step}")
+    n = int(round(1.0 / step))
+    return np.round(np.linspace(0.0, 1.0, n + 1), 10)
+
+
+def threshold_surface(
+    y: np.ndarray,
+    proba: np.ndarray,
+    thresholds: np.ndarray,
+    costs: dict[str, float] | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Métricas de todos los pares (a, r) con a <= r de la grilla, como arreglos
+    paralelos: conteos de cada decisión, matriz de confusión con "RECHAZAR"
+    como positivo (tn, fp, fn, tp), tasas y costo.
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    y = np.asarray(y, dtype=np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    nan = np.isnan(proba)
+    n = len(proba)
+    n_pos = int(y.sum())
+    nan_pos = int(y[nan].sum())
+    nan_neg = int(nan.sum()) - nan_pos
+
+    order = np.argsort(proba[~nan], kind="stable")
+    p_sorted = proba[~nan][order]
+    cum_pos = np.concatenate([[0], np.cumsum(y[~nan][order])])
+
+    # Por umbral: filas (finitas) con p < t y cuántas de ellas son positivas
+    n_below = np.searchsorted(p_sorted, thresholds, side="left")
+    pos_below = cum_pos[n_below]
+    neg_below = n_below - pos_below
+
+    ia, ir = np.triu_indices(len(thresholds))
+    n_finite = len(p_sorted)
+    aprobados = n_below[ia]
+    rechazados = n_finite - n_below[ir]
+    revision = n - aprobados - rechazados
+
+    malos_aprobados = pos_below[ia]
+    buenos_rechazados = (n - n_pos - nan_neg) - neg_below[ir]
+
+    # y_hat = p >= r; NaN nunca es >= r
+    fp = buenos_rechazados
+    tp = (n_pos - nan_pos) - pos_below[ir]
+    tn = (n - n_pos) - fp
+    fn = n_pos - tp
+
+    costo = (
+        costs["malo_aprobado"] * malos_aprobados
+        + costs["bueno_rechazado"] * buenos_rechazados
+        + costs["revision"] * revision
+    )
+    denom = max(n, 1)
+    return {
+        "approve_th": thresholds[ia],
+        "reject_th": thresholds[ir],
+        "aprobados": aprobados,
+        "revision": revision,
+        "rechazados": rechazados,
+        "tasa_aprobacion": aprobados / denom,
+        "tasa_revision": revision / denom,
+        "malos_aprobados": malos_aprobados,
+        "buenos_rechazados": buenos_rechazados,
+        "tn": tn,
+        "fp": fp,
+        "fn": fn,
+        "tp": tp,
+        "costo": costo,
+        "costo_por_solicitud": costo / denom,
+    }
+
+
+def best_pair(surface: dict[str, np.ndarray]) -> int:
+    """
+    Índice del par de menor costo. Empates: menos revisión manual y después
+    el par con umbrales más bajos (primero en la grilla).
+    """
+    # lexsort ordena por la última clave primero
+    return int(np.lexsort((np.arange(len(surface["costo"])), surface["revision"], surface["costo"]))[0])
+
+
+def surface_to_json(surface: dict[str, np.ndarray]) -> dict[str, list]:
+    """Columnas como listas de Python (una lista por métrica, no un objeto por par)."""
+    out = {}
+    for key, values in surface.items():
+        if np.issubdtype(values.dtype, np.integer):
+            out[key] = [int(v) for v in values]
+        else:
+            out[key] = [round(float(v), 6) for v in values]
+    return out
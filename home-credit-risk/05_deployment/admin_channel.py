@@ -0,0 +1,129 @@
+"""
+Acciones de /admin/* para todos los workers (serve.py o uvicorn --workers).
+
+Cada worker tiene su propio estado (bundle activo y anteriores, caché de
+predicciones, feature store abierto) y un POST /admin/... llega a uno solo.
+El worker que lo recibe aplica la acción y la publica en un directorio
+compartido; los demás la ven en su próximo chequeo (cada `poll_s`) y
+aplican la misma acción con los mismos parámetros.
+
+- Un archivo JSON por acción, con nombre <time_ns>-<pid>.json: dos workers
+  que publican a la vez no se pisan y el orden de aplicación es el de
+  publicación.
+- Solo se aplican las acciones publicadas después de start(), que corre
+  en cada worker (después del fork en serve.py): un worker reiniciado no
+  repite las anteriores, arranca con el estado que ya está en disco.
+- Los archivos de más de `keep_s` segundos se borran al publicar.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+POLL_S = 0.5
+KEEP_S = 600.0
+
+
+class AdminChannel:
+    def __init__(self, directory: Path, poll_s: float = POLL_S, keep_s: float = KEEP_S):
+        self.directory = Path(directory)
+        self.poll_s = poll_s
+        self.keep_s = keep_s
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        # Nombres ya vistos: los previos a start() y los publicados por este proceso
+        self._seen: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.applied = 0
+        self.last_error: Optional[str] = None
+
+    def on(self, action: str, handler: Callable[..., Any]) -> None:
+        """handler(**params) aplica la acción en este worker."""
+        self._handlers[action] = handler
+
+    def _names(self) -> List[str]:
+        try:
+            return sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    # ----- publicar / aplicar -----
+
+    def publish(self, action: str, **params: Any) -> None:
+        """Publica una acción que este worker ya aplicó, para el resto."""
+        if action not in self._handlers:
+            raise ValueError(f"Acción desconocida: {action}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{time.time_ns():020d}-{os.getpid()}.json"
+        tmp = self.directory / f".{name}.tmp"
+        tmp.write_text(json.dumps({"accion": action, "params": params}), encoding="utf-8")
+        # Bajo el lock: poll() no puede verla en disco antes de marcarla como vista
+        with self._lock:
+            self._seen.add(name)
+            os.replace(tmp, self.directory / name)
+
+        cutoff = time.time() - self.keep_s
+        for old in self._names():
+            path = self.directory / old
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def poll(self) -> int:
+        """Aplica las acciones de otros workers publicadas desde el último chequeo."""
+        with self._lock:
+            names = self._names()
+            # Solo se recuerdan los que siguen en disco
+            self._seen.intersection_update(names)
+            applied = 0
+            for name in names:
+                if name in self._seen:
+                    continue
+                self._seen.add(name)
+                try:
+                    msg = json.loads((self.directory / name).read_text(encoding="utf-8"))
+                    self._handlers[msg["accion"]](**msg["params"])
+                    applied += 1
+                except FileNotFoundError:
+                    continue
+                except Exception as e:  # una acción que falla no frena las siguientes
+                    self.last_error = f"{name}: {type(e).__name__}: {e}"
+                    print(f"AVISO: no se pudo aplicar la acción {name} ({e}).")
+            self.applied += applied
+            return applied
+
+    # ----- hilo -----
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            self._seen = set(self._names())
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(self.poll_s):
+                try:
+                    self.poll()
+                except Exception as e:  # el chequeo no debe morir por un error de disco
+                    print(f"AVISO: error revisando acciones de admin ({e}).")
+
+        self._thread = threading.Thread(target=run, name="admin-channel", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> dict:
+        return {"directorio": str(self.directory), "aplicadas": self.applied, "ultimo_error": self.last_error}
@@ -1,24 +1,61 @@
 from __future__ import annotations
 
 import json
+import os
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-import joblib
 import pandas as pd
 import numpy as np
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "03_modeling"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from admin_channel import AdminChannel  # noqa: E402
+from artifact_bundle import ArtifactBundle, BundleManager  # noqa: E402
+from micro_batcher import MicroBatcher  # noqa: E402
+from prediction_cache import PredictionCache, feature_key  # noqa: E402
+from metrics import (  # noqa: E402
+    BATCH_SIZE,
+    ERRORS,
+    REGISTRY,
+    STAGE_SECONDS,
+    Gauge,
+    MetricsMiddleware,
+    Stopwatch,
+)
+from feature_store import FeatureStore, current_version  # noqa: E402
+
 
 ARTIFACTS_DIR = Path("artifacts")
 MODEL_PATH = ARTIFACTS_DIR / "model.joblib"
 SCHEMA_PATH = ARTIFACTS_DIR / "feature_schema.json"
+SCORER_PATH = ARTIFACTS_DIR / "scorer.npz"
 THRESH_PATH = ARTIFACTS_DIR / "thresholds.json"
-
-
-def load_json(path: Path) -> dict:
-    return json.loads(path.read_text(encoding="utf-8"))
+FEATURE_STORE_DIR = ARTIFACTS_DIR / "feature_store"
+# Acciones de /admin/* publicadas para los demás workers (ver admin_channel.py)
+ADMIN_ACTIONS_DIR = ARTIFACTS_DIR / "admin_actions"
+# Versión del último rollback y huella de los archivos en ese momento
+ROLLBACK_PIN_PATH = ARTIFACTS_DIR / "rollback_pin.json"
+# Cada cuánto revisa el watcher si cambiaron model/schema/thresholds/scorer
+ARTIFACT_WATCH_S = 2.0
+# Cada cuánto se revisa si build_dataset publicó una versión nueva del store
+FEATURE_STORE_POLL_S = 5.0
+# Micro-batching de /evaluate_risk: hasta N requests o X ms desde el primero
+# (0 ms: se puntúa enseguida lo que haya en cola si no hay un lote en vuelo)
+MICRO_BATCHING = True
+MICRO_BATCH_MAX_ITEMS = 64
+MICRO_BATCH_MAX_WAIT_MS = 0.0
+# Caché de respuestas de /evaluate_risk (0 desactiva)
+PREDICTION_CACHE_ITEMS = 10_000
+PREDICTION_CACHE_TTL_S = 300.0
 
 
 def decision_from_prob(p: float, approve_th: float, reject_th: float) -> str:
@@ -29,7 +66,48 @@ def decision_from_prob(p: float, approve_th: float, reject_th: float) -> str:
     return "REVISIÓN MANUAL"
 
 
+def decisions_from_probs(proba: np.ndarray, approve_th: float, reject_th: float) -> np.ndarray:
+    """Versión vectorizada de decision_from_prob para un lote de probabilidades."""
+    return np.select(
+        [proba < approve_th, proba >= reject_th],
+        ["APROBAR", "RECHAZAR"],
+        default="REVISIÓN MANUAL",
+    )
+
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def read_arrow_stream(body: bytes) -> pd.DataFrame:
+    try:
+        import pyarrow as pa
+    except ImportError as e:  # pragma: no cover - dependencia opcional
+        raise RuntimeError("Para payloads Arrow instala pyarrow.") from e
+
+    with pa.ipc.open_stream(body) as reader:
+        return reader.read_all().to_pandas()
+
+
 app = FastAPI(title="Home Credit Risk API", version="1.0")
+app.add_middleware(
+    MetricsMiddleware,
+    endpoints=["/evaluate_risk", "/evaluate_risk_batch", "/health", "/metrics"],
+    version=lambda: bundles.current.version if bundles.current is not None else None,
+)
+
+
+def error_response(endpoint: str, message: str, e: Exception) -> JSONResponse:
+    """
+    Errores con su código HTTP: 422 si el problema está en los datos enviados
+    (JSON inválido, validación, tipos o valores que el modelo no acepta;
+    JSONDecodeError y ValidationError son ValueError), 500 si es del
+    servidor. Un KeyError es un bug del servidor (p. ej. artefactos
+    inconsistentes), no del request: va a 500. Cada error se cuenta por
+    endpoint y tipo.
+    """
+    ERRORS.inc(endpoint, type(e).__name__)
+    status = 422 if isinstance(e, (ValueError, TypeError)) else 500
+    return JSONResponse(status_code=status, content={"error": message, "detalle": str(e)})
 
 
 class EvaluateRiskRequest(BaseModel):
@@ -37,63 +115,382 @@ class EvaluateRiskRequest(BaseModel):
     data: Dict[str, Any]
 
 
+class EvaluateRiskBatchRequest(BaseModel):
+    # Lote de solicitantes: lista de registros ("data") o formato columnar ("columns")
+    data: Optional[List[Dict[str, Any]]] = None
+    columns: Optional[Dict[str, List[Any]]] = None
+
+
+bundles = BundleManager(MODEL_PATH, SCHEMA_PATH, SCORER_PATH, THRESH_PATH)
+# Se crea al importar: en serve.py, en el padre antes del fork
+admin = AdminChannel(ADMIN_ACTIONS_DIR)
+
+
 @app.on_event("startup")
 def _load_artifacts():
-    global model, schema, thresholds
-    if not MODEL_PATH.exists():
-        raise RuntimeError("No existe artifacts/model.joblib. Entrena primero el modelo.")
-    if not SCHEMA_PATH.exists():
-        raise RuntimeError("No existe artifacts/feature_schema.json. Construye dataset primero.")
+    # En serve.py los artefactos ya vienen cargados del proceso padre (fork)
+    if bundles.current is None:
+        bundles.reload()
+    _restore_rollback_pin()
+    bundles.start_watcher(ARTIFACT_WATCH_S)
+    admin.start()
+
+    if reload_feature_store() is None:
+        print("AVISO: no hay feature store; se puntúa solo con los campos del request.")
+
+
+@app.on_event("shutdown")
+def _stop_watcher():
+    bundles.stop_watcher()
+    admin.stop()
+
+
+batcher: Optional[MicroBatcher] = None
+prediction_cache = PredictionCache(PREDICTION_CACHE_ITEMS, PREDICTION_CACHE_TTL_S)
 
-    model = joblib.load(MODEL_PATH)
-    schema = load_json(SCHEMA_PATH)
 
-    if THRESH_PATH.exists():
-        thresholds = load_json(THRESH_PATH)
-    else:
-        thresholds = {"approve_th": 0.20, "reject_th": 0.50}
+@app.on_event("startup")
+async def _start_batcher():
+    global batcher
+    if MICRO_BATCHING:
+        batcher = MicroBatcher(
+            _score_records,
+            MICRO_BATCH_MAX_ITEMS,
+            MICRO_BATCH_MAX_WAIT_MS,
+            on_wait=lambda w: STAGE_SECONDS.observe(w, "cola", bundles.current.version),
+        )
+        batcher.start()
+
+
+@app.on_event("shutdown")
+async def _stop_batcher():
+    if batcher is not None:
+        await batcher.stop()
+
+
+# ----- Feature store (historial agregado por SK_ID_CURR) -----
+
+feature_store: Optional[FeatureStore] = None
+_store_lock = threading.Lock()
+_store_checked_at = 0.0
+
+
+def reload_feature_store() -> Optional[str]:
+    """
+    Abre la versión publicada en artifacts/feature_store/CURRENT si cambió.
+    El reemplazo es una sola asignación: los requests en curso terminan con
+    la versión que ya tenían y los siguientes usan la nueva.
+    """
+    global feature_store, _store_checked_at
+    with _store_lock:
+        _store_checked_at = time.monotonic()
+        version = current_version(FEATURE_STORE_DIR)
+        if version is None:
+            return None
+        if feature_store is None or feature_store.version != version:
+            feature_store = FeatureStore(FEATURE_STORE_DIR / version)
+        return feature_store.version
+
+
+def _current_store() -> Optional[FeatureStore]:
+    if time.monotonic() - _store_checked_at >= FEATURE_STORE_POLL_S:
+        try:
+            reload_feature_store()
+        except (OSError, ValueError) as e:
+            # Versión ilegible: se sigue sirviendo con la anterior
+            print(f"AVISO: no se pudo abrir el feature store nuevo ({e}).")
+    return feature_store
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    store = feature_store
+    b = bundles.current
+    return {
+        "status": "ok",
+        "pid": os.getpid(),
+        "version_modelo": b.version if b is not None else None,
+        "feature_store": store.version if store is not None else None,
+    }
+
+
+# Con varios workers cada POST llega a uno solo: la acción se aplica acá y
+# se publica para que los demás la apliquen igual
+admin.on("artifacts_reload", lambda force: bundles.reload(force=force))
+admin.on("artifacts_rollback", lambda version: bundles.rollback(version))
+admin.on("cache_clear", lambda: prediction_cache.clear())
+admin.on("feature_store_reload", lambda: reload_feature_store())
+
+
+@app.get("/admin/artifacts")
+def admin_artifacts():
+    return {**bundles.status(), "pid": os.getpid(), "acciones_admin": admin.status()}
+
+
+def _write_rollback_pin(version: str) -> None:
+    tmp = ROLLBACK_PIN_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps({"version": version, "archivos": bundles.fingerprint()}), encoding="utf-8")
+    os.replace(tmp, ROLLBACK_PIN_PATH)
+
+
+def _restore_rollback_pin() -> None:
+    """
+    Un worker que arranca (p. ej. reiniciado por serve.py) vuelve a la versión
+    del último rollback si los archivos no cambiaron desde entonces; si no,
+    su watcher cargaría lo que hay en disco y quedaría distinto del resto.
+    """
+    try:
+        pin = json.loads(ROLLBACK_PIN_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return
+    if json.loads(json.dumps(bundles.fingerprint())) != pin["archivos"]:
+        return
+    try:
+        bundles.rollback(pin["version"])
+    except ValueError as e:
+        print(f"AVISO: no se pudo volver a la versión del último rollback ({e}).")
+
+
+@app.post("/admin/artifacts/reload")
+def admin_reload_artifacts(force: bool = False):
+    """Relee los artefactos ya (sin esperar al watcher); force=true reactiva aunque no cambien."""
+    try:
+        bundles.reload(force=force)
+        ROLLBACK_PIN_PATH.unlink(missing_ok=True)
+        admin.publish("artifacts_reload", force=force)
+    except Exception as e:
+        ERRORS.inc("/admin/artifacts/reload", type(e).__name__)
+        return JSONResponse(
+            status_code=500,
+            content={"error": "No se pudieron recargar los artefactos", "detalle": str(e), **bundles.status()},
+        )
+    return bundles.status()
+
+
+@app.post("/admin/artifacts/rollback")
+def admin_rollback_artifacts(version: Optional[str] = None):
+    """
+    Vuelve a la versión activa anterior, o a `version` si está entre las
+    anteriores (queda activa hasta el próximo cambio en disco). Los demás
+    workers, y los que arranquen después, vuelven a esa misma versión.
+    """
+    try:
+        bundle = bundles.rollback(version)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "No se pudo volver atrás", "detalle": str(e), **bundles.status()},
+        )
+    _write_rollback_pin(bundle.version)
+    admin.publish("artifacts_rollback", version=bundle.version)
+    return bundles.status()
+
+
+@app.get("/admin/cache")
+def admin_cache():
+    """Hit rate, tamaño y memoria aproximada de la caché de predicciones."""
+    return prediction_cache.stats()
+
+
+@app.post("/admin/cache/clear")
+def admin_cache_clear():
+    prediction_cache.clear()
+    admin.publish("cache_clear")
+    return prediction_cache.stats()
+
+
+@app.get("/admin/batching")
+def admin_batching():
+    """Tamaño de lote, espera en cola y throughput del micro-batcher."""
+    if batcher is None:
+        return {"activo": False}
+    return {"activo": batcher.running, **batcher.stats()}
+
+
+@app.post("/admin/feature_store/reload")
+def admin_reload_feature_store():
+    """Fuerza la lectura de CURRENT (sin esperar al próximo chequeo periódico)."""
+    try:
+        version = reload_feature_store()
+        admin.publish("feature_store_reload")
+    except (OSError, ValueError) as e:
+        ERRORS.inc("/admin/feature_store/reload", type(e).__name__)
+        return JSONResponse(status_code=500, content={"error": "No se pudo cargar el feature store", "detalle": str(e)})
+    store = feature_store
+    return {"feature_store": version, "n_clientes": len(store) if store is not None else 0}
+
+
+def _risk_response(b: ArtifactBundle, proba: float, decision: str) -> dict:
+    thresholds = b.thresholds
+    return {
+        "probabilidad_incumplimiento": proba,
+        "decision_sugerida": decision,
+        "umbral_aprobar": thresholds["approve_th"],
+        "umbral_rechazar": thresholds["reject_th"],
+        "version_modelo": b.version,
+    }
+
+
+def _score_one(
+    data: Dict[str, Any],
+    b: Optional[ArtifactBundle] = None,
+    store: Optional[FeatureStore] = None,
+    sw: Optional[Stopwatch] = None,
+) -> dict:
+    # Una sola lectura: todo el request usa el mismo modelo, schema y umbrales
+    if b is None:
+        b, store = bundles.current, _current_store()
+    sw = sw if sw is not None else Stopwatch(b.version)
+    # Features del historial (prev_*, bureau_*, ...) que el request no trae
+    if store is not None:
+        data = store.fill_record(data)
+        sw.lap("historial")
+
+    proba = b.score_record(data, sw)
+    decision = decision_from_prob(proba, b.thresholds["approve_th"], b.thresholds["reject_th"])
+    sw.lap("decision")
+    return _risk_response(b, proba, decision)
+
+
+def _score_records(records: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Puntúa un lote del micro-batcher con una sola llamada a predict_proba.
+    Los registros ya vienen con el historial completado (evaluate_risk).
+    Devuelve un resultado por registro (o la excepción de ese registro).
+    """
+    b = bundles.current
+    sw = Stopwatch(b.version)
+    BATCH_SIZE.observe(len(records), "micro_batch")
+    try:
+        proba = b.score_records(records, sw)
+    except Exception:
+        # Un registro inválido no debe hacer fallar a los demás: uno por uno
+        out = []
+        for data in records:
+            try:
+                out.append(_score_one(data, b))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    decisions = decisions_from_probs(proba, b.thresholds["approve_th"], b.thresholds["reject_th"])
+    out = [_risk_response(b, float(p), str(d)) for p, d in zip(proba, decisions)]
+    sw.lap("decision")
+    return out
 
 
 @app.post("/evaluate_risk")
-def evaluate_risk(req: EvaluateRiskRequest):
+async def evaluate_risk(request: Request):
     try:
-        feature_cols = schema["feature_cols"]
+        b, store = bundles.current, _current_store()
+        sw = Stopwatch(b.version)
+        req = EvaluateRiskRequest(**(await request.json()))
+        sw.lap("parse")
+        # Features del historial (prev_*, bureau_*, ...) que el request no trae
+        data = store.fill_record(req.data) if store is not None else req.data
+        if store is not None:
+            sw.lap("historial")
 
-        # Construir df de 1 fila
-        x = pd.DataFrame([req.data])
+        key = None
+        if prediction_cache.enabled:
+            # Misma versión de modelo/umbrales y de historial, mismos valores -> misma respuesta
+            version = (b.version, store.version if store is not None else None)
+            key = feature_key(data, b.feature_cols)
+            cached = prediction_cache.get(key, version)
+            sw.lap("cache")
+            if cached is not None:
+                return cached
 
-        # Agregar columnas faltantes
-        for c in feature_cols:
-            if c not in x.columns:
-                x[c] = pd.NA
+        if batcher is not None and batcher.running:
+            result = await batcher.submit(data)
+        else:
+            result = await run_in_threadpool(_score_one, data, b)
 
-        # Eliminar columnas extra
-        x = x[feature_cols]
+        if key is not None and result["version_modelo"] == b.version:
+            prediction_cache.put(key, result, version)
+        return result
 
-        # 🔑 CLAVE: convertir pd.NA a np.nan (sklearn-friendly)
-        x = x.replace({pd.NA: np.nan})
+    except Exception as e:
+        return error_response("/evaluate_risk", "Error al evaluar el riesgo", e)
 
-        proba = float(model.predict_proba(x)[:, 1][0])
-        decision = decision_from_prob(
-            proba,
-            thresholds["approve_th"],
-            thresholds["reject_th"],
-        )
 
-        return {
-            "probabilidad_incumplimiento": proba,
-            "decision_sugerida": decision,
-            "umbral_aprobar": thresholds["approve_th"],
-            "umbral_rechazar": thresholds["reject_th"],
-        }
+def _score_batch(x: pd.DataFrame, sw: Stopwatch) -> dict:
+    b = bundles.current
+    sw.version = b.version
+    sw.restart()
+    store = _current_store()
+    if store is not None:
+        x = store.fill_frame(x)
+        sw.lap("historial")
+    BATCH_SIZE.observe(len(x), "lote")
+
+    proba = b.predict_proba(x, sw)
+    thresholds = b.thresholds
+    decisions = decisions_from_probs(proba, thresholds["approve_th"], thresholds["reject_th"])
+    sw.lap("decision")
+
+    return {
+        "n": int(len(proba)),
+        "probabilidad_incumplimiento": proba.tolist(),
+        "decision_sugerida": decisions.tolist(),
+        "umbral_aprobar": thresholds["approve_th"],
+        "umbral_rechazar": thresholds["reject_th"],
+        "version_modelo": b.version,
+    }
+
+
+@app.post("/evaluate_risk_batch")
+async def evaluate_risk_batch(request: Request):
+    """
+    Evalúa un lote de solicitantes con una sola llamada a predict_proba.
+    Acepta JSON ({"data": [...]} o {"columns": {...}}) o un stream Arrow IPC.
+    """
+    try:
+        sw = Stopwatch(bundles.current.version)
+        if request.headers.get("content-type", "").startswith(ARROW_STREAM_TYPE):
+            x = read_arrow_stream(await request.body())
+        else:
+            req = EvaluateRiskBatchRequest(**(await request.json()))
+            if req.columns is not None:
+                x = pd.DataFrame(req.columns)
+            elif req.data is not None:
+                x = pd.DataFrame.from_records(req.data)
+            else:
+                raise ValueError("El lote debe traer 'data' (lista de registros) o 'columns'.")
+
+        if len(x) == 0:
+            raise ValueError("El lote está vacío.")
+        sw.lap("parse")
+
+        # predict_proba es CPU: fuera del event loop
+        return await run_in_threadpool(_score_batch, x, sw)
 
     except Exception as e:
-        return {
-            "error": "Error al evaluar el riesgo",
-            "detalle": str(e),
-        }
+        return error_response("/evaluate_risk_batch", "Error al evaluar el lote", e)
+
+
+# ----- /metrics -----
+
+def _info_metric() -> dict:
+    b, store = bundles.current, feature_store
+    return {(b.version if b is not None else "-", store.version if store is not None else "-", str(os.getpid())): 1}
+
+
+def _cache_metric(field: str) -> dict:
+    return {(): prediction_cache.stats()[field]}
+
+
+REGISTRY.register(Gauge("hcr_info", "Versión activa de modelo/umbrales y de feature store", ["version", "feature_store", "pid"], _info_metric))
+REGISTRY.register(Gauge("hcr_cache_hits_total", "Aciertos de la caché de predicciones", [], lambda: _cache_metric("hits"), kind="counter"))
+REGISTRY.register(Gauge("hcr_cache_misses_total", "Fallos de la caché de predicciones", [], lambda: _cache_metric("misses"), kind="counter"))
+REGISTRY.register(Gauge("hcr_cache_items", "Entradas en la caché de predicciones", [], lambda: _cache_metric("items")))
+REGISTRY.register(Gauge(
+    "hcr_batch_queue", "Requests esperando en el micro-batcher", [],
+    lambda: {(): batcher.stats()["en_cola"] if batcher is not None else 0},
+))
+
+
+@app.get("/metrics")
+def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,356 @@
+"""
+Artefactos de la API (modelo + schema + umbrales) como un bundle versionado
+que se recarga sin reiniciar el servidor.
+
+- La versión es un hash del contenido de model.joblib, feature_schema.json y
+  thresholds.json: mismo contenido, misma versión (en cualquier worker).
+- Un hilo en segundo plano revisa (tamaño, mtime) de los archivos; cuando
+  cambian y se mantienen estables entre dos chequeos, carga y valida el
+  bundle nuevo fuera del camino de los requests y lo activa con una sola
+  asignación. Si el bundle nuevo es inválido se sigue sirviendo el actual.
+- Se guardan los bundles anteriores en memoria para poder volver atrás.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from request_encoder import RequestEncoder, build_request_encoder
+from fused_scorer import FusedScorer, load_fresh_fused_scorer
+from metrics import Stopwatch
+
+
+DEFAULT_THRESHOLDS = {"approve_th": 0.20, "reject_th": 0.50}
+WATCH_INTERVAL_S = 2.0
+KEEP_PREVIOUS = 3
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_json(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def align_to_schema(x: pd.DataFrame, feature_cols: List[str], sw: Optional[Stopwatch] = None) -> pd.DataFrame:
+    """
+    Alinea un lote de solicitantes a feature_cols en una sola pasada:
+    agrega faltantes como NaN y elimina columnas extra.
+    """
+    x = x.reindex(columns=feature_cols)
+    _lap(sw, "alineacion")
+
+    # pd.NA -> np.nan solo donde puede aparecer (columnas object)
+    obj_cols = x.columns[x.dtypes == object]
+    if len(obj_cols):
+        x[obj_cols] = x[obj_cols].astype(object).where(x[obj_cols].notna(), np.nan)
+    _lap(sw, "reemplazo_na")
+    return x
+
+
+def _lap(sw: Optional[Stopwatch], stage: str) -> None:
+    if sw is not None:
+        sw.lap(stage)
+
+
+class ArtifactBundle:
+    """
+    Modelo (scorer fusionado, encoder o Pipeline), schema y umbrales de una versión.
+    Los métodos de puntaje aceptan un Stopwatch opcional para medir cada etapa.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        schema: dict,
+        thresholds: dict,
+        scorer: Optional[FusedScorer] = None,
+        model: Any = None,
+        encoder: Optional[RequestEncoder] = None,
+    ):
+        self.version = version
+        self.schema = schema
+        self.thresholds = thresholds
+        self.scorer = scorer
+        self.model = model
+        self.encoder = encoder
+        self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    @property
+    def feature_cols(self) -> List[str]:
+        return self.schema["feature_cols"]
+
+    def score_record(self, data: Dict[str, Any], sw: Optional[Stopwatch] = None) -> float:
+        if self.scorer is not None:
+            p = self.scorer.score_record(data)
+            _lap(sw, "predict_proba")
+            return p
+        if self.encoder is not None:
+            # Camino rápido: fila ya imputada/one-hot, directo al clasificador
+            row = self.encoder.encode(data)
+            _lap(sw, "encode")
+            p = float(self.model[-1].predict_proba(row)[0, 1])
+            _lap(sw, "predict_proba")
+            return p
+        x = align_to_schema(pd.DataFrame([data]), self.feature_cols, sw)
+        p = float(self.model.predict_proba(x)[:, 1][0])
+        _lap(sw, "predict_proba")
+        return p
+
+    def score_records(self, records: List[Dict[str, Any]], sw: Optional[Stopwatch] = None) -> np.ndarray:
+        """
+        Probabilidades para varios requests individuales (micro-batching).
+        El costo fijo por llamada está en el clasificador de sklearn: con el
+        encoder las filas se codifican por separado y se puntúan con un solo
+        predict_proba. El scorer fusionado no tiene ese costo fijo y puntúa
+        cada dict directamente.
+        """
+        if self.scorer is not None:
+            p = np.fromiter((self.scorer.score_record(d) for d in records), dtype=np.float64, count=len(records))
+            _lap(sw, "predict_proba")
+            return p
+        if self.encoder is not None:
+            rows = np.vstack([self.encoder.encode(d) for d in records])
+            _lap(sw, "encode")
+            p = self.model[-1].predict_proba(rows)[:, 1]
+            _lap(sw, "predict_proba")
+            return p
+        return self.predict_proba(pd.DataFrame.from_records(records), sw)
+
+    def predict_proba(self, x: pd.DataFrame, sw: Optional[Stopwatch] = None) -> np.ndarray:
+        """Probabilidad de incumplimiento para un lote (se alinea a feature_cols)."""
+        x = align_to_schema(x, self.feature_cols, sw)
+        p = (self.scorer if self.scorer is not None else self.model).predict_proba(x)[:, 1]
+        _lap(sw, "predict_proba")
+        return p
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "scorer": "fusionado" if self.scorer is not None else ("encoder" if self.encoder is not None else "pipeline"),
+            "umbral_aprobar": self.thresholds["approve_th"],
+            "umbral_rechazar": self.thresholds["reject_th"],
+        }
+
+
+def _validate_thresholds(th: dict) -> dict:
+    try:
+        approve, reject = float(th["approve_th"]), float(th["reject_th"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"thresholds.json inválido: {e}") from e
+    if not (0.0 <= approve <= reject <= 1.0):
+        raise ValueError(f"Umbrales inválidos: approve_th={approve}, reject_th={reject}")
+    return {**th, "approve_th": approve, "reject_th": reject}
+
+
+class BundleManager:
+    """
+    Bundle activo + anteriores. `current` siempre apunta a un bundle completo
+    y validado: cada request lo lee una vez al empezar y usa esa versión
+    hasta terminar, aunque en el medio se active otra.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        schema_path: Path,
+        scorer_path: Path,
+        thresholds_path: Path,
+        keep_previous: int = KEEP_PREVIOUS,
+        mmap_dir: Optional[Path] = None,
+    ):
+        self.model_path = Path(model_path)
+        self.schema_path = Path(schema_path)
+        self.scorer_path = Path(scorer_path)
+        self.thresholds_path = Path(thresholds_path)
+        # Con mmap_dir los arrays del modelo se abren memory-mapped (compartidos entre workers)
+        self.mmap_dir = None if mmap_dir is None else Path(mmap_dir)
+
+        self.current: Optional[ArtifactBundle] = None
+        self.previous: deque[ArtifactBundle] = deque(maxlen=keep_previous)
+        self.last_error: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._seen: Optional[Tuple] = None      # huella de los archivos ya procesados
+        self._pending: Optional[Tuple] = None   # huella vista en el chequeo anterior
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ----- carga -----
+
+    def _watched(self) -> List[Path]:
+        return [self.model_path, self.schema_path, self.thresholds_path, self.scorer_path]
+
+    def fingerprint(self) -> Tuple:
+        """(tamaño, mtime) de cada archivo: barato, se evalúa en cada chequeo."""
+        out = []
+        for p in self._watched():
+            try:
+                st = p.stat()
+                out.append((st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                out.append(None)
+        return tuple(out)
+
+    def content_version(self) -> str:
+        h = hashlib.sha256()
+        for p in [self.model_path, self.schema_path, self.thresholds_path]:
+            h.update((_sha256(p) if p.exists() else "-").encode())
+        return h.hexdigest()[:12]
+
+    def load(self) -> ArtifactBundle:
+        """Carga y valida un bundle desde disco (no lo activa)."""
+        if not self.model_path.exists():
+            raise RuntimeError(f"No existe {self.model_path}. Entrena primero el modelo.")
+        if not self.schema_path.exists():
+            raise RuntimeError(f"No existe {self.schema_path}. Construye dataset primero.")
+
+        version = self.content_version()
+        schema = _load_json(self.schema_path)
+        if not isinstance(schema.get("feature_cols"), list) or not schema["feature_cols"]:
+            raise ValueError("feature_schema.json no tiene feature_cols.")
+        if self.thresholds_path.exists():
+            thresholds = _validate_thresholds(_load_json(self.thresholds_path))
+        else:
+            thresholds = dict(DEFAULT_THRESHOLDS)
+
+        model, encoder = None, None
+        # Scorer fusionado (NumPy puro): no hace falta des-serializar el Pipeline
+        scorer = load_fresh_fused_scorer(self.scorer_path, self.model_path, mmap_dir=self.mmap_dir)
+        if scorer is None:
+            model = joblib.load(self.model_path, mmap_mode="r" if self.mmap_dir is not None else None)
+            names = getattr(model, "feature_names_in_", None)
+            if names is not None and set(names) != set(schema["feature_cols"]):
+                raise ValueError("Las columnas del modelo no coinciden con feature_schema.json.")
+            # Encoder precompilado; si el modelo no tiene la estructura esperada
+            # se usa el camino con DataFrame.
+            try:
+                encoder = build_request_encoder(model, schema["feature_cols"])
+            except ValueError as e:
+                print(f"AVISO: encoder precompilado no disponible ({e}).")
+        elif not set(scorer.feature_cols) <= set(schema["feature_cols"]):
+            raise ValueError("Las columnas del scorer no están en feature_schema.json.")
+
+        bundle = ArtifactBundle(version, schema, thresholds, scorer=scorer, model=model, encoder=encoder)
+        # Prueba de humo: un solicitante sin datos debe dar una probabilidad válida
+        p = bundle.score_record({})
+        if not (0.0 <= p <= 1.0) or math.isnan(p):
+            raise ValueError(f"El modelo devuelve una probabilidad inválida: {p}")
+        return bundle
+
+    def _activate(self, bundle: ArtifactBundle) -> None:
+        if self.current is not None and self.current.version != bundle.version:
+            self.previous.append(self.current)
+        self.current = bundle
+
+    def reload(self, force: bool = False) -> ArtifactBundle:
+        """
+        Carga los archivos actuales y los activa si su versión es distinta de
+        la activa (o siempre, con force). Si fallan, se mantiene el bundle
+        activo y se propaga el error.
+        """
+        with self._lock:
+            fp = self.fingerprint()
+            self._seen = self._pending = fp
+            try:
+                bundle = self.load()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            self.last_error = None
+            if force or self.current is None or bundle.version != self.current.version:
+                self._activate(bundle)
+            return self.current
+
+    def rollback(self, version: Optional[str] = None) -> ArtifactBundle:
+        """
+        Vuelve al bundle activo anterior, o a `version` si se indica (lo que
+        aplican los demás workers cuando uno hizo rollback). Sin leer disco.
+        Lo que ya hay en disco se da por visto: queda activa hasta el
+        próximo cambio, también en workers que todavía no lo habían cargado.
+        """
+        with self._lock:
+            if version is not None and self.current is not None and self.current.version == version:
+                bundle = self.current
+            elif version is not None:
+                if version not in [b.version for b in self.previous]:
+                    raise ValueError(f"La versión {version} no está entre las anteriores.")
+                bundle = self.previous.pop()
+                while bundle.version != version:
+                    bundle = self.previous.pop()
+            elif self.previous:
+                bundle = self.previous.pop()
+            else:
+                raise ValueError("No hay una versión anterior a la cual volver.")
+            self.current = bundle
+            self._seen = self._pending = self.fingerprint()
+            return bundle
+
+    def check(self) -> bool:
+        """
+        Un chequeo del watcher. Recarga solo si la huella cambió y se mantuvo
+        igual desde el chequeo anterior (evita leer un archivo a medio escribir).
+        """
+        fp = self.fingerprint()
+        if fp == self._seen:
+            self._pending = fp
+            return False
+        if fp != self._pending:
+            self._pending = fp
+            return False
+        before = self.current.version if self.current is not None else None
+        try:
+            bundle = self.reload()
+        except Exception as e:
+            print(f"AVISO: artefactos nuevos inválidos, se mantiene la versión {before} ({e}).")
+            return False
+        if bundle.version != before:
+            print(f"OK: artefactos recargados: versión {before} -> {bundle.version}")
+            return True
+        return False
+
+    # ----- watcher -----
+
+    def start_watcher(self, interval: float = WATCH_INTERVAL_S) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as e:  # el watcher no debe morir por un error de disco
+                    print(f"AVISO: error revisando artefactos ({e}).")
+
+        self._thread = threading.Thread(target=run, name="artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> dict:
+        return {
+            "activa": self.current.info() if self.current is not None else None,
+            "anteriores": [b.version for b in reversed(self.previous)],
+            "ultimo_error": self.last_error,
+        }
@@ -0,0 +1,210 @@
+"""
+Métricas en proceso para /metrics (formato de texto de Prometheus), sin
+dependencias externas.
+
+Cada histograma y contador agrega en memoria por combinación de labels
+(una lista de buckets + suma + conteo bajo un lock), así que observar un
+valor cuesta ~1 µs; el texto se genera solo cuando se pide /metrics.
+
+Con serve.py cada worker tiene sus propias métricas: el label `pid` de
+hcr_info permite distinguirlos al agregarlas en Prometheus.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Segundos: de 50 µs (scorer fusionado) a 10 s (lotes grandes)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines += [f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [conteo por bucket (no acumulado, +1 para +Inf), suma, conteo]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, (list(c), total, n)) for k, (c, total, n) in self._series.items()]
+        for key, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {acc}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {n}")
+        return lines
+
+
+class Gauge:
+    """
+    Valor leído al momento de /metrics (callback -> {labels: valor}). Con
+    kind="counter" sirve para exponer contadores que ya lleva otro objeto
+    (p. ej. hits de la caché) sin duplicarlos.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str],
+        read: Callable[[], Dict[Tuple[str, ...], float]],
+        kind: str = "gauge",
+    ):
+        self.name, self.help, self.label_names, self.read, self.kind = name, help, tuple(labels), read, kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.read()
+        except Exception:  # una métrica rota no debe romper /metrics
+            return lines
+        lines += [f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in values.items() if v is not None]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "hcr_requests_total", "Requests HTTP por endpoint, código de estado y versión de modelo",
+    ["endpoint", "status", "version"],
+))
+ERRORS = REGISTRY.register(Counter(
+    "hcr_errors_total", "Errores por endpoint y tipo de excepción", ["endpoint", "type"],
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "hcr_request_seconds", "Latencia total del request (servidor)", ["endpoint"],
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "hcr_stage_seconds",
+    "Tiempo por etapa: parse, historial, cache, cola, alineacion, reemplazo_na, encode, predict_proba, decision",
+    ["stage", "version"],
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "hcr_batch_size", "Solicitantes por llamada al modelo", ["source"], buckets=BATCH_SIZE_BUCKETS,
+))
+
+
+class Stopwatch:
+    """Cronómetro por etapas: `lap(stage)` registra el tiempo desde la vuelta anterior."""
+
+    __slots__ = ("version", "_t")
+
+    def __init__(self, version: str):
+        self.version = version
+        self._t = time.perf_counter()
+
+    def lap(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._t
+        self._t = now
+        STAGE_SECONDS.observe(elapsed, stage, self.version)
+        return elapsed
+
+    def restart(self) -> None:
+        self._t = time.perf_counter()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware, para no agregar overhead):
+    latencia total y conteo por endpoint/código/versión. Las rutas que no
+    están en `endpoints` se agrupan como "otro" para acotar la cardinalidad.
+    """
+
+    def __init__(self, app, endpoints: Iterable[str], version: Callable[[], Optional[str]]):
+        self.app = app
+        self.endpoints = set(endpoints)
+        self.version = version
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope.get("path", "")
+        endpoint = path if path in self.endpoints else "otro"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint)
+            REQUESTS.inc(endpoint, str(status["code"]), self.version() or "-")
@@ -0,0 +1,203 @@
+"""
+Micro-batching de requests individuales.
+
+Los requests a /evaluate_risk se encolan; una tarea del event loop toma lo
+que haya en cola (hasta `max_items`), puntúa todo el lote con una sola
+llamada vectorizada en un hilo (fuera del event loop) y resuelve el future
+de cada request con su resultado.
+
+Solo hay un lote en vuelo a la vez: mientras se puntúa uno, el siguiente se
+va llenando en la cola, así que con carga alta los lotes crecen solos. Con
+`max_wait_ms` = 0 (por defecto) no se espera a que llegue más: si no hay un
+lote puntuándose, el primer request se puntúa enseguida y con carga baja no
+se agrega latencia. Con `max_wait_ms` > 0 el lote espera además hasta ese
+tiempo desde el primer item (o hasta `max_items`) antes de puntuarse.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+
+# Cuántos lotes recientes se usan para percentiles y throughput
+WINDOW_BATCHES = 1024
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        score_batch: Callable[[List[Any]], List[Any]],
+        max_items: int = 64,
+        max_wait_ms: float = 0.0,
+        on_wait: Optional[Callable[[float], None]] = None,
+    ):
+        """
+        score_batch recibe la lista de items del lote y devuelve un resultado
+        por item (en el mismo orden). Se ejecuta en el threadpool.
+        on_wait recibe la espera en cola (segundos) de cada item.
+        """
+        if max_items < 1:
+            raise ValueError("max_items debe ser >= 1.")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms debe ser >= 0.")
+        self.score_batch = score_batch
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000.0
+        self.on_wait = on_wait
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Lote que se está puntuando (para fallar sus futures en stop())
+        self._inflight: list = []
+
+        # Métricas acumuladas + ventana de lotes recientes
+        self.n_batches = 0
+        self.n_items = 0
+        self.n_errors = 0
+        self.started_at = time.monotonic()
+        self._recent = deque(maxlen=WINDOW_BATCHES)  # (fin, tamaño, espera máx. en cola, duración)
+        self._waits = deque(maxlen=WINDOW_BATCHES * 8)  # espera en cola de cada item
+
+    # ----- ciclo de vida -----
+
+    def start(self) -> None:
+        """Arranca la tarea consumidora en el event loop actual."""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Detiene la tarea consumidora. Los requests del lote en vuelo y los que
+        quedaban en cola reciben un RuntimeError en vez de quedar esperando.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        pending = self._inflight
+        self._inflight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, _, fut in pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError("El micro-batcher se detuvo antes de puntuar el request."))
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # ----- API -----
+
+    async def submit(self, item: Any) -> Any:
+        """Encola un item y espera su resultado (o la excepción de su puntaje)."""
+        if not self.running:
+            raise RuntimeError("El micro-batcher no está corriendo.")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((time.monotonic(), item, fut))
+        return await fut
+
+    async def _collect(self) -> list:
+        # Se llama solo sin lote en vuelo: entra lo que ya está en cola (lo que
+        # llegó mientras se puntuaba el anterior) y, solo con max_wait > 0, lo
+        # que llegue hasta max_wait desde el primer item
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first[0] + self.max_wait
+        while len(batch) < self.max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            self._inflight = batch = await self._collect()
+            t_start = time.monotonic()
+            # Requests cancelados (cliente desconectado) no se puntúan
+            batch = [entry for entry in batch if not entry[2].done()]
+            if not batch:
+                continue
+            waits = [t_start - t for t, _, _ in batch]
+            if self.on_wait is not None:
+                for w in waits:
+                    self.on_wait(w)
+
+            try:
+                results = await run_in_threadpool(self.score_batch, [item for _, item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"score_batch devolvió {len(results)} resultados para {len(batch)} items.")
+            except Exception as e:
+                self.n_errors += 1
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for (_, _, fut), res in zip(batch, results):
+                    if fut.done():
+                        continue
+                    if isinstance(res, Exception):
+                        fut.set_exception(res)
+                    else:
+                        fut.set_result(res)
+
+            t_end = time.monotonic()
+            self.n_batches += 1
+            self.n_items += len(batch)
+            self._recent.append((t_end, len(batch), max(waits), t_end - t_start))
+            self._waits.extend(waits)
+            self._inflight = []
+
+    # ----- métricas -----
+
+    def stats(self) -> dict:
+        out = {
+            "max_items": self.max_items,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "lotes": self.n_batches,
+            "items": self.n_items,
+            "lotes_con_error": self.n_errors,
+            "en_cola": self._queue.qsize() if self._queue is not None else 0,
+            "tamano_lote_promedio": round(self.n_items / self.n_batches, 2) if self.n_batches else None,
+        }
+        if self._recent:
+            ends, sizes, _, durations = (np.asarray(v, dtype=np.float64) for v in zip(*self._recent))
+            waits_ms = np.asarray(self._waits, dtype=np.float64) * 1000.0
+            span = ends[-1] - ends[0]
+            out["ventana"] = {
+                "lotes": int(len(sizes)),
+                "tamano_lote": {
+                    "p50": float(np.percentile(sizes, 50)),
+                    "p95": float(np.percentile(sizes, 95)),
+                    "max": int(sizes.max()),
+                },
+                "espera_en_cola_ms": {
+                    "p50": round(float(np.percentile(waits_ms, 50)), 3),
+                    "p95": round(float(np.percentile(waits_ms, 95)), 3),
+                    "p99": round(float(np.percentile(waits_ms, 99)), 3),
+                },
+                "puntaje_lote_ms_p50": round(float(np.percentile(durations, 50)) * 1000.0, 3),
+                # Items por segundo entre el primer y el último lote de la ventana
+                "items_por_segundo": round(float(sizes[1:].sum() / span), 1) if span > 0 else None,
+            }
+        return out
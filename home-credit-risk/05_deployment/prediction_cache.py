@@ -0,0 +1,138 @@
+"""
+Caché de respuestas de /evaluate_risk para solicitantes repetidos (el front
+reenvía el mismo formulario varias veces por sesión).
+
+- Clave: hash canónico de los valores de feature_cols (después de completar
+  el historial), así que dos payloads con los mismos valores efectivos
+  comparten entrada aunque cambie el orden de los campos, sobren campos que
+  el modelo no usa o un número venga como int en vez de float.
+- Tamaño acotado (LRU) y vencimiento por TTL.
+- Cada entrada pertenece a una versión (modelo+umbrales y feature store):
+  cuando cambia la versión activa la caché se vacía.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+_NUMBER = (int, float, np.integer, np.floating)
+
+
+def feature_key(data: Dict[str, Any], feature_cols: List[str]) -> bytes:
+    """
+    Hash de los valores de `data` alineados a feature_cols (16 bytes).
+    Números (y bool) -> float64, None/NaN -> NaN, el resto -> texto con su posición.
+    """
+    nums = []
+    other = []
+    for i, c in enumerate(feature_cols):
+        v = data.get(c)
+        if isinstance(v, _NUMBER):
+            nums.append(v)
+        else:
+            nums.append(math.nan)
+            if v is not None:
+                other.append((i, str(v)))
+    arr = np.array(nums, dtype=np.float64)
+    arr[np.isnan(arr)] = np.nan  # un solo patrón de bits para NaN
+    h = hashlib.blake2b(arr.tobytes(), digest_size=16)
+    if other:
+        h.update(repr(other).encode())
+    return h.digest()
+
+
+def _approx_size(value: Any) -> int:
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class PredictionCache:
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[bytes, Tuple[float, int, Any]]" = OrderedDict()  # clave -> (vence, bytes, valor)
+        self._version: Optional[Hashable] = None
+        self._bytes = 0
+        self.hits = self.misses = 0
+        self.evicted_lru = self.expired = self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0 and self.ttl_s > 0
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: bytes, version: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, size, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: Any, version: Hashable) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            # Resultado calculado con una versión que ya no está activa: no se guarda
+            if version != self._version:
+                return
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            size = len(key) + _approx_size(value)
+            self._data[key] = (time.monotonic() + self.ttl_s, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_items:
+                _, (_, dropped, _) = self._data.popitem(last=False)
+                self._bytes -= dropped
+                self.evicted_lru += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "activa": self.enabled,
+                "max_items": self.max_items,
+                "ttl_s": self.ttl_s,
+                "items": len(self._data),
+                "memoria_aprox_bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "desalojos_lru": self.evicted_lru,
+                "vencidos_ttl": self.expired,
+                "invalidaciones_por_version": self.invalidations,
+                "version": list(self._version) if isinstance(self._version, tuple) else self._version,
+            }
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+
+def _is_missing(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+class RequestEncoder:
+    """
+    Convierte el dict de un request en la fila de entrada del clasificador
+    (salida del ColumnTransformer) sin construir un DataFrame.
+
+    - row_template: fila float64 con las medianas y el one-hot de la moda
+      ya aplicados (equivale a "todo faltante").
+    - num_index: columna -> posición en la fila.
+    - cat_lookup: columna -> (posición de la moda, {categoría: posición}).
+    """
+
+    def __init__(
+        self,
+        row_template: np.ndarray,
+        num_index: Dict[str, int],
+        cat_lookup: Dict[str, Tuple[Optional[int], Dict[Any, int]]],
+    ):
+        self.row_template = row_template
+        self.num_index = num_index
+        self.cat_lookup = cat_lookup
+
+    @property
+    def n_features(self) -> int:
+        return int(self.row_template.shape[0])
+
+    def encode(self, data: Dict[str, Any]) -> np.ndarray:
+        """Devuelve una matriz (1, n_features) lista para clf.predict_proba."""
+        row = self.row_template.copy()
+
+        for key, value in data.items():
+            if _is_missing(value):
+                continue
+
+            pos = self.num_index.get(key)
+            if pos is not None:
+                row[pos] = float(value)
+                continue
+
+            cat = self.cat_lookup.get(key)
+            if cat is not None:
+                default_pos, lookup = cat
+                if default_pos is not None:
+                    row[default_pos] = 0.0
+                # handle_unknown="ignore": categoría desconocida -> todo en cero
+                hit = lookup.get(value)
+                if hit is not None:
+                    row[hit] = 1.0
+
+        return row.reshape(1, -1)
+
+
+def _imputer_and_encoder(step) -> Tuple[SimpleImputer, Optional[OneHotEncoder]]:
+    steps = step.steps if isinstance(step, Pipeline) else [("", step)]
+    imp = next((s for _, s in steps if isinstance(s, SimpleImputer)), None)
+    oh = next((s for _, s in steps if isinstance(s, OneHotEncoder)), None)
+    known = {id(imp), id(oh)}
+    if imp is None or any(id(s) not in known for _, s in steps):
+        raise ValueError(f"Paso de preprocesamiento no soportado: {step!r}")
+    if oh is not None and (
+        oh.drop_idx_ is not None
+        or oh.handle_unknown != "ignore"
+        or getattr(oh, "_infrequent_enabled", False)
+    ):
+        raise ValueError("OneHotEncoder con drop/infrequent/handle_unknown!='ignore' no soportado.")
+    return imp, oh
+
+
+def build_request_encoder(model: Pipeline, feature_cols: List[str]) -> RequestEncoder:
+    """
+    Compila el encoder a partir del Pipeline entrenado (pre + clf) y
+    feature_schema.json. Soporta la estructura de 03_modeling/train.py:
+    num = SimpleImputer(median), cat = SimpleImputer(most_frequent) + OneHotEncoder.
+    """
+    pre = model.named_steps.get("pre") if isinstance(model, Pipeline) else None
+    if not isinstance(pre, ColumnTransformer):
+        raise ValueError("El modelo no tiene un ColumnTransformer 'pre'.")
+
+    known_cols = set(feature_cols)
+    template: List[float] = []
+    num_index: Dict[str, int] = {}
+    cat_lookup: Dict[str, Tuple[Optional[int], Dict[Any, int]]] = {}
+
+    for name, step, cols in pre.transformers_:
+        if name == "remainder" or step == "drop":
+            continue
+        if step == "passthrough":
+            raise ValueError("Columnas 'passthrough' no soportadas por el encoder.")
+
+        imp, oh = _imputer_and_encoder(step)
+        stats = imp.statistics_
+        # SimpleImputer descarta columnas sin valores observados en fit
+        if getattr(imp, "keep_empty_features", False):
+            kept = list(range(len(cols)))
+        else:
+            # (None es un valor válido en columnas object: solo cuenta NaN)
+            kept = [i for i, v in enumerate(stats) if not (isinstance(v, float) and math.isnan(v))]
+
+        for j, i in enumerate(kept):
+            col = cols[i]
+            if col not in known_cols:
+                raise ValueError(f"Columna {col} del modelo no está en feature_schema.json.")
+
+            if oh is None:
+                num_index[col] = len(template)
+                template.append(float(stats[i]))
+                continue
+
+            start = len(template)
+            categories = list(oh.categories_[j])
+            lookup = {c: start + k for k, c in enumerate(categories)}
+            template.extend([0.0] * len(categories))
+
+            default_pos = lookup.get(stats[i])
+            if default_pos is not None:
+                template[default_pos] = 1.0
+            cat_lookup[col] = (default_pos, lookup)
+
+    row_template = np.asarray(template, dtype=np.float64)
+    n_expected = getattr(model[-1], "n_features_in_", row_template.shape[0])
+    if row_template.shape[0] != n_expected:
+        raise ValueError(
+            f"El encoder genera {row_template.shape[0]} columnas y el clasificador espera {n_expected}."
+        )
+
+    return RequestEncoder(row_template, num_index, cat_lookup)
@@ -0,0 +1,130 @@
+"""
+Servidor pre-fork para varios workers con artefactos compartidos.
+
+`uvicorn --workers N` arranca N intérpretes desde cero: cada uno importa
+pandas/sklearn y carga su propia copia del modelo. Acá el proceso padre
+importa la API una sola vez, exporta el scorer a .npy sin comprimir
+(artifacts/shared/) y abre modelo y feature store memory-mapped; después
+hace fork de los workers, que heredan todo eso (copy-on-write) y comparten
+las páginas de los archivos mapeados. Todos escuchan en el mismo socket.
+
+Cada worker sigue teniendo su watcher de artefactos: tras un hot-reload las
+versiones nuevas también se abren memory-mapped desde artifacts/shared/.
+Los POST /admin/* llegan a un solo worker, que los publica en
+artifacts/admin_actions/ para que el resto los aplique (admin_channel.py).
+
+Uso (desde home-credit-risk/, solo Linux/macOS):
+    python 05_deployment/serve.py --workers 4 --port 8000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import app as api  # noqa: E402
+
+
+SHARED_DIR = api.ARTIFACTS_DIR / "shared"
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="API con N workers pre-fork y artefactos memory-mapped")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--log-level", default="warning")
+    ap.add_argument("--no-batching", action="store_true", help="Desactivar el micro-batching de /evaluate_risk")
+    ap.add_argument("--batch-max-items", type=int, default=api.MICRO_BATCH_MAX_ITEMS)
+    ap.add_argument(
+        "--batch-wait-ms",
+        type=float,
+        default=api.MICRO_BATCH_MAX_WAIT_MS,
+        help="Espera máxima de un lote desde su primer request (0: puntuar enseguida si no hay un lote en vuelo)",
+    )
+    return ap.parse_args()
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Los sockets aceptados lo heredan: sin esto cada respuesta chica espera
+    # ~40 ms (Nagle + ACK diferido del cliente)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn(config: uvicorn.Config, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            uvicorn.Server(config).run(sockets=[sock])
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main() -> None:
+    if not hasattr(os, "fork"):
+        raise RuntimeError("serve.py necesita os.fork (Linux/macOS). En Windows usa uvicorn --workers.")
+    args = parse_args()
+    t0 = time.perf_counter()
+
+    api.MICRO_BATCHING = not args.no_batching
+    api.MICRO_BATCH_MAX_ITEMS = args.batch_max_items
+    api.MICRO_BATCH_MAX_WAIT_MS = args.batch_wait_ms
+
+    # Carga única en el padre, antes del fork (sin hilos todavía: el watcher arranca en cada worker)
+    api.bundles.mmap_dir = SHARED_DIR
+    bundle = api.bundles.reload()
+    api.reload_feature_store()
+    print(f"OK: artefactos {bundle.version} cargados en {time.perf_counter() - t0:.2f} s (pid {os.getpid()})")
+
+    sock = _bind(args.host, args.port)
+    config = uvicorn.Config(api.app, log_level=args.log_level, lifespan="on")
+    workers = {_spawn(config, sock) for _ in range(args.workers)}
+    print(f"OK: {len(workers)} workers escuchando en http://{args.host}:{args.port}")
+
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            # Un worker murió: se reemplaza (hereda el estado del padre)
+            print(f"AVISO: worker {pid} terminó (estado {status}); se reinicia.")
+            workers.add(_spawn(config, sock))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
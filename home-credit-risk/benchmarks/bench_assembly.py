@@ -0,0 +1,98 @@
+"""
+Join final del dataset: cadena de merges (original) vs assemble_features
+(posiciones por searchsorted + un solo take por columna). Mide tiempo y pico
+de memoria asignada durante el join (tracemalloc) y verifica que ambos
+resultados sean idénticos.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/bench_assembly.py --rows 300000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from assemble import assemble_features  # noqa: E402
+
+
+# (prefijo, columnas float, columnas de conteo int64, cobertura de clientes)
+FEATURE_TABLES = [
+    ("prev", 33, 4, 0.95),
+    ("inst", 18, 0, 0.95),
+    ("pos", 9, 5, 0.9),
+    ("cc", 54, 0, 0.3),
+    ("bureau", 36, 4, 0.85),
+]
+
+
+def synthetic_inputs(rows: int, seed: int) -> tuple[pd.DataFrame, list[pd.DataFrame]]:
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(np.arange(100_000, 100_000 + rows))
+    cols = {"SK_ID_CURR": ids, "TARGET": rng.integers(0, 2, rows)}
+    cols.update({f"NUM_{j}": rng.normal(size=rows) for j in range(100)})
+    cols.update({f"CAT_{j}": rng.choice(["a", "b", "c", None], rows) for j in range(16)})
+    app = pd.DataFrame(cols)
+
+    features = []
+    for prefix, n_float, n_int, coverage in FEATURE_TABLES:
+        keys = np.sort(rng.choice(ids, int(rows * coverage), replace=False))
+        data = {"SK_ID_CURR": keys}
+        data.update({f"{prefix}_f{j}": rng.normal(size=len(keys)) for j in range(n_float)})
+        data.update({f"{prefix}_status__{j}": rng.integers(0, 5, len(keys)) for j in range(n_int)})
+        features.append(pd.DataFrame(data))
+    return app, features
+
+
+def merge_chain(app: pd.DataFrame, features: list[pd.DataFrame]) -> pd.DataFrame:
+    """Copia del join original de build_dataset.main (referencia)."""
+    base = app[["SK_ID_CURR"]].drop_duplicates()
+    df = base.merge(app, on="SK_ID_CURR", how="left")
+    for feat in features:
+        df = df.merge(feat, on="SK_ID_CURR", how="left")
+    return df
+
+
+def measure(fn, app, features) -> tuple[pd.DataFrame, float, float]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(app, features)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak / (1024 * 1024)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=300_000)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    app, features = synthetic_inputs(args.rows, args.seed)
+    old, t_old, mem_old = measure(merge_chain, app, features)
+    del old
+    new, t_new, mem_new = measure(assemble_features, app, features)
+    old = merge_chain(app, features)
+
+    report = {
+        "rows": args.rows,
+        "columns": new.shape[1],
+        "output_mb": round(new.memory_usage(deep=False).sum() / (1024 * 1024), 1),
+        "merge_chain": {"seconds": round(t_old, 3), "peak_alloc_mb": round(mem_old, 1)},
+        "assemble_features": {"seconds": round(t_new, 3), "peak_alloc_mb": round(mem_new, 1)},
+        "identical": bool(old.equals(new) and list(old.columns) == list(new.columns)),
+    }
+    report["speedup"] = round(t_old / t_new, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Conteos por estado: pivot_table(aggfunc="count") vs count_by_category
+(np.bincount sobre códigos). Datos sintéticos con la forma de
+bureau_balance (SK_ID_BUREAU x STATUS). Verifica que ambas tablas coincidan.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/bench_category_counts.py --rows 5000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from agg_kernels import count_by_category  # noqa: E402
+
+
+STATUSES = ["0", "1", "2", "3", "4", "5", "C", "X"]
+
+
+def synthetic_balance(rows: int, rows_per_key: int, categorical: bool, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    status = pd.Series(rng.choice(STATUSES, rows, p=[0.45, 0.05, 0.02, 0.01, 0.01, 0.01, 0.3, 0.15]))
+    if categorical:
+        status = status.astype("category")
+    return pd.DataFrame({
+        "SK_ID_BUREAU": rng.integers(5_000_000, 5_000_000 + max(rows // rows_per_key, 1), rows),
+        "MONTHS_BALANCE": rng.integers(-96, 1, rows),
+        "STATUS": status,
+    })
+
+
+def pivot_counts(df: pd.DataFrame) -> pd.DataFrame:
+    return df.pivot_table(
+        index="SK_ID_BUREAU",
+        columns="STATUS",
+        values="MONTHS_BALANCE",
+        aggfunc="count",
+        fill_value=0,
+        observed=True,
+    )
+
+
+def best_of(fn, df: pd.DataFrame, repeat: int) -> tuple[pd.DataFrame, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        times.append(time.perf_counter() - t0)
+    return out, min(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5_000_000)
+    ap.add_argument("--rows-per-key", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    report = {"rows": args.rows, "rows_per_key": args.rows_per_key}
+    for categorical in (True, False):
+        df = synthetic_balance(args.rows, args.rows_per_key, categorical, args.seed)
+        old, t_old = best_of(pivot_counts, df, args.repeat)
+        new, t_new = best_of(lambda d: count_by_category(d, "SK_ID_BUREAU", "STATUS", "MONTHS_BALANCE"), df, args.repeat)
+
+        same = (
+            old.index.equals(new.index)
+            and [str(c) for c in old.columns] == [str(c) for c in new.columns]
+            and np.array_equal(old.to_numpy(), new.to_numpy())
+            and (old.dtypes == new.dtypes).all()
+        )
+        report["category" if categorical else "object"] = {
+            "pivot_table_s": round(t_old, 4),
+            "bincount_s": round(t_new, 4),
+            "speedup": round(t_old / t_new, 1),
+            "identical": bool(same),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark de la actualización incremental (02_data_preparation/update_features.py)
+con datos sintéticos.
+
+De cada tabla hija (installments_payments, POS_CASH_balance,
+credit_card_balance, bureau_balance) se separan al azar sum(--delta-rows)
+filas: el resto es la tabla "original" y las separadas se parten en deltas
+sucesivos de --delta-rows filas. Se construye el estado sobre las tablas
+originales, se aplica cada delta (tiempo por tabla y tamaño de delta) y se
+compara:
+- tiempo de aplicar un delta vs. recalcular el builder completo
+  (build_dataset --streaming sobre la tabla original + los deltas);
+- el resultado: la tabla de cada builder desde el estado debe ser idéntica
+  a la del recálculo completo.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/bench_incremental.py --scale 10 --delta-rows 100 1000 10000
+    python benchmarks/bench_incremental.py --scale 100 --reuse-data --out bench_incremental.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from bench_pipeline import ROOT
+from load_test import git_commit
+from synthetic_data import BASE_APPLICANTS, generate
+
+sys.path.insert(0, str(ROOT / "02_data_preparation"))
+from aggregate_state import DELTA_TABLES, AggregateState  # noqa: E402
+from build_dataset import build_features, column_manifest  # noqa: E402
+from data_io import RAW_FILES, load_raw_tables  # noqa: E402
+from features_previous import build_prev_map  # noqa: E402
+from streaming_agg import DEFAULT_BATCH_ROWS  # noqa: E402
+
+BUILDERS = ["inst", "pos", "cc", "bureau"]
+
+
+def split_tables(raw_dir: Path, base_dir: Path, full_dir: Path, delta_dir: Path, sizes: list[int], seed: int) -> dict:
+    """
+    base_dir: tablas sin las filas separadas; full_dir: base + deltas en orden;
+    delta_dir/<tabla>_<i>.parquet: los deltas. Las tablas padre se copian.
+    """
+    for d in (base_dir, full_dir, delta_dir):
+        shutil.rmtree(d, ignore_errors=True)
+        d.mkdir(parents=True)
+    for table, name in RAW_FILES.items():
+        if table not in DELTA_TABLES:
+            shutil.copy2(raw_dir / name, base_dir / name)
+            shutil.copy2(raw_dir / name, full_dir / name)
+
+    rng = np.random.default_rng(seed)
+    out = {}
+    for table in DELTA_TABLES:
+        name = RAW_FILES[table]
+        t = pq.read_table(raw_dir / name)
+        picked = np.sort(rng.choice(t.num_rows, min(sum(sizes), t.num_rows), replace=False))
+        mask = np.zeros(t.num_rows, dtype=bool)
+        mask[picked] = True
+        base = t.filter(pa.array(~mask))
+        pq.write_table(base, base_dir / name)
+
+        # Cada delta con filas al azar de toda la tabla (clientes dispersos)
+        picked = rng.permutation(picked)
+        parts, start = [], 0
+        for i, n in enumerate(sizes):
+            part = t.take(pa.array(np.sort(picked[start : start + n])))
+            pq.write_table(part, delta_dir / f"{table}_{i}.parquet")
+            parts.append(part)
+            start += n
+        pq.write_table(pa.concat_tables([base, *parts]), full_dir / name)
+        out[table] = {"filas": int(t.num_rows), "filas_base": int(base.num_rows)}
+    return out
+
+
+def full_rebuild(full_dir: Path, batch_rows: int) -> tuple[dict, dict]:
+    """Recálculo de cada builder con build_dataset --streaming: (tablas, segundos)."""
+    tables = load_raw_tables(full_dir, manifest=column_manifest(None), lazy=True)
+    prev_map = build_prev_map(tables["previous_application"])
+    frames, seconds = {}, {}
+    for builder in BUILDERS:
+        t0 = time.perf_counter()
+        frames[builder] = build_features(builder, tables, prev_map if builder != "bureau" else None, full_dir, True, batch_rows)
+        seconds[builder] = round(time.perf_counter() - t0, 3)
+    return frames, seconds
+
+
+def bench_scale(scale: float, args: argparse.Namespace) -> dict:
+    base = Path(args.work_dir).resolve() / f"escala_{scale:g}"
+    raw_dir = base / "raw"
+    print(f"escala {scale:g} ({int(round(BASE_APPLICANTS * scale)):,} solicitantes) en {base}", file=sys.stderr)
+
+    out: dict = {"escala": scale, "directorio": str(base)}
+    if not (args.reuse_data and all((raw_dir / f).exists() for f in RAW_FILES.values())):
+        out["filas"] = generate(raw_dir, scale, args.seed)
+    out["tablas"] = split_tables(raw_dir, base / "original", base / "completo", base / "deltas", args.delta_rows, args.seed)
+
+    t0 = time.perf_counter()
+    state = AggregateState.build(base / "original", base / "state", args.batch_rows)
+    out["init_s"] = round(time.perf_counter() - t0, 2)
+    out["estado_mb"] = round(sum(f.stat().st_size for f in (base / "state").rglob("*") if f.is_file()) / (1024 * 1024), 2)
+
+    out["deltas"] = []
+    for i, n in enumerate(args.delta_rows):
+        for table in DELTA_TABLES:
+            t0 = time.perf_counter()
+            res = state.apply(table, base / "deltas" / f"{table}_{i}.parquet", args.batch_rows)
+            out["deltas"].append(
+                {
+                    "tabla": table,
+                    "filas": res["filas"],
+                    "claves": res["claves"],
+                    "clientes": int(len(res["features"])),
+                    "segundos": round(time.perf_counter() - t0, 4),
+                }
+            )
+            print(f" delta {table} {n:,} filas: {out['deltas'][-1]['segundos']} s", file=sys.stderr)
+
+    print(" recálculo completo", file=sys.stderr)
+    frames, seconds = full_rebuild(base / "completo", args.batch_rows)
+    out["recalculo_completo_s"] = seconds
+    state = AggregateState(base / "state")
+    out["identico"] = {}
+    for builder, ref in frames.items():
+        got = state.features(builder)
+        try:
+            pd.testing.assert_frame_equal(got, ref, check_exact=True)
+            out["identico"][builder] = True
+        except AssertionError:
+            out["identico"][builder] = False
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de la actualización incremental de features")
+    ap.add_argument("--scale", type=float, nargs="+", default=[10], help=f"Factores sobre {BASE_APPLICANTS} solicitantes")
+    ap.add_argument("--delta-rows", type=int, nargs="+", default=[100, 1000, 10000], help="Filas de cada delta sucesivo por tabla")
+    ap.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    ap.add_argument("--work-dir", default="bench_incremental")
+    ap.add_argument("--reuse-data", action="store_true", help="No regenerar las tablas si ya existen")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="Guardar el reporte como JSON")
+    args = ap.parse_args()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "opciones": {"delta_rows": args.delta_rows, "batch_rows": args.batch_rows, "seed": args.seed},
+        "escalas": [bench_scale(s, args) for s in args.scale],
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+/evaluate_risk con y sin micro-batching, dentro del proceso (sin HTTP, para
+medir solo el camino de puntaje): para cada valor de --concurrency, esa
+cantidad de tareas asyncio envían solicitantes de
+data/processed/dataset.parquet (solo columnas de application; el historial
+sale del feature store si existe).
+
+- directo: un run_in_threadpool + un predict por request (camino sin batcher)
+- batcher: MicroBatcher (un predict por lote)
+
+Se mide para el scorer fusionado y para el Pipeline con encoder (el caso
+con costo fijo de sklearn por llamada). Verifica que las probabilidades
+coincidan entre ambos caminos. Con concurrencia 1 (requests secuenciales) el
+batcher no debe agregar latencia respecto del camino directo.
+
+Uso (desde home-credit-risk/, con artifacts/ generados):
+    python benchmarks/bench_micro_batching.py --requests 5000 --concurrency 1 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "05_deployment"))
+import app as api  # noqa: E402
+from micro_batcher import MicroBatcher  # noqa: E402
+
+
+HISTORY_PREFIXES = ("prev_", "inst_", "pos_", "cc_", "bureau_")
+
+
+def load_records(n: int) -> list[dict]:
+    df = pd.read_parquet("data/processed/dataset.parquet")
+    cols = [c for c in df.columns if not c.startswith(HISTORY_PREFIXES) and c != "TARGET"]
+    df = df[cols].sample(n, replace=len(df) < n, random_state=0)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")
+
+
+async def run(records: list[dict], concurrency: int, batcher: MicroBatcher | None) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = np.zeros(len(records))
+    proba = np.zeros(len(records))
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            if batcher is not None:
+                # Como evaluate_risk: el historial se completa antes de encolar
+                store = api.feature_store
+                res = await batcher.submit(store.fill_record(records[i]) if store is not None else records[i])
+            else:
+                res = await run_in_threadpool(api._score_one, records[i])
+            latencies[i] = time.perf_counter() - t0
+            proba[i] = res["probabilidad_incumplimiento"]
+
+    if batcher is not None:
+        batcher.start()
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(len(records))])
+    elapsed = time.perf_counter() - t0
+    out = {
+        "req_por_segundo": round(len(records) / elapsed, 1),
+        "latencia_ms_p50": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "latencia_ms_p99": round(float(np.percentile(latencies, 99)) * 1000, 2),
+    }
+    if batcher is not None:
+        stats = batcher.stats()
+        await batcher.stop()
+        out["tamano_lote_promedio"] = stats["tamano_lote_promedio"]
+        out["espera_en_cola_ms"] = stats["ventana"]["espera_en_cola_ms"]
+    return {"stats": out, "proba": proba}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 64])
+    ap.add_argument("--max-items", type=int, default=api.MICRO_BATCH_MAX_ITEMS)
+    ap.add_argument("--max-wait-ms", type=float, default=api.MICRO_BATCH_MAX_WAIT_MS)
+    args = ap.parse_args()
+
+    records = load_records(args.requests)
+    api.reload_feature_store()
+    report = {"requests": args.requests, "concurrency": args.concurrency}
+
+    for mode in ("scorer", "encoder"):
+        if mode == "encoder":
+            # Sin scorer.npz: Pipeline de sklearn con el encoder precompilado
+            api.bundles.scorer_path = Path("__sin_scorer__.npz")
+        api.bundles.reload(force=True)
+
+        report[mode] = {}
+        for concurrency in args.concurrency:
+            direct = asyncio.run(run(records, concurrency, None))
+            batched = asyncio.run(run(records, concurrency, MicroBatcher(api._score_records, args.max_items, args.max_wait_ms)))
+            report[mode][f"concurrencia_{concurrency}"] = {
+                "directo": direct["stats"],
+                "batcher": batched["stats"],
+                "max_abs_diff": float(np.abs(direct["proba"] - batched["proba"]).max()),
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Benchmark de punta a punta del pipeline con datos sintéticos
+(benchmarks/synthetic_data.py), para seguir regresiones sin el dataset real.
+
+Para cada escala genera las tablas crudas en un directorio de trabajo y mide:
+- cada builder de features (prev, inst, pos, cc, bureau) en un proceso
+  nuevo, como build_dataset --jobs: tiempo, pico de RSS (incluye el
+  intérprete con pandas importado, ~190 MB) y tamaño del resultado;
+- cada etapa (build_dataset.py, train.py, evaluate.py) como subproceso desde
+  el directorio de trabajo: tiempo y pico de RSS (incluye sus procesos hijos).
+
+Con --profile guarda un .prof de cProfile por etapa y por builder (se abren
+con snakeviz o se pasan a flamegraph con flameprof) y agrega al reporte las
+funciones con más tiempo propio.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/bench_pipeline.py --scale 1 10 --out bench_pipeline.json
+    python benchmarks/bench_pipeline.py --scale 100 --stages build_dataset --streaming --profile
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import json
+import multiprocessing
+import os
+import platform
+import pstats
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import psutil
+
+from load_test import git_commit
+from synthetic_data import BASE_APPLICANTS, generate, table_sizes
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_PREP_DIR = ROOT / "02_data_preparation"
+sys.path.insert(0, str(DATA_PREP_DIR))
+from data_io import RAW_FILES, peak_rss_mb  # noqa: E402
+from streaming_agg import DEFAULT_BATCH_ROWS  # noqa: E402
+
+
+STAGES = {
+    "build_dataset": ROOT / "02_data_preparation" / "build_dataset.py",
+    "train": ROOT / "03_modeling" / "train.py",
+    "evaluate": ROOT / "04_evaluation" / "evaluate.py",
+}
+BUILDERS = ["prev", "inst", "pos", "cc", "bureau"]
+TOP_FUNCTIONS = 15
+
+
+def top_functions(prof_path: Path, n: int = TOP_FUNCTIONS) -> list[dict]:
+    """Funciones con más tiempo propio (sin contar llamadas internas) de un .prof."""
+    stats = pstats.Stats(str(prof_path), stream=io.StringIO())
+    rows = []
+    for (file, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "funcion": f"{Path(file).name}:{line}({func})",
+            "llamadas": calls,
+            "propio_s": round(tottime, 3),
+            "acumulado_s": round(cumtime, 3),
+        })
+    rows.sort(key=lambda r: r["propio_s"], reverse=True)
+    return rows[:n]
+
+
+# ----- builders -----
+
+def _run_builder(name: str, raw_dir: str, downcast: bool, streaming: bool, batch_rows: int, prof_path: str | None) -> dict:
+    """Corre en un proceso nuevo: el pico de RSS es solo de este builder."""
+    import build_dataset
+
+    profiler = cProfile.Profile() if prof_path else None
+    t0 = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    out = build_dataset._build_in_worker(name, Path(raw_dir), downcast, streaming, batch_rows)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(prof_path)
+    return {
+        "segundos": round(time.perf_counter() - t0, 3),
+        "pico_rss_mb": round(peak_rss_mb() or 0.0, 1),
+        "filas": int(len(out)),
+        "columnas": int(out.shape[1]),
+    }
+
+
+def bench_builders(raw_dir: Path, args: argparse.Namespace, prof_dir: Path | None) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    downcast = args.downcast and not args.streaming
+    for name in BUILDERS:
+        prof = str(prof_dir / f"builder_{name}.prof") if prof_dir is not None else None
+        # Un ejecutor por builder para que cada uno arranque en un proceso limpio
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            res = ex.submit(_run_builder, name, str(raw_dir), downcast, args.streaming, args.batch_rows, prof).result()
+        if prof is not None:
+            res["top"] = top_functions(Path(prof))
+        results[name] = res
+        print(f"  builder {name:<7} {res['segundos']:>8.2f} s {res['pico_rss_mb']:>8.0f} MB", file=sys.stderr, flush=True)
+    return results
+
+
+# ----- etapas -----
+
+def stage_command(stage: str, args: argparse.Namespace, prof_path: Path | None, extra: list[str] | None = None) -> list[str]:
+    cmd = [sys.executable]
+    if prof_path is not None:
+        cmd += ["-m", "cProfile", "-o", str(prof_path)]
+    cmd.append(str(STAGES[stage]))
+    if stage == "build_dataset":
+        # --force: medir el cálculo, no la caché de features
+        cmd += ["--force", "--jobs", str(args.jobs), "--batch-rows", str(args.batch_rows)]
+        if args.streaming:
+            cmd.append("--streaming")
+        if args.downcast:
+            cmd.append("--downcast")
+    elif stage == "train":
+        cmd += ["--mode", args.train_mode]
+    return cmd + (extra or [])
+
+
+def run_command(name: str, cmd: list[str], work_dir: Path) -> dict:
+    """Corre cmd desde work_dir: tiempo, CPU y pico de RSS (incluye sus procesos hijos)."""
+    log_path = work_dir / f"{name}.log"
+    t0 = time.perf_counter()
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=work_dir, stdout=log, stderr=subprocess.STDOUT)
+        # wait4: uso de recursos de este hijo (y de los procesos que él esperó)
+        _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    maxrss_kb = usage.ru_maxrss / 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    res = {
+        "segundos": round(elapsed, 3),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 3),
+        "pico_rss_mb": round(maxrss_kb / 1024, 1),
+        "codigo_salida": proc.returncode,
+        "log": str(log_path),
+    }
+    if proc.returncode != 0:
+        tail = log_path.read_text(encoding="utf-8", errors="replace").splitlines()[-5:]
+        res["error"] = "\n".join(tail)
+    print(f"  etapa {name:<14} {res['segundos']:>8.2f} s {res['pico_rss_mb']:>8.0f} MB", file=sys.stderr, flush=True)
+    return res
+
+
+def run_stage(
+    stage: str,
+    work_dir: Path,
+    args: argparse.Namespace,
+    prof_dir: Path | None,
+    extra: list[str] | None = None,
+) -> dict:
+    prof = prof_dir / f"{stage}.prof" if prof_dir is not None else None
+    res = run_command(stage, stage_command(stage, args, prof, extra), work_dir)
+    if res["codigo_salida"] == 0 and prof is not None:
+        res["top"] = top_functions(prof)
+    return res
+
+
+def bench_scale(scale: float, args: argparse.Namespace) -> dict:
+    work_dir = Path(args.work_dir).resolve() / f"escala_{scale:g}"
+    raw_dir = work_dir / "data" / "raw"
+    prof_dir = work_dir / "profiles" if args.profile else None
+    if prof_dir is not None:
+        prof_dir.mkdir(parents=True, exist_ok=True)
+    print(f"escala {scale:g} ({int(round(BASE_APPLICANTS * scale)):,} solicitantes) en {work_dir}", file=sys.stderr)
+
+    # Esperadas por la escala; "filas" (las generadas) solo si no se reusan los datos
+    out: dict = {"escala": scale, "directorio": str(work_dir), "filas_esperadas": table_sizes(scale)}
+    reuse = args.reuse_data and all((raw_dir / f).exists() for f in RAW_FILES.values())
+    if not reuse:
+        t0 = time.perf_counter()
+        rows = generate(raw_dir, scale, args.seed)
+        out["generacion_s"] = round(time.perf_counter() - t0, 2)
+        out["filas"] = rows
+    out["raw_mb"] = round(sum((raw_dir / f).stat().st_size for f in RAW_FILES.values()) / (1024 * 1024), 1)
+
+    if not args.skip_builders:
+        out["builders"] = bench_builders(raw_dir, args, prof_dir)
+    out["etapas"] = {}
+    for stage in args.stages:
+        res = run_stage(stage, work_dir, args, prof_dir)
+        out["etapas"][stage] = res
+        if res["codigo_salida"] != 0:
+            # Las etapas siguientes dependen de esta
+            print(f"ERROR en {stage}:\n{res['error']}", file=sys.stderr)
+            break
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark del pipeline completo con datos sintéticos")
+    ap.add_argument("--scale", type=float, nargs="+", default=[1, 10], help=f"Factores sobre {BASE_APPLICANTS} solicitantes")
+    ap.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    ap.add_argument("--skip-builders", action="store_true", help="No medir los builders por separado")
+    ap.add_argument("--streaming", action="store_true", help="build_dataset --streaming (y builders en streaming)")
+    ap.add_argument("--downcast", action="store_true", help="build_dataset --downcast (y builders con downcast)")
+    ap.add_argument("--jobs", type=int, default=1, help="--jobs de build_dataset")
+    ap.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    ap.add_argument("--train-mode", choices=["dense", "sparse", "sgd"], default="dense", help="--mode de train.py")
+    ap.add_argument("--profile", action="store_true", help="Guardar un .prof de cProfile por etapa y builder")
+    ap.add_argument("--work-dir", default="bench_pipeline")
+    ap.add_argument("--reuse-data", action="store_true", help="No regenerar las tablas si ya existen")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="Guardar el reporte como JSON")
+    args = ap.parse_args()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": psutil.cpu_count(),
+        "memoria_total_mb": round(psutil.virtual_memory().total / (1024 * 1024)),
+        "opciones": {
+            "streaming": args.streaming,
+            "downcast": args.downcast,
+            "jobs": args.jobs,
+            "batch_rows": args.batch_rows,
+            "train_mode": args.train_mode,
+            "seed": args.seed,
+        },
+        "escalas": [bench_scale(s, args) for s in args.scale],
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmark de la poda de features (03_modeling/prune_features.py) con datos
+sintéticos: el mismo pipeline al ancho completo y al ancho podado.
+
+1. completo: build_dataset.py + train.py en <work-dir>/escala_X/completo;
+2. prune_features.py sobre ese modelo -> feature_manifest.json;
+3. podado: build_dataset.py --required-features + train.py en
+   <work-dir>/escala_X/podado (mismas tablas crudas).
+
+Para cada variante reporta tiempo y pico de RSS del build y del
+entrenamiento, tamaño y ancho de dataset.parquet y del feature store,
+latencia de serving (feature store + ArtifactBundle.score_record por
+request, p50/p99, y predict_proba por lote) y las métricas de validación
+con sus IC bootstrap; al final, el cambio de ROC-AUC / PR-AUC.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/bench_pruning.py --scale 10 --out bench_pruning.json
+    python benchmarks/bench_pruning.py --scale 10 --method permutation --top-k 40 --reuse-data
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bench_pipeline import ROOT, run_command, run_stage
+from load_test import git_commit
+from synthetic_data import BASE_APPLICANTS, generate
+
+sys.path.insert(0, str(ROOT / "02_data_preparation"))
+sys.path.insert(0, str(ROOT / "03_modeling"))
+sys.path.insert(0, str(ROOT / "05_deployment"))
+from data_io import RAW_FILES  # noqa: E402
+from feature_store import FeatureStore  # noqa: E402
+from streaming_agg import DEFAULT_BATCH_ROWS  # noqa: E402
+from artifact_bundle import BundleManager  # noqa: E402
+
+PRUNE_SCRIPT = ROOT / "03_modeling" / "prune_features.py"
+BATCH_SCORE_ROWS = 10_000
+
+
+def _dir_mb(path: Path) -> float:
+    return round(sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / (1024 * 1024), 2)
+
+
+def serving_latency(work_dir: Path, n_requests: int, seed: int) -> dict:
+    """
+    Latencia por request como en /evaluate_risk (sin HTTP): completar el
+    historial desde el feature store y puntuar con el bundle. Cada request
+    trae SK_ID_CURR y las columnas de application que usa el modelo.
+    """
+    artifacts = work_dir / "artifacts"
+    bundle = BundleManager(
+        artifacts / "model.joblib",
+        artifacts / "feature_schema.json",
+        artifacts / "scorer.npz",
+        artifacts / "thresholds.json",
+    ).load()
+    store = FeatureStore.open_current(artifacts / "feature_store")
+    history = set(store.columns) if store is not None else set()
+    app_cols = [c for c in bundle.feature_cols if c not in history]
+
+    df = pd.read_parquet(work_dir / "data" / "processed" / "dataset.parquet", columns=["SK_ID_CURR", *bundle.feature_cols])
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.choice(len(df), size=min(n_requests, len(df)), replace=False)][["SK_ID_CURR", *app_cols]]
+    requests = rows.astype(object).where(rows.notna(), None).to_dict("records")
+
+    lat = np.empty(len(requests))
+    for i, data in enumerate(requests):
+        t0 = time.perf_counter()
+        if store is not None:
+            data = store.fill_record(data)
+        bundle.score_record(data)
+        lat[i] = time.perf_counter() - t0
+    lat *= 1e6
+
+    batch = df[bundle.feature_cols].iloc[:BATCH_SCORE_ROWS]
+    t0 = time.perf_counter()
+    bundle.predict_proba(batch)
+    batch_s = time.perf_counter() - t0
+    return {
+        "scorer": bundle.info()["scorer"],
+        "requests": len(requests),
+        "p50_us": round(float(np.percentile(lat, 50)), 1),
+        "p99_us": round(float(np.percentile(lat, 99)), 1),
+        "media_us": round(float(lat.mean()), 1),
+        "lote_filas": int(len(batch)),
+        "lote_ms": round(batch_s * 1e3, 2),
+    }
+
+
+def run_variant(name: str, work_dir: Path, raw_dir: Path, args: argparse.Namespace, manifest: Path | None) -> dict:
+    work_dir.mkdir(parents=True, exist_ok=True)
+    print(f" variante {name}", file=sys.stderr)
+    extra = ["--raw-dir", str(raw_dir)]
+    if manifest is not None:
+        extra += ["--required-features", str(manifest)]
+
+    out: dict = {"etapas": {}}
+    for stage, stage_extra in [("build_dataset", extra), ("train", None)]:
+        res = run_stage(stage, work_dir, args, None, stage_extra)
+        out["etapas"][stage] = res
+        if res["codigo_salida"] != 0:
+            raise RuntimeError(f"ERROR en {name}/{stage}:\n{res['error']}")
+
+    dataset = work_dir / "data" / "processed" / "dataset.parquet"
+    schema = json.loads((work_dir / "artifacts" / "feature_schema.json").read_text(encoding="utf-8"))
+    metrics = json.loads((work_dir / "artifacts" / "train_metrics.json").read_text(encoding="utf-8"))
+    out["features"] = len(schema["feature_cols"])
+    out["dataset_mb"] = round(dataset.stat().st_size / (1024 * 1024), 2)
+    out["feature_store_mb"] = _dir_mb(work_dir / "artifacts" / "feature_store")
+    # En un proceso aparte: el RSS que deja el serving en este proceso se heredaría
+    # (ru_maxrss se conserva tras fork + exec) en el pico de las etapas siguientes
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as ex:
+        out["serving"] = ex.submit(serving_latency, work_dir, args.requests, args.seed).result()
+    out["metricas"] = {k: metrics[k] for k in ("roc_auc", "pr_auc")}
+    if "bootstrap" in metrics:
+        out["metricas"]["ic"] = {
+            m: [metrics["bootstrap"][m]["ic_inf"], metrics["bootstrap"][m]["ic_sup"]] for m in ("roc_auc", "pr_auc")
+        }
+    return out
+
+
+def bench_scale(scale: float, args: argparse.Namespace) -> dict:
+    base = Path(args.work_dir).resolve() / f"escala_{scale:g}"
+    raw_dir = base / "raw"
+    print(f"escala {scale:g} ({int(round(BASE_APPLICANTS * scale)):,} solicitantes) en {base}", file=sys.stderr)
+
+    out: dict = {"escala": scale, "directorio": str(base)}
+    if not (args.reuse_data and all((raw_dir / f).exists() for f in RAW_FILES.values())):
+        out["filas"] = generate(raw_dir, scale, args.seed)
+
+    full_dir, pruned_dir = base / "completo", base / "podado"
+    out["completo"] = run_variant("completo", full_dir, raw_dir, args, None)
+
+    manifest = base / "feature_manifest.json"
+    cmd = [sys.executable, str(PRUNE_SCRIPT), "--method", args.method, "--out", str(manifest)]
+    cmd += ["--top-k", str(args.top_k)] if args.top_k is not None else ["--keep-fraction", str(args.keep_fraction)]
+    res = run_command("prune_features", cmd, full_dir)
+    if res["codigo_salida"] != 0:
+        raise RuntimeError(f"ERROR en prune_features:\n{res['error']}")
+    out["poda"] = res
+
+    out["podado"] = run_variant("podado", pruned_dir, raw_dir, args, manifest)
+
+    full, pruned = out["completo"], out["podado"]
+    out["comparacion"] = {
+        "features": [full["features"], pruned["features"]],
+        "build_s": [full["etapas"]["build_dataset"]["segundos"], pruned["etapas"]["build_dataset"]["segundos"]],
+        "build_pico_rss_mb": [full["etapas"]["build_dataset"]["pico_rss_mb"], pruned["etapas"]["build_dataset"]["pico_rss_mb"]],
+        "dataset_mb": [full["dataset_mb"], pruned["dataset_mb"]],
+        "serving_p50_us": [full["serving"]["p50_us"], pruned["serving"]["p50_us"]],
+        "serving_p99_us": [full["serving"]["p99_us"], pruned["serving"]["p99_us"]],
+        "delta_roc_auc": round(pruned["metricas"]["roc_auc"] - full["metricas"]["roc_auc"], 5),
+        "delta_pr_auc": round(pruned["metricas"]["pr_auc"] - full["metricas"]["pr_auc"], 5),
+    }
+    if "ic" in full["metricas"]:
+        lo, hi = full["metricas"]["ic"]["roc_auc"]
+        out["comparacion"]["roc_auc_podado_dentro_ic_completo"] = bool(lo <= pruned["metricas"]["roc_auc"] <= hi)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de la poda de features (ancho completo vs podado)")
+    ap.add_argument("--scale", type=float, nargs="+", default=[10], help=f"Factores sobre {BASE_APPLICANTS} solicitantes")
+    ap.add_argument("--method", choices=["coef", "permutation"], default="coef", help="--method de prune_features.py")
+    ap.add_argument("--keep-fraction", type=float, default=0.95)
+    ap.add_argument("--top-k", type=int, default=None)
+    ap.add_argument("--train-mode", choices=["dense", "sparse", "sgd", "search"], default="sparse", help="--mode de train.py")
+    ap.add_argument("--streaming", action="store_true", help="build_dataset --streaming")
+    ap.add_argument("--jobs", type=int, default=1, help="--jobs de build_dataset")
+    ap.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    ap.add_argument("--requests", type=int, default=2000, help="Requests para medir la latencia de serving")
+    ap.add_argument("--work-dir", default="bench_pruning")
+    ap.add_argument("--reuse-data", action="store_true", help="No regenerar las tablas si ya existen")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="Guardar el reporte como JSON")
+    args = ap.parse_args()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "opciones": {
+            "method": args.method,
+            "keep_fraction": args.keep_fraction,
+            "top_k": args.top_k,
+            "train_mode": args.train_mode,
+            "streaming": args.streaming,
+            "jobs": args.jobs,
+            "seed": args.seed,
+        },
+        "escalas": [bench_scale(s, args) for s in args.scale],
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Latencia p50/p99 de /evaluate_risk: camino con DataFrame (original) vs
+encoder precompilado. Verifica además que las probabilidades coincidan.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/bench_request_encoder.py --n 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "05_deployment"))
+from request_encoder import build_request_encoder  # noqa: E402
+
+
+def legacy_predict(model, feature_cols, data: dict) -> float:
+    """Copia del camino original de evaluate_risk (referencia)."""
+    x = pd.DataFrame([data])
+    for c in feature_cols:
+        if c not in x.columns:
+            x[c] = pd.NA
+    x = x[feature_cols]
+    x = x.replace({pd.NA: np.nan})
+    return float(model.predict_proba(x)[:, 1][0])
+
+
+def synthetic_requests(encoder, n: int, fill_rate: float, seed: int) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    num = list(encoder.num_index.items())
+    cats = {c: list(lookup) for c, (_, lookup) in encoder.cat_lookup.items()}
+
+    requests = []
+    for _ in range(n):
+        data = {}
+        for col, pos in num:
+            if rng.random() < fill_rate:
+                med = encoder.row_template[pos]
+                data[col] = float(med + rng.normal() * (abs(med) + 1.0))
+        for col, values in cats.items():
+            if rng.random() < fill_rate:
+                data[col] = values[rng.integers(len(values))]
+        requests.append(data)
+    return requests
+
+
+def timed(fn, requests) -> tuple[np.ndarray, np.ndarray]:
+    out = np.empty(len(requests))
+    lat = np.empty(len(requests))
+    for i, data in enumerate(requests):
+        t0 = time.perf_counter()
+        out[i] = fn(data)
+        lat[i] = time.perf_counter() - t0
+    return out, lat * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--artifacts", default="artifacts")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--fill-rate", type=float, default=0.3, help="Fracción de campos presentes por request")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    artifacts = Path(args.artifacts)
+    model = joblib.load(artifacts / "model.joblib")
+    feature_cols = json.loads((artifacts / "feature_schema.json").read_text(encoding="utf-8"))["feature_cols"]
+
+    t0 = time.perf_counter()
+    encoder = build_request_encoder(model, feature_cols)
+    build_ms = (time.perf_counter() - t0) * 1e3
+
+    requests = synthetic_requests(encoder, args.n, args.fill_rate, args.seed)
+    clf = model[-1]
+
+    # Calentamiento
+    for data in requests[:20]:
+        legacy_predict(model, feature_cols, data)
+        clf.predict_proba(encoder.encode(data))
+
+    p_old, lat_old = timed(lambda d: legacy_predict(model, feature_cols, d), requests)
+    p_new, lat_new = timed(lambda d: float(clf.predict_proba(encoder.encode(d))[0, 1]), requests)
+
+    report = {
+        "n_requests": args.n,
+        "fill_rate": args.fill_rate,
+        "encoder_build_ms": round(build_ms, 3),
+        "max_abs_diff": float(np.max(np.abs(p_old - p_new))),
+        "dataframe_us": {"p50": float(np.percentile(lat_old, 50)), "p99": float(np.percentile(lat_old, 99))},
+        "encoder_us": {"p50": float(np.percentile(lat_new, 50)), "p99": float(np.percentile(lat_new, 99))},
+    }
+    report["speedup_p50"] = report["dataframe_us"]["p50"] / report["encoder_us"]["p50"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
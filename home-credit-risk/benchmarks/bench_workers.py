@@ -0,0 +1,127 @@
+"""
+Arranque y memoria de la API con varios workers:
+- uvicorn: `uvicorn --workers N` (cada worker importa todo y carga sus artefactos)
+- prefork: 05_deployment/serve.py (carga única en el padre, fork, artefactos memory-mapped)
+
+Para cada modo y cantidad de workers mide el tiempo hasta que responden los
+N workers (se identifican por el pid que devuelve /health) y la memoria del
+árbol de procesos: RSS (cuenta varias veces las páginas compartidas), PSS
+(reparte las compartidas entre quienes las usan) y USS (solo las propias).
+
+Uso (desde home-credit-risk/, con artifacts/ ya generados):
+    python benchmarks/bench_workers.py --workers 1 4 16
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import psutil
+
+
+DEPLOY_DIR = Path(__file__).resolve().parents[1] / "05_deployment"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def command(mode: str, workers: int, port: int) -> list[str]:
+    if mode == "uvicorn":
+        return [
+            sys.executable, "-m", "uvicorn", "app:app", "--app-dir", str(DEPLOY_DIR),
+            "--workers", str(workers), "--port", str(port), "--log-level", "warning",
+        ]
+    return [sys.executable, str(DEPLOY_DIR / "serve.py"), "--workers", str(workers), "--port", str(port)]
+
+
+def wait_for_workers(port: int, workers: int, timeout: float) -> tuple[float, float]:
+    """Segundos hasta la primera respuesta y hasta ver los N pids."""
+    t0 = time.perf_counter()
+    first, pids = None, set()
+    while time.perf_counter() - t0 < timeout:
+        try:
+            # Conexión nueva en cada request para que la tome cualquier worker
+            pid = httpx.get(f"http://127.0.0.1:{port}/health", timeout=5).json()["pid"]
+        except (httpx.HTTPError, KeyError, ValueError):
+            time.sleep(0.05)
+            continue
+        first = first if first is not None else time.perf_counter() - t0
+        pids.add(pid)
+        if len(pids) >= workers:
+            return first, time.perf_counter() - t0
+        time.sleep(0.01)
+    raise TimeoutError(f"Solo respondieron {len(pids)} de {workers} workers en {timeout:.0f} s")
+
+
+def tree_memory(root: psutil.Process) -> dict:
+    procs = [root] + root.children(recursive=True)
+    rss = pss = uss = 0
+    for p in procs:
+        try:
+            m = p.memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        rss += m.rss
+        pss += getattr(m, "pss", m.uss)
+        uss += m.uss
+    mb = 1024 * 1024
+    return {"processes": len(procs), "rss_mb": round(rss / mb, 1), "pss_mb": round(pss / mb, 1), "uss_mb": round(uss / mb, 1)}
+
+
+def run(mode: str, workers: int, timeout: float) -> dict:
+    port = free_port()
+    proc = subprocess.Popen(command(mode, workers, port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first, ready = wait_for_workers(port, workers, timeout)
+        time.sleep(1.0)
+        mem = tree_memory(psutil.Process(proc.pid))
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {
+        "mode": mode,
+        "workers": workers,
+        "first_response_s": round(first, 2),
+        "all_workers_s": round(ready, 2),
+        **mem,
+        "pss_per_worker_mb": round(mem["pss_mb"] / workers, 1),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--modes", nargs="+", default=["uvicorn", "prefork"], choices=["uvicorn", "prefork"])
+    ap.add_argument("--timeout", type=float, default=600)
+    ap.add_argument("--out", default=None, help="Guardar el resultado como JSON")
+    args = ap.parse_args()
+
+    if not Path("artifacts/model.joblib").exists():
+        raise SystemExit("Ejecutar desde home-credit-risk/ con artifacts/ generados (train.py).")
+
+    results = []
+    for n in args.workers:
+        for mode in args.modes:
+            results.append(run(mode, n, args.timeout))
+            print(json.dumps(results[-1]), flush=True)
+
+    report = {"cpu_count": psutil.cpu_count(), "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Prueba de carga de la API de scoring (HTTP real, proceso aparte).
+
+Arranca 05_deployment/app.py (uvicorn o serve.py pre-fork) contra
+artifacts/, genera solicitantes sintéticos a partir de feature_schema.json y
+del modelo (categorías del OneHotEncoder, medianas del imputer) con tasas de
+faltantes parecidas a las de application de Home Credit, y los reproduce
+contra /evaluate_risk con varios niveles de concurrencia (lazo cerrado: cada
+cliente manda el siguiente request apenas recibe la respuesta).
+
+Por nivel reporta p50/p95/p99 de latencia, requests por segundo y CPU por
+request del árbol de procesos del servidor (y del cliente, que corre en la
+misma máquina). Entre niveles se vacía la caché de predicciones, así que
+solo hay hits si --requests supera --applicants.
+
+El resultado se guarda como JSON; con --baseline se compara la corrida
+contra uno anterior, y con --compare se comparan dos JSON sin correr nada.
+
+Uso (desde home-credit-risk/, con artifacts/ generados):
+    python benchmarks/load_test.py --concurrency 1 8 32 --out base.json
+    python benchmarks/load_test.py --server prefork --workers 4 --baseline base.json --out prefork.json
+    python benchmarks/load_test.py --compare base.json prefork.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import joblib
+import numpy as np
+import psutil
+
+from bench_workers import DEPLOY_DIR, command, free_port
+from synthetic_data import missing_rate
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from feature_store import FeatureStore  # noqa: E402
+
+
+ARTIFACTS_DIR = Path("artifacts")
+HISTORY_PREFIXES = ("prev_", "inst_", "pos_", "cc_", "bureau_")
+
+# Métricas comparadas en --baseline/--compare (True = mayor es mejor)
+COMPARED = {
+    "latencia_ms_p50": False,
+    "latencia_ms_p95": False,
+    "latencia_ms_p99": False,
+    "req_por_segundo": True,
+    "cpu_servidor_ms_por_request": False,
+}
+
+
+# ----- solicitantes sintéticos -----
+
+def column_specs(model) -> tuple[dict, dict]:
+    """Medianas numéricas y categorías por columna, tomadas del preprocesador entrenado."""
+    pre = model.named_steps["pre"]
+    medians, categories = {}, {}
+    for name, trans, cols in pre.transformers_:
+        if name == "num":
+            medians.update(zip(cols, trans.named_steps["imp"].statistics_.astype(float)))
+        elif name == "cat":
+            for c, cats in zip(cols, trans.named_steps["oh"].categories_):
+                categories[c] = [v for v in cats.tolist() if v is not None]
+    return medians, categories
+
+
+def synthetic_value(rng: np.random.Generator, median: float) -> float | int:
+    if float(median).is_integer():
+        if abs(median) <= 1:
+            return int(rng.integers(0, 2))  # flags 0/1
+        return int(round(median * rng.lognormal(0.0, 0.3)))
+    return float(median * rng.lognormal(0.0, 0.3))
+
+
+def generate_applicants(n: int, seed: int, with_history: bool) -> list[dict]:
+    """
+    Solicitantes con las columnas de feature_schema.json. Sin --with-history
+    solo se mandan las de application (como el front) y SK_ID_CURR de
+    clientes del feature store, para que el servidor complete el historial.
+    Los faltantes se omiten o se mandan como null, mitad y mitad.
+    """
+    schema = json.loads((ARTIFACTS_DIR / "feature_schema.json").read_text(encoding="utf-8"))
+    medians, categories = column_specs(joblib.load(ARTIFACTS_DIR / "model.joblib"))
+    cols = schema["feature_cols"]
+    if not with_history:
+        cols = [c for c in cols if not c.startswith(HISTORY_PREFIXES)]
+
+    rng = np.random.default_rng(seed)
+    store = FeatureStore.open_current(ARTIFACTS_DIR / "feature_store")
+    ids = store.ids if store is not None and len(store) else np.arange(100_000, 100_000 + n)
+    rates = {c: missing_rate(c) for c in cols}
+
+    out = []
+    for sk_id in rng.choice(ids, n):
+        rec = {schema.get("id_col", "SK_ID_CURR"): int(sk_id)}
+        for c in cols:
+            if rng.random() < rates[c]:
+                if rng.random() < 0.5:
+                    rec[c] = None
+                continue
+            if c in categories:
+                rec[c] = categories[c][int(rng.integers(len(categories[c])))]
+            else:
+                rec[c] = synthetic_value(rng, medians.get(c, 0.0))
+        out.append(rec)
+    return out
+
+
+# ----- servidor -----
+
+def wait_ready(base_url: str, timeout: float) -> dict:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        try:
+            health = httpx.get(f"{base_url}/health", timeout=5).json()
+            if health.get("version_modelo"):
+                return health
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"La API no respondió en {timeout:.0f} s")
+
+
+def tree_cpu_seconds(root: psutil.Process) -> float:
+    total = 0.0
+    for p in [root] + root.children(recursive=True):
+        try:
+            t = p.cpu_times()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        total += t.user + t.system
+    return total
+
+
+def server_command(args: argparse.Namespace, port: int) -> list[str]:
+    if args.server == "prefork":
+        cmd = command("prefork", args.workers, port)
+    else:
+        cmd = [
+            sys.executable, "-m", "uvicorn", "app:app", "--app-dir", str(DEPLOY_DIR),
+            "--port", str(port), "--log-level", "warning",
+        ]
+        if args.workers > 1:
+            cmd += ["--workers", str(args.workers)]
+    return cmd + list(args.server_args)
+
+
+# ----- carga -----
+
+def measure_level(base_url: str, server: psutil.Process, payloads: list[dict], concurrency: int, args) -> dict:
+    n_warmup = min(args.warmup, len(payloads))
+
+    async def go() -> dict:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            await client.post("/admin/cache/clear")
+            latencies = np.zeros(args.requests)
+            statuses: list[int] = []
+
+            async def drive(total: int, offset: int, record: bool) -> None:
+                next_i = 0
+
+                async def worker() -> None:
+                    nonlocal next_i
+                    while next_i < total:
+                        i = next_i
+                        next_i += 1
+                        body = {"data": payloads[(offset + i) % len(payloads)]}
+                        t0 = time.perf_counter()
+                        try:
+                            code = (await client.post("/evaluate_risk", json=body)).status_code
+                        except httpx.HTTPError:
+                            code = 0
+                        if record:
+                            latencies[i] = time.perf_counter() - t0
+                            statuses.append(code)
+
+                await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+            # Calentamiento (conexiones, cachés de CPU) con otros solicitantes
+            await drive(n_warmup, len(payloads) - n_warmup, False)
+            await client.post("/admin/cache/clear")
+
+            client_proc = psutil.Process()
+            cpu_srv0, cpu_cli0 = tree_cpu_seconds(server), client_proc.cpu_times()
+            t0 = time.perf_counter()
+            await drive(args.requests, 0, True)
+            elapsed = time.perf_counter() - t0
+            cpu_srv = tree_cpu_seconds(server) - cpu_srv0
+            cpu_cli1 = client_proc.cpu_times()
+            cpu_cli = (cpu_cli1.user + cpu_cli1.system) - (cpu_cli0.user + cpu_cli0.system)
+            return {"latencies": latencies, "statuses": statuses, "elapsed": elapsed, "cpu_srv": cpu_srv, "cpu_cli": cpu_cli}
+
+    m = asyncio.run(go())
+    lat_ms = m["latencies"] * 1000.0
+    ok = sum(1 for s in m["statuses"] if s == 200)
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "errores": args.requests - ok,
+        "segundos": round(m["elapsed"], 2),
+        "req_por_segundo": round(args.requests / m["elapsed"], 1),
+        "latencia_ms_p50": round(float(np.percentile(lat_ms, 50)), 2),
+        "latencia_ms_p95": round(float(np.percentile(lat_ms, 95)), 2),
+        "latencia_ms_p99": round(float(np.percentile(lat_ms, 99)), 2),
+        "latencia_ms_max": round(float(lat_ms.max()), 2),
+        "cpu_servidor_ms_por_request": round(m["cpu_srv"] * 1000.0 / args.requests, 3),
+        "cpu_cliente_ms_por_request": round(m["cpu_cli"] * 1000.0 / args.requests, 3),
+    }
+
+
+# ----- comparación -----
+
+def compare(baseline: dict, candidate: dict) -> list[dict]:
+    """Cambio relativo por nivel de concurrencia presente en ambos resultados."""
+    base = {r["concurrency"]: r for r in baseline["levels"]}
+    rows = []
+    for r in candidate["levels"]:
+        b = base.get(r["concurrency"])
+        if b is None:
+            continue
+        row = {"concurrency": r["concurrency"]}
+        for key, higher_is_better in COMPARED.items():
+            old, new = b.get(key), r.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100.0
+            row[key] = {
+                "base": old,
+                "nuevo": new,
+                "cambio_pct": round(change, 1),
+                "mejora": change > 0 if higher_is_better else change < 0,
+            }
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: list[dict]) -> None:
+    for row in rows:
+        parts = []
+        for key in COMPARED:
+            if key in row:
+                d = row[key]
+                parts.append(f"{key}={d['base']}->{d['nuevo']} ({d['cambio_pct']:+.1f}%)")
+        print(f"c={row['concurrency']:>4}  " + "  ".join(parts))
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Prueba de carga de /evaluate_risk")
+    ap.add_argument("--server", choices=["uvicorn", "prefork"], default="uvicorn")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument(
+        "--server-args", nargs=argparse.REMAINDER, default=[],
+        help="Argumentos extra para el servidor (p. ej. --no-batching con prefork); va al final",
+    )
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    ap.add_argument("--requests", type=int, default=2000, help="Requests medidos por nivel")
+    ap.add_argument("--warmup", type=int, default=200)
+    ap.add_argument("--applicants", type=int, default=5000, help="Solicitantes sintéticos distintos")
+    ap.add_argument("--with-history", action="store_true", help="Mandar también las columnas del historial")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--out", default=None, help="Guardar el resultado como JSON")
+    ap.add_argument("--baseline", default=None, help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"), help="Solo comparar dos JSON")
+    args = ap.parse_args()
+
+    if args.compare:
+        base, new = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        rows = compare(base, new)
+        print_comparison(rows)
+        print(json.dumps(rows, indent=2))
+        return
+
+    if not (ARTIFACTS_DIR / "model.joblib").exists():
+        raise SystemExit("Ejecutar desde home-credit-risk/ con artifacts/ generados (train.py).")
+
+    t0 = time.perf_counter()
+    payloads = generate_applicants(args.applicants, args.seed, args.with_history)
+    print(f"{len(payloads)} solicitantes sintéticos en {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(server_command(args, port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    levels = []
+    try:
+        health = wait_ready(base_url, args.timeout)
+        server = psutil.Process(proc.pid)
+        for c in args.concurrency:
+            levels.append(measure_level(base_url, server, payloads, c, args))
+            print(json.dumps(levels[-1]), file=sys.stderr, flush=True)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": psutil.cpu_count(),
+        "server": {"mode": args.server, "workers": args.workers, "args": args.server_args},
+        "version_modelo": health.get("version_modelo"),
+        "feature_store": health.get("feature_store"),
+        "applicants": args.applicants,
+        "with_history": args.with_history,
+        "seed": args.seed,
+        "levels": levels,
+    }
+    if args.baseline:
+        report["comparacion"] = compare(json.loads(Path(args.baseline).read_text(encoding="utf-8")), report)
+        print_comparison(report["comparacion"])
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
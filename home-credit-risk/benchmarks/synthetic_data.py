@@ -0,0 +1,453 @@
+"""
+Datos sintéticos de Home Credit para benchmarks: las siete tablas crudas
+que espera data_io.load_raw_tables, con sus columnas, dtypes, claves y
+cardinalidades por cliente/crédito parecidas a las del dataset real.
+
+El tamaño se da como factor de escala sobre BASE_APPLICANTS solicitantes:
+1x ~ 1 % de application_train, 100x ~ el dataset completo. Los valores son
+aleatorios (con semilla), con faltantes en proporciones realistas y un
+TARGET que depende de EXT_SOURCE_* para que el modelo tenga señal.
+
+Se genera por bloques de solicitantes y cada bloque se agrega como row group
+a los parquet, así que la memoria no crece con la escala.
+
+Uso (desde home-credit-risk/):
+    python benchmarks/synthetic_data.py --scale 10 --out data/raw
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "02_data_preparation"))
+from data_io import RAW_FILES, ensure_dir  # noqa: E402
+
+
+BASE_APPLICANTS = 3_000
+CHUNK_APPLICANTS = 50_000
+FIRST_ID = 100_002
+NA_DAYS = 365243  # "sin fecha" en las columnas DAYS_* de Home Credit
+
+# Filas por cliente o crédito (promedios del dataset real)
+PREV_PER_APPLICANT = 4.7
+BUREAU_PER_APPLICANT = 4.8
+INST_PER_PREV = 8.1
+POS_PER_PREV = 6.0
+CARD_SHARE_OF_PREV = 0.06
+CC_PER_CARD = 38.0
+BB_SHARE_OF_BUREAU = 0.5
+BB_PER_BUREAU = 32.0
+
+# Tasas de faltantes aproximadas de application_train (por patrón de nombre);
+# el resto de las columnas llega casi siempre completo.
+MISSING_RATES = (
+    (r"_(AVG|MODE|MEDI)$", 0.55),
+    (r"^OWN_CAR_AGE$", 0.66),
+    (r"^EXT_SOURCE_1$", 0.56),
+    (r"^EXT_SOURCE_3$", 0.20),
+    (r"^OCCUPATION_TYPE$", 0.31),
+    (r"^AMT_REQ_CREDIT_BUREAU_", 0.13),
+    (r"^NAME_TYPE_SUITE$", 0.004),
+)
+DEFAULT_MISSING_RATE = 0.002
+
+APP_CATEGORIES = {
+    "NAME_CONTRACT_TYPE": ["Cash loans", "Revolving loans"],
+    "CODE_GENDER": ["F", "M", "XNA"],
+    "FLAG_OWN_CAR": ["N", "Y"],
+    "FLAG_OWN_REALTY": ["N", "Y"],
+    "NAME_TYPE_SUITE": ["Children", "Family", "Group of people", "Other_A", "Other_B", "Spouse, partner", "Unaccompanied"],
+    "NAME_INCOME_TYPE": [
+        "Businessman", "Commercial associate", "Maternity leave", "Pensioner",
+        "State servant", "Student", "Unemployed", "Working",
+    ],
+    "NAME_EDUCATION_TYPE": [
+        "Academic degree", "Higher education", "Incomplete higher", "Lower secondary", "Secondary / secondary special",
+    ],
+    "NAME_FAMILY_STATUS": ["Civil marriage", "Married", "Separated", "Single / not married", "Unknown", "Widow"],
+    "NAME_HOUSING_TYPE": [
+        "Co-op apartment", "House / apartment", "Municipal apartment", "Office apartment", "Rented apartment", "With parents",
+    ],
+    "OCCUPATION_TYPE": [
+        "Accountants", "Cleaning staff", "Cooking staff", "Core staff", "Drivers", "HR staff", "High skill tech staff",
+        "IT staff", "Laborers", "Low-skill Laborers", "Managers", "Medicine staff", "Private service staff",
+        "Realty agents", "Sales staff", "Secretaries", "Security staff", "Waiters/barmen staff",
+    ],
+    "WEEKDAY_APPR_PROCESS_START": ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"],
+    "ORGANIZATION_TYPE": [
+        "Business Entity Type 1", "Business Entity Type 2", "Business Entity Type 3", "Construction", "Government",
+        "Industry: type 1", "Industry: type 3", "Kindergarten", "Medicine", "Military", "Other", "School",
+        "Self-employed", "Trade: type 7", "Transport: type 4", "XNA",
+    ],
+    "FONDKAPREMONT_MODE": ["not specified", "org spec account", "reg oper account", "reg oper spec account"],
+    "HOUSETYPE_MODE": ["block of flats", "specific housing", "terraced house"],
+    "WALLSMATERIAL_MODE": ["Block", "Mixed", "Monolithic", "Others", "Panel", "Stone, brick", "Wooden"],
+    "EMERGENCYSTATE_MODE": ["No", "Yes"],
+}
+
+_BUILDING = [
+    "APARTMENTS", "BASEMENTAREA", "YEARS_BEGINEXPLUATATION", "YEARS_BUILD", "COMMONAREA", "ELEVATORS",
+    "ENTRANCES", "FLOORSMAX", "FLOORSMIN", "LANDAREA", "LIVINGAPARTMENTS", "LIVINGAREA",
+    "NONLIVINGAPARTMENTS", "NONLIVINGAREA",
+]
+
+# Columnas de application_train en su orden original (sin SK_ID_CURR/TARGET)
+APP_COLUMNS = [
+    "NAME_CONTRACT_TYPE", "CODE_GENDER", "FLAG_OWN_CAR", "FLAG_OWN_REALTY", "CNT_CHILDREN",
+    "AMT_INCOME_TOTAL", "AMT_CREDIT", "AMT_ANNUITY", "AMT_GOODS_PRICE", "NAME_TYPE_SUITE",
+    "NAME_INCOME_TYPE", "NAME_EDUCATION_TYPE", "NAME_FAMILY_STATUS", "NAME_HOUSING_TYPE",
+    "REGION_POPULATION_RELATIVE", "DAYS_BIRTH", "DAYS_EMPLOYED", "DAYS_REGISTRATION", "DAYS_ID_PUBLISH",
+    "OWN_CAR_AGE", "FLAG_MOBIL", "FLAG_EMP_PHONE", "FLAG_WORK_PHONE", "FLAG_CONT_MOBILE", "FLAG_PHONE",
+    "FLAG_EMAIL", "OCCUPATION_TYPE", "CNT_FAM_MEMBERS", "REGION_RATING_CLIENT", "REGION_RATING_CLIENT_W_CITY",
+    "WEEKDAY_APPR_PROCESS_START", "HOUR_APPR_PROCESS_START", "REG_REGION_NOT_LIVE_REGION",
+    "REG_REGION_NOT_WORK_REGION", "LIVE_REGION_NOT_WORK_REGION", "REG_CITY_NOT_LIVE_CITY",
+    "REG_CITY_NOT_WORK_CITY", "LIVE_CITY_NOT_WORK_CITY", "ORGANIZATION_TYPE",
+    "EXT_SOURCE_1", "EXT_SOURCE_2", "EXT_SOURCE_3",
+    *[f"{b}_{s}" for s in ("AVG", "MODE", "MEDI") for b in _BUILDING],
+    "FONDKAPREMONT_MODE", "HOUSETYPE_MODE", "TOTALAREA_MODE", "WALLSMATERIAL_MODE", "EMERGENCYSTATE_MODE",
+    "OBS_30_CNT_SOCIAL_CIRCLE", "DEF_30_CNT_SOCIAL_CIRCLE", "OBS_60_CNT_SOCIAL_CIRCLE", "DEF_60_CNT_SOCIAL_CIRCLE",
+    "DAYS_LAST_PHONE_CHANGE",
+    *[f"FLAG_DOCUMENT_{i}" for i in range(2, 22)],
+    "AMT_REQ_CREDIT_BUREAU_HOUR", "AMT_REQ_CREDIT_BUREAU_DAY", "AMT_REQ_CREDIT_BUREAU_WEEK",
+    "AMT_REQ_CREDIT_BUREAU_MON", "AMT_REQ_CREDIT_BUREAU_QRT", "AMT_REQ_CREDIT_BUREAU_YEAR",
+]
+
+# Rango de días (negativos) por columna DAYS_* de application
+APP_DAYS = {
+    "DAYS_BIRTH": (-25_200, -7_500),
+    "DAYS_EMPLOYED": (-17_900, 0),
+    "DAYS_REGISTRATION": (-24_700, 0),
+    "DAYS_ID_PUBLISH": (-7_200, 0),
+    "DAYS_LAST_PHONE_CHANGE": (-4_300, 0),
+}
+# Flags 0/1: probabilidad de 1
+APP_FLAGS = {"FLAG_MOBIL": 1.0, "FLAG_EMP_PHONE": 0.82, "FLAG_CONT_MOBILE": 0.998, "FLAG_DOCUMENT_3": 0.71}
+AMOUNTS = {"AMT_INCOME_TOTAL": 147_150.0, "AMT_CREDIT": 513_531.0, "AMT_ANNUITY": 24_903.0, "AMT_GOODS_PRICE": 450_000.0}
+
+
+def missing_rate(col: str) -> float:
+    for pattern, rate in MISSING_RATES:
+        if re.search(pattern, col):
+            return rate
+    return DEFAULT_MISSING_RATE
+
+
+def table_sizes(scale: float) -> dict:
+    """Filas esperadas por tabla (para reportes; la generación es aleatoria)."""
+    n = int(round(BASE_APPLICANTS * scale))
+    prev = n * PREV_PER_APPLICANT
+    bureau = n * BUREAU_PER_APPLICANT
+    return {
+        "application": n,
+        "previous_application": int(prev),
+        "installments_payments": int(prev * INST_PER_PREV),
+        "pos_cash_balance": int(prev * POS_PER_PREV),
+        "credit_card_balance": int(prev * CARD_SHARE_OF_PREV * CC_PER_CARD),
+        "bureau": int(bureau),
+        "bureau_balance": int(bureau * BB_SHARE_OF_BUREAU * BB_PER_BUREAU),
+    }
+
+
+# ----- helpers -----
+
+def _choice(rng: np.random.Generator, values: list, n: int, weights: np.ndarray | None = None) -> np.ndarray:
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=weights)]
+
+
+def _with_missing(rng: np.random.Generator, values: np.ndarray, rate: float) -> np.ndarray:
+    if rate <= 0:
+        return values
+    mask = rng.random(len(values)) < rate
+    if not mask.any():
+        return values
+    if values.dtype == object:
+        values = values.copy()
+        values[mask] = None
+    else:
+        values = values.astype(np.float64)
+        values[mask] = np.nan
+    return values
+
+
+def _amount(rng: np.random.Generator, median: float, n: int, sigma: float = 0.6) -> np.ndarray:
+    return np.round(median * rng.lognormal(0.0, sigma, n), 1)
+
+
+def _days(rng: np.random.Generator, low: int, high: int, n: int) -> np.ndarray:
+    return rng.integers(low, high, n, endpoint=True).astype(np.int64)
+
+
+def _to_arrow(columns: dict) -> pa.Table:
+    arrays = {}
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype != object:
+            arrays[name] = pa.array(values)
+        else:
+            # Strings con nulos; tipo fijo aunque un bloque venga todo nulo
+            arrays[name] = pa.array(values, type=pa.string(), from_pandas=True)
+    return pa.table(arrays)
+
+
+def _repeat_parent(rng: np.random.Generator, parent_ids: np.ndarray, mean: float, share: float = 1.0):
+    """Hijos por padre ~ Poisson(mean) (solo para una fracción `share` de padres)."""
+    counts = rng.poisson(mean, len(parent_ids))
+    if share < 1.0:
+        counts[rng.random(len(parent_ids)) >= share] = 0
+    return np.repeat(parent_ids, counts), counts
+
+
+# ----- tablas -----
+
+class _Generator:
+    def __init__(self, seed: int):
+        self.rng = np.random.default_rng(seed)
+        # Distribución fija (sesgada) de cada categórica
+        self.weights = {c: self.rng.dirichlet(np.full(len(v), 0.8)) for c, v in APP_CATEGORIES.items()}
+        self.next_prev = 1_000_000
+        self.next_bureau = 5_000_000
+
+    def application(self, ids: np.ndarray) -> dict:
+        rng, n = self.rng, len(ids)
+        cols: dict = {}
+        children = rng.poisson(0.42, n)
+        for c in APP_COLUMNS:
+            if c in APP_CATEGORIES:
+                v = _choice(rng, APP_CATEGORIES[c], n, self.weights[c])
+            elif c in AMOUNTS:
+                v = _amount(rng, AMOUNTS[c], n, 0.5 if c == "AMT_INCOME_TOTAL" else 0.6)
+            elif c in APP_DAYS:
+                v = _days(rng, *APP_DAYS[c], n)
+                if c == "DAYS_EMPLOYED":
+                    v[rng.random(n) < 0.18] = NA_DAYS  # pensionados/desempleados
+            elif c in APP_FLAGS or c.startswith(("FLAG_", "REG_", "LIVE_")):
+                v = (rng.random(n) < APP_FLAGS.get(c, 0.1)).astype(np.int64)
+            elif c == "CNT_CHILDREN":
+                v = children.astype(np.int64)
+            elif c == "CNT_FAM_MEMBERS":
+                v = (children + rng.integers(1, 3, n)).astype(np.float64)
+            elif c.startswith("REGION_RATING"):
+                v = rng.choice([1, 2, 3], n, p=[0.1, 0.74, 0.16]).astype(np.int64)
+            elif c == "HOUR_APPR_PROCESS_START":
+                v = np.clip(np.round(rng.normal(12, 3.3, n)), 0, 23).astype(np.int64)
+            elif c == "OWN_CAR_AGE":
+                v = rng.integers(0, 30, n).astype(np.float64)
+            elif c.endswith("SOCIAL_CIRCLE"):
+                v = rng.poisson(0.15 if c.startswith("DEF") else 1.4, n).astype(np.float64)
+            elif c.startswith("AMT_REQ_CREDIT_BUREAU"):
+                v = rng.poisson(1.9 if c.endswith("YEAR") else 0.1, n).astype(np.float64)
+            else:
+                # EXT_SOURCE_*, REGION_POPULATION_RELATIVE y normalizados del edificio en [0, 1]
+                v = rng.beta(2.0, 2.0 if c.startswith("EXT_SOURCE") else 12.0, n)
+            # Las columnas enteras del dataset real no tienen faltantes
+            cols[c] = v if v.dtype.kind == "i" else _with_missing(rng, v, missing_rate(c))
+
+        # TARGET (~8 %) con señal en EXT_SOURCE_* (faltantes como 0.5)
+        ext = np.mean([np.nan_to_num(cols[f"EXT_SOURCE_{i}"], nan=0.5) for i in (1, 2, 3)], axis=0)
+        logit = -2.8 - 6.0 * (ext - 0.5) + rng.normal(0, 0.8, n)
+        target = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+        return {"SK_ID_CURR": ids, "TARGET": target, **{c: cols[c] for c in APP_COLUMNS}}
+
+    def previous_application(self, ids: np.ndarray) -> dict:
+        rng = self.rng
+        curr, _ = _repeat_parent(rng, ids, PREV_PER_APPLICANT)
+        n = len(curr)
+        prev_ids = np.arange(self.next_prev, self.next_prev + n, dtype=np.int64)
+        self.next_prev += n
+        credit = _amount(rng, 80_000.0, n, 1.0)
+
+        def days_or_na(low: int, high: int, na_share: float) -> np.ndarray:
+            v = _days(rng, low, high, n).astype(np.float64)
+            v[rng.random(n) < na_share] = NA_DAYS
+            return _with_missing(rng, v, 0.4)
+
+        return {
+            "SK_ID_PREV": prev_ids,
+            "SK_ID_CURR": curr,
+            "NAME_CONTRACT_TYPE": _choice(rng, ["Cash loans", "Consumer loans", "Revolving loans", "XNA"], n, np.array([0.45, 0.44, 0.11, 0.0])),
+            "AMT_ANNUITY": _with_missing(rng, np.round(credit / rng.integers(6, 60, n), 1), 0.22),
+            "AMT_APPLICATION": np.round(credit * rng.uniform(0.8, 1.1, n), 1),
+            "AMT_CREDIT": credit,
+            "AMT_DOWN_PAYMENT": _with_missing(rng, _amount(rng, 1_600.0, n, 1.2), 0.54),
+            "AMT_GOODS_PRICE": _with_missing(rng, credit, 0.23),
+            "WEEKDAY_APPR_PROCESS_START": _choice(rng, APP_CATEGORIES["WEEKDAY_APPR_PROCESS_START"], n),
+            "HOUR_APPR_PROCESS_START": rng.integers(0, 24, n).astype(np.int64),
+            "RATE_DOWN_PAYMENT": _with_missing(rng, rng.beta(1, 10, n), 0.54),
+            "NAME_CASH_LOAN_PURPOSE": _choice(rng, ["XAP", "XNA", "Repairs", "Other", "Urgent needs"], n, np.array([0.55, 0.41, 0.02, 0.01, 0.01])),
+            "NAME_CONTRACT_STATUS": _choice(rng, ["Approved", "Canceled", "Refused", "Unused offer"], n, np.array([0.62, 0.19, 0.17, 0.02])),
+            "DAYS_DECISION": _days(rng, -2_922, -1, n),
+            "CODE_REJECT_REASON": _choice(rng, ["XAP", "HC", "LIMIT", "SCO", "CLIENT"], n, np.array([0.81, 0.1, 0.04, 0.03, 0.02])),
+            "NAME_CLIENT_TYPE": _choice(rng, ["Repeater", "New", "Refreshed"], n, np.array([0.74, 0.18, 0.08])),
+            "CNT_PAYMENT": _with_missing(rng, rng.choice([6, 10, 12, 18, 24, 36, 48, 60], n).astype(np.float64), 0.22),
+            "DAYS_FIRST_DRAWING": days_or_na(-2_922, -2, 0.9),
+            "DAYS_FIRST_DUE": days_or_na(-2_892, -2, 0.03),
+            "DAYS_LAST_DUE_1ST_VERSION": days_or_na(-2_801, 2_389, 0.06),
+            "DAYS_LAST_DUE": days_or_na(-2_889, -2, 0.3),
+            "DAYS_TERMINATION": days_or_na(-2_874, -2, 0.33),
+        }
+
+    def installments_payments(self, prev: dict) -> dict:
+        rng = self.rng
+        prev_ids, counts = _repeat_parent(rng, prev["SK_ID_PREV"], INST_PER_PREV)
+        n = len(prev_ids)
+        curr = np.repeat(prev["SK_ID_CURR"], counts)
+        number = (np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts) + 1).astype(np.int64)
+        due = _days(rng, -2_922, -1, n).astype(np.float64)
+        instalment = _amount(rng, 8_900.0, n, 1.0)
+        paid = instalment * rng.choice([1.0, 1.0, 1.0, 0.5, 0.0], n)
+        return {
+            "SK_ID_PREV": prev_ids,
+            "SK_ID_CURR": curr,
+            "NUM_INSTALMENT_VERSION": rng.choice([0.0, 1.0, 2.0], n, p=[0.3, 0.64, 0.06]),
+            "NUM_INSTALMENT_NUMBER": number,
+            "DAYS_INSTALMENT": due,
+            "DAYS_ENTRY_PAYMENT": _with_missing(rng, due + rng.integers(-20, 15, n), 0.0002),
+            "AMT_INSTALMENT": instalment,
+            "AMT_PAYMENT": _with_missing(rng, np.round(paid, 1), 0.0002),
+        }
+
+    def pos_cash_balance(self, prev: dict) -> dict:
+        rng = self.rng
+        prev_ids, counts = _repeat_parent(rng, prev["SK_ID_PREV"], POS_PER_PREV)
+        n = len(prev_ids)
+        cnt = rng.choice([6, 10, 12, 24, 36], n).astype(np.float64)
+        return {
+            "SK_ID_PREV": prev_ids,
+            "SK_ID_CURR": np.repeat(prev["SK_ID_CURR"], counts),
+            "MONTHS_BALANCE": rng.integers(-96, 0, n).astype(np.int64),
+            "CNT_INSTALMENT": _with_missing(rng, cnt, 0.003),
+            "CNT_INSTALMENT_FUTURE": _with_missing(rng, np.floor(cnt * rng.random(n)), 0.003),
+            "NAME_CONTRACT_STATUS": _choice(
+                rng, ["Active", "Completed", "Signed", "Demand", "Returned to the store", "Approved", "Amortized debt", "Canceled", "XNA"],
+                n, np.array([0.914, 0.074, 0.0087, 0.0007, 0.0005, 0.0005, 0.0006, 0.00001, 0.00089]),
+            ),
+            "SK_DPD": np.where(rng.random(n) < 0.03, rng.integers(1, 60, n), 0).astype(np.int64),
+            "SK_DPD_DEF": np.where(rng.random(n) < 0.01, rng.integers(1, 30, n), 0).astype(np.int64),
+        }
+
+    def credit_card_balance(self, prev: dict) -> dict:
+        rng = self.rng
+        prev_ids, counts = _repeat_parent(rng, prev["SK_ID_PREV"], CC_PER_CARD, CARD_SHARE_OF_PREV)
+        n = len(prev_ids)
+        limit = rng.choice([0.0, 45_000.0, 90_000.0, 180_000.0, 270_000.0], n)
+        balance = np.round(limit * rng.beta(0.5, 1.5, n), 1)
+        cols = {
+            "SK_ID_PREV": prev_ids,
+            "SK_ID_CURR": np.repeat(prev["SK_ID_CURR"], counts),
+            "MONTHS_BALANCE": rng.integers(-96, 0, n).astype(np.int64),
+            "AMT_BALANCE": balance,
+            "AMT_CREDIT_LIMIT_ACTUAL": limit.astype(np.int64),
+        }
+        for c in ["AMT_DRAWINGS_ATM_CURRENT", "AMT_DRAWINGS_CURRENT", "AMT_DRAWINGS_OTHER_CURRENT", "AMT_DRAWINGS_POS_CURRENT"]:
+            v = np.where(rng.random(n) < 0.3, _amount(rng, 5_000.0, n, 1.0), 0.0)
+            cols[c] = _with_missing(rng, v, 0.0 if c == "AMT_DRAWINGS_CURRENT" else 0.2)
+        cols["AMT_INST_MIN_REGULARITY"] = _with_missing(rng, np.round(balance * 0.05, 1), 0.08)
+        cols["AMT_PAYMENT_CURRENT"] = _with_missing(rng, np.round(balance * rng.random(n) * 0.2, 1), 0.2)
+        cols["AMT_PAYMENT_TOTAL_CURRENT"] = np.round(balance * rng.random(n) * 0.2, 1)
+        for c in ["AMT_RECEIVABLE_PRINCIPAL", "AMT_RECIVABLE", "AMT_TOTAL_RECEIVABLE"]:
+            cols[c] = np.round(balance * rng.uniform(0.9, 1.0, n), 1)
+        for c in ["CNT_DRAWINGS_ATM_CURRENT", "CNT_DRAWINGS_CURRENT", "CNT_DRAWINGS_OTHER_CURRENT", "CNT_DRAWINGS_POS_CURRENT"]:
+            v = rng.poisson(0.7, n)
+            cols[c] = v.astype(np.int64) if c == "CNT_DRAWINGS_CURRENT" else _with_missing(rng, v.astype(np.float64), 0.2)
+        cols["CNT_INSTALMENT_MATURE_CUM"] = _with_missing(rng, rng.integers(0, 40, n).astype(np.float64), 0.08)
+        cols["NAME_CONTRACT_STATUS"] = _choice(rng, ["Active", "Completed", "Signed", "Demand"], n, np.array([0.96, 0.034, 0.005, 0.001]))
+        cols["SK_DPD"] = np.where(rng.random(n) < 0.03, rng.integers(1, 60, n), 0).astype(np.int64)
+        cols["SK_DPD_DEF"] = np.where(rng.random(n) < 0.01, rng.integers(1, 30, n), 0).astype(np.int64)
+        return cols
+
+    def bureau(self, ids: np.ndarray) -> dict:
+        rng = self.rng
+        curr, _ = _repeat_parent(rng, ids, BUREAU_PER_APPLICANT / 0.86, 0.86)
+        n = len(curr)
+        bureau_ids = np.arange(self.next_bureau, self.next_bureau + n, dtype=np.int64)
+        self.next_bureau += n
+        credit = _amount(rng, 125_000.0, n, 1.2)
+        return {
+            "SK_ID_CURR": curr,
+            "SK_ID_BUREAU": bureau_ids,
+            "CREDIT_ACTIVE": _choice(rng, ["Closed", "Active", "Sold", "Bad debt"], n, np.array([0.629, 0.367, 0.0039, 0.0001])),
+            "CREDIT_CURRENCY": _choice(rng, ["currency 1", "currency 2", "currency 3", "currency 4"], n, np.array([0.9992, 0.0006, 0.0001, 0.0001])),
+            "DAYS_CREDIT": _days(rng, -2_922, 0, n),
+            "CREDIT_DAY_OVERDUE": np.where(rng.random(n) < 0.0025, rng.integers(1, 300, n), 0).astype(np.int64),
+            "DAYS_CREDIT_ENDDATE": _with_missing(rng, _days(rng, -42_060, 31_199, n).astype(np.float64), 0.06),
+            "DAYS_ENDDATE_FACT": _with_missing(rng, _days(rng, -42_023, 0, n).astype(np.float64), 0.37),
+            "AMT_CREDIT_MAX_OVERDUE": _with_missing(rng, np.where(rng.random(n) < 0.1, _amount(rng, 5_000.0, n), 0.0), 0.66),
+            "CNT_CREDIT_PROLONG": (rng.random(n) < 0.005).astype(np.int64),
+            "AMT_CREDIT_SUM": _with_missing(rng, credit, 0.00001),
+            "AMT_CREDIT_SUM_DEBT": _with_missing(rng, np.round(credit * rng.beta(0.5, 1.5, n), 1), 0.15),
+            "AMT_CREDIT_SUM_LIMIT": _with_missing(rng, np.where(rng.random(n) < 0.1, _amount(rng, 50_000.0, n), 0.0), 0.34),
+            "AMT_CREDIT_SUM_OVERDUE": np.where(rng.random(n) < 0.003, _amount(rng, 10_000.0, n), 0.0),
+            "CREDIT_TYPE": _choice(rng, ["Consumer credit", "Credit card", "Car loan", "Mortgage", "Microloan"], n, np.array([0.73, 0.23, 0.017, 0.011, 0.012])),
+            "DAYS_CREDIT_UPDATE": _days(rng, -41_947, 372, n),
+            "AMT_ANNUITY": _with_missing(rng, _amount(rng, 13_500.0, n), 0.71),
+        }
+
+    def bureau_balance(self, bureau: dict) -> dict:
+        rng = self.rng
+        bureau_ids, _ = _repeat_parent(rng, bureau["SK_ID_BUREAU"], BB_PER_BUREAU, BB_SHARE_OF_BUREAU)
+        n = len(bureau_ids)
+        return {
+            "SK_ID_BUREAU": bureau_ids,
+            "MONTHS_BALANCE": rng.integers(-96, 1, n).astype(np.int64),
+            "STATUS": _choice(rng, list("C0X12345"), n, np.array([0.5, 0.277, 0.21, 0.009, 0.0009, 0.0003, 0.0002, 0.0026])),
+        }
+
+
+def generate(out_dir: str | Path, scale: float = 1.0, seed: int = 0, chunk_applicants: int = CHUNK_APPLICANTS) -> dict:
+    """Escribe las siete tablas en out_dir; devuelve filas escritas por tabla."""
+    out_dir = ensure_dir(out_dir)
+    n = max(1, int(round(BASE_APPLICANTS * scale)))
+    gen = _Generator(seed)
+    writers: dict[str, pq.ParquetWriter] = {}
+    rows = {name: 0 for name in RAW_FILES}
+
+    def write(name: str, cols: dict) -> None:
+        table = _to_arrow(cols)
+        if name not in writers:
+            writers[name] = pq.ParquetWriter(out_dir / RAW_FILES[name], table.schema)
+        writers[name].write_table(table)
+        rows[name] += table.num_rows
+
+    try:
+        for start in range(0, n, chunk_applicants):
+            ids = np.arange(FIRST_ID + start, FIRST_ID + min(n, start + chunk_applicants), dtype=np.int64)
+            write("application", gen.application(ids))
+            prev = gen.previous_application(ids)
+            write("previous_application", prev)
+            write("installments_payments", gen.installments_payments(prev))
+            write("pos_cash_balance", gen.pos_cash_balance(prev))
+            write("credit_card_balance", gen.credit_card_balance(prev))
+            bureau = gen.bureau(ids)
+            write("bureau", bureau)
+            write("bureau_balance", gen.bureau_balance(bureau))
+    finally:
+        for w in writers.values():
+            w.close()
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Genera las tablas crudas de Home Credit con datos sintéticos")
+    ap.add_argument("--scale", type=float, default=1.0, help=f"Factor sobre {BASE_APPLICANTS} solicitantes (1, 10, 100)")
+    ap.add_argument("--out", default="data/raw")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    rows = generate(args.out, args.scale, args.seed)
+    for name, n in rows.items():
+        size_mb = (Path(args.out) / RAW_FILES[name]).stat().st_size / (1024 * 1024)
+        print(f"{RAW_FILES[name]:<32} {n:>12,} filas {size_mb:>9.1f} MB")
+    print(f"OK: datos sintéticos (escala {args.scale:g}) en {args.out} ({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()